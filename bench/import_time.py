@@ -0,0 +1,60 @@
+# Measures how long importing the parts of lib takes in a fresh interpreter
+# and which rendering dependencies every import pulls in.
+#
+#   python bench/import_time.py [-n RUNS]
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TARGETS = [
+    "lib.consts",
+    "lib.music",
+    "lib.parser",
+    "lib",
+    "lib.chart",
+    "lib.convert",
+]
+HEAVY = ["drawsvg", "cairosvg", "cairocffi"]
+SCRIPT = """
+import sys, time
+start = time.perf_counter()
+import {target}
+end = time.perf_counter()
+print(end - start, *[m for m in {heavy!r} if m in sys.modules])
+"""
+
+
+def measure(target: str, runs: int) -> tuple[float, list[str]]:
+    """
+    the median import time in seconds and the heavy modules loaded by the import
+    """
+    times = []
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-c", SCRIPT.format(target=target, heavy=HEAVY)],
+            cwd=ROOT,
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout.split()
+        times.append(float(out[0]))
+        loaded = out[1:]
+    return statistics.median(times), loaded
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="measures the import time of lib")
+    parser.add_argument("-n", "--runs", type=int, default=10, help="runs per module")
+    args = parser.parse_args(argv)
+    for target in TARGETS:
+        seconds, loaded = measure(target, args.runs)
+        print(f"{target:<12}{seconds * 1000:8.1f} ms  {' '.join(loaded) or '-'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
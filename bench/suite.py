@@ -0,0 +1,256 @@
+# Benchmarks every stage from pitch parsing to pdf conversion at growing catalog sizes
+# and compares them against a saved baseline.
+#
+#   python bench/suite.py                      # run and compare with bench/baseline.json
+#   python bench/suite.py --save               # run and store the results as the baseline
+#   python bench/suite.py -k staff --sizes 10 100
+#
+# Catalogs are built by repeating the instruments in insts/ and voice/.
+# Stages which get very slow for big charts only run up to their limit unless --full
+# is given. The time is the best of at least MIN_REPEATS runs which take MIN_TIME
+# seconds together, with the garbage collector paused. The memory is measured in a
+# separate traced run: peak is the highest usage during the run, retained what is
+# still allocated after it (mostly the result) in bytes and in blocks. tracemalloc
+# forgets freed blocks, so only the allocations which survive the run are counted.
+# Baselines depend on the machine, so keep one per machine you compare on.
+
+import argparse
+import gc
+import glob
+import json
+import os
+import sys
+import time
+import tracemalloc
+from collections.abc import Callable
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from lib.chart import (
+    from_fields,
+    generate_staff,
+    make_graph,
+    make_svg,
+    split_into_tiles,
+)
+from lib.convert import svg_to_pdf_bytes
+from lib.inst_graph import Instrument, StringedInst
+from lib.music import Interval, Pitch
+from lib.parser import parse, parse_str
+
+SIZES = [10, 100, 1000, 10000]
+BASELINE = os.path.join(ROOT, "bench", "baseline.json")
+THRESHOLD = 0.25
+# a benchmark runs at least MIN_REPEATS times and until MIN_TIME seconds are spent,
+# at most MAX_REPEATS times, the best run varies far less than THRESHOLD between runs
+MIN_REPEATS = 5
+MIN_TIME = 1.0
+MAX_REPEATS = 1000
+
+PITCHES = [f"{n}{a}{o}" for n in "CDEFGAB" for a in ["", "#", "b"] for o in range(2, 7)]
+INTERVALS = [
+    f"{d}{m}{n}" for d in ["", "-"] for m, n in [("j", 3), ("m", 6), ("n", 5), ("a", 4)]
+]
+
+type Setup = Callable[[int], Callable[[], object]]
+
+
+def catalog_paths() -> list[str]:
+    return sorted(
+        glob.glob(os.path.join(ROOT, "insts", "*.txt"))
+        + glob.glob(os.path.join(ROOT, "voice", "*.txt"))
+    )
+
+
+def catalog_texts(size: int) -> list[str]:
+    texts = []
+    for path in catalog_paths():
+        with open(path, encoding="utf8") as file:
+            texts.append(file.read())
+    return [texts[i % len(texts)] for i in range(size)]
+
+
+def catalog(size: int) -> list[Instrument | StringedInst]:
+    return [from_fields(*parse_str(text)) for text in catalog_texts(size)]
+
+
+def bench_pitch_from_str(size: int) -> Callable[[], object]:
+    strings = [PITCHES[i % len(PITCHES)] for i in range(size)]
+    return lambda: [Pitch.from_str(s) for s in strings]
+
+
+def bench_transposed(size: int) -> Callable[[], object]:
+    pitches = [Pitch.from_str(PITCHES[i % len(PITCHES)]) for i in range(size)]
+    intervals = [Interval.from_str(INTERVALS[i % len(INTERVALS)]) for i in range(size)]
+    return lambda: [p.transposed(i) for p, i in zip(pitches, intervals)]
+
+
+def bench_to_halftones(size: int) -> Callable[[], object]:
+    intervals = [Interval.from_str(INTERVALS[i % len(INTERVALS)]) for i in range(size)]
+    return lambda: [i.to_halftones() for i in intervals]
+
+
+def bench_parse(size: int) -> Callable[[], object]:
+    paths = catalog_paths()
+    return lambda: [parse(paths[i % len(paths)]) for i in range(size)]
+
+
+def bench_parse_str(size: int) -> Callable[[], object]:
+    texts = catalog_texts(size)
+    return lambda: [parse_str(text) for text in texts]
+
+
+def bench_from_strs(size: int) -> Callable[[], object]:
+    parsed = [parse_str(text) for text in catalog_texts(size)]
+    return lambda: [from_fields(name, fields) for name, fields in parsed]
+
+
+def bench_columns(size: int) -> Callable[[], object]:
+    instruments = catalog(size)
+    return lambda: [inst.generate_s_pitch_ranges(-40, 40) for inst in instruments]
+
+
+def bench_generate_staff(size: int) -> Callable[[], object]:
+    instruments = catalog(size)
+    return lambda: generate_staff(instruments)
+
+
+def bench_make_graph(size: int) -> Callable[[], object]:
+    instruments = catalog(size)
+    return lambda: make_graph("Benchmark", instruments)
+
+
+def bench_split_into_tiles(size: int) -> Callable[[], object]:
+    content, content_format = make_graph("Benchmark", catalog(size))
+    return lambda: split_into_tiles(content, content_format)
+
+
+def bench_as_svg(size: int) -> Callable[[], object]:
+    img = make_svg("Benchmark", catalog(size))
+    return lambda: img.as_svg()
+
+
+def bench_pdf(size: int) -> Callable[[], object]:
+    svg = make_svg("Benchmark", catalog(size)).as_svg().encode("utf-8")
+    return lambda: svg_to_pdf_bytes(svg)
+
+
+# name: (setup, largest size run without --full)
+BENCHMARKS: dict[str, tuple[Setup, int]] = {
+    "pitch_from_str": (bench_pitch_from_str, 10000),
+    "transposed": (bench_transposed, 10000),
+    "to_halftones": (bench_to_halftones, 10000),
+    "parse": (bench_parse, 10000),
+    "parse_str": (bench_parse_str, 10000),
+    "from_strs": (bench_from_strs, 10000),
+    "columns": (bench_columns, 1000),
+    "generate_staff": (bench_generate_staff, 1000),
+    "make_graph": (bench_make_graph, 1000),
+    "split_into_tiles": (bench_split_into_tiles, 100),
+    "as_svg": (bench_as_svg, 1000),
+    "pdf": (bench_pdf, 100),
+}
+
+
+def traced_blocks() -> int:
+    return sum(
+        stat.count for stat in tracemalloc.take_snapshot().statistics("filename")
+    )
+
+
+def measure(run: Callable[[], object]) -> dict[str, float]:
+    times: list[float] = []
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        while len(times) < MIN_REPEATS or (
+            sum(times) < MIN_TIME and len(times) < MAX_REPEATS
+        ):
+            start = time.perf_counter()
+            run()
+            times.append(time.perf_counter() - start)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    blocks_before = traced_blocks()
+    result = run()
+    current, peak = tracemalloc.get_traced_memory()
+    retained_blocks = traced_blocks() - blocks_before
+    tracemalloc.stop()
+    del result
+    return {
+        "seconds": min(times),
+        "peak": peak - before,
+        "retained": current - before,
+        "retained_blocks": retained_blocks,
+    }
+
+
+def load_baseline(path: str) -> dict[str, dict[str, float]]:
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf8") as file:
+        return json.load(file)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="benchmarks every pipeline stage")
+    parser.add_argument("-k", "--only", default="", help="run names containing this")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--full", action="store_true", help="ignore the size limits")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--save", action="store_true", help="store as the baseline")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=THRESHOLD,
+        help="allowed slowdown against the baseline, 0.25 is 25%%",
+    )
+    args = parser.parse_args(argv)
+
+    baseline = load_baseline(args.baseline)
+    results: dict[str, dict[str, float]] = {}
+    regressions = []
+    print(
+        f"{'benchmark':<24}{'time':>12}{'peak':>12}{'retained':>12}{'ret. blocks':>12}"
+        "  baseline"
+    )
+    for name, (setup, limit) in BENCHMARKS.items():
+        if args.only not in name:
+            continue
+        for size in args.sizes:
+            if size > limit and not args.full:
+                continue
+            key = f"{name}[{size}]"
+            result = measure(setup(size))
+            results[key] = result
+
+            comparison = "-"
+            if key in baseline:
+                ratio = result["seconds"] / baseline[key]["seconds"]
+                comparison = f"{ratio:.2f}x"
+                if ratio > 1 + args.threshold:
+                    comparison += " SLOWER"
+                    regressions.append(key)
+            print(
+                f"{key:<24}{result['seconds'] * 1000:>10.2f}ms"
+                f"{result['peak'] / 1024:>10.0f}kB{result['retained'] / 1024:>10.0f}kB"
+                f"{result['retained_blocks']:>12}  {comparison}"
+            )
+
+    if args.save:
+        with open(args.baseline, encoding="utf8", mode="w") as file:
+            json.dump({**baseline, **results}, file, indent=1, sort_keys=True)
+        print(f"saved {len(results)} results to {args.baseline}")
+    if regressions:
+        print(f"{len(regressions)} slower than the baseline: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,142 @@
+# Renders charts requested as JSON lines on stdin and answers with JSON lines on stdout,
+# so one resident process can serve any number of requests.
+#
+#   python -m lib.batch
+#
+# A request names its instruments by catalog name or defines them inline:
+#
+#   {"id": 1, "title": "Winds", "output": "pdf", "path": "out/winds.pdf",
+#    "instruments": ["insts/fl", {"definition": "Trumpet\nRanges:\nF#3 C6 Normal"}]}
+#
+# output is svg, pdf, png or tiles (path is then the prefix of the tile pdfs).
+# An svg without a path is returned inline. Every request is answered with one line:
+#
+#   {"id": 1, "ok": true, "paths": ["out/winds.pdf"], "timings": {"parse": ..., ...}}
+#   {"id": 2, "ok": false, "error": "unknown instrument 'insts/x'"}
+
+import json
+import os
+import sys
+import time
+from contextlib import redirect_stdout
+from typing import IO
+
+from .chart import from_names, from_str, make_graph, make_svg, split_into_tiles
+from .build import FORMATS
+from .convert import svg_to_pdf, svg_to_png, tile_path, to_svg_bytes
+from .inst_graph import Instrument, StringedInst
+
+OUTPUTS = ["svg", "pdf", "png", "tiles"]
+
+
+class BatchRenderer:
+    def __init__(self) -> None:
+        self.instruments: dict[str, tuple[int, Instrument | StringedInst]] = {}
+
+    def instrument(self, entry: str | dict) -> Instrument | StringedInst:
+        """
+        the instrument of a catalog name, parsed again if its file changed,
+        or of an inline definition
+        """
+        if isinstance(entry, dict):
+            return from_str(entry["definition"])
+        try:
+            mtime = os.stat(f"{entry}.txt").st_mtime_ns
+        except FileNotFoundError:
+            raise ValueError(f"unknown instrument '{entry}'")
+        cached = self.instruments.get(entry)
+        if cached is None or cached[0] != mtime:
+            cached = (mtime, from_names([entry])[0])
+            self.instruments[entry] = cached
+        return cached[1]
+
+    def render(self, request: dict) -> dict:
+        timings = {}
+        start = time.perf_counter()
+
+        output = request.get("output", "svg")
+        if output not in OUTPUTS:
+            raise ValueError(f"invalid output '{output}'")
+        path: str | None = request.get("path")
+        if path is None and output != "svg":
+            raise ValueError(f"output {output} needs a path")
+        if not request.get("instruments"):
+            raise ValueError("no instruments")
+        instruments = [self.instrument(entry) for entry in request["instruments"]]
+        title = request.get("title", "Ranges")
+        timings["parse"] = time.perf_counter() - start
+
+        response: dict = {}
+        lap = time.perf_counter()
+        # the svgs with the position of their tile
+        svgs: list[tuple[bytes, tuple[int, int] | None]]
+        if output == "tiles":
+            format_name = request.get("format", "A4")
+            if format_name not in FORMATS:
+                raise ValueError(f"unknown format '{format_name}'")
+            content, content_format = make_graph(title, instruments)
+            tiles = split_into_tiles(
+                content, content_format, format=FORMATS[format_name]
+            )
+            svgs = [
+                (to_svg_bytes(tile), pos)
+                for tile, pos in sorted(tiles, key=lambda t: t[1])
+            ]
+        else:
+            svgs = [(to_svg_bytes(make_svg(title, instruments)), None)]
+        timings["layout"] = time.perf_counter() - lap
+
+        lap = time.perf_counter()
+        if path is None:
+            response["svg"] = svgs[0][0].decode("utf-8")
+        else:
+            jobs = [
+                (svg, path if pos is None else tile_path(path, pos))
+                for svg, pos in svgs
+            ]
+            match output:
+                case "svg":
+                    with open(path, mode="wb") as file:
+                        file.write(jobs[0][0])
+                    response["paths"] = [path]
+                case "png":
+                    response["paths"] = [svg_to_png(job) for job in jobs]
+                case _:
+                    response["paths"] = [svg_to_pdf(job) for job in jobs]
+        timings["convert"] = time.perf_counter() - lap
+        timings["total"] = time.perf_counter() - start
+        response["timings"] = timings
+        return response
+
+    def handle(self, line: str) -> dict:
+        """
+        answers one request line, errors are reported in the answer
+        """
+        request_id = None
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("a request must be a JSON object")
+            request_id = request.get("id")
+            response = self.render(request)
+        except Exception as e:
+            # a bad request must not end the process
+            return {"id": request_id, "ok": False, "error": str(e)}
+        return {"id": request_id, "ok": True, **response}
+
+
+def serve_lines(input: IO[str], output: IO[str]) -> None:
+    renderer = BatchRenderer()
+    for line in input:
+        if not line.strip():
+            continue
+        # stdout only carries the answers, anything printed while rendering goes to
+        # stderr
+        with redirect_stdout(sys.stderr):
+            response = renderer.handle(line)
+        output.write(json.dumps(response) + "\n")
+        output.flush()
+
+
+if __name__ == "__main__":
+    serve_lines(sys.stdin, sys.stdout)
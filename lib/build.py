@@ -0,0 +1,343 @@
+# Builds the charts described in a manifest file, only rebuilding stale outputs.
+#
+#   python -m lib.build charts.toml [-j JOBS] [--force] [--trace TRACE.jsonl]
+#
+# A manifest is a TOML or JSON file with a list of charts:
+#
+#   [[chart]]
+#   name = "choir"                      # outputs are named out_dir/{name}...
+#   title = "Choir Ranges"
+#   instruments = ["voice/soprano", "voice/alto"]
+#   # or every instrument in a directory
+#   # catalog = "insts"
+#   # exclude = ["insts/midi"]
+#   outputs = ["pdf", "tiles"]
+#   format = "A4"                       # or [width, height] in cm
+#   orientation = "auto"                # of the pages: portrait, landscape or auto for
+#                                       # fewer pages, the format as it is by default
+#
+# An output is stale if its chart, the contents of its instrument files,
+# the layout constants or the font changed since it was last built.
+# --trace records the stages of every output per instrument, see lib/trace.py.
+
+import argparse
+import json
+import os
+import sys
+import tomllib
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from .catalog import catalog
+from .chart import A4, PX_PER_CM, from_names, make_graph, make_svg, split_into_tiles
+from .chart import ORIENTATIONS, ColumnRenderer, draw_column, make_paged_svg
+from .convert import save_as_pdf, save_many_as_pdf, save_tiles_as_pdf, tile_path
+from .deps import RENDER_VERSION, layout_constants, stable_hash
+from .inst_graph import Instrument, StringedInst
+from .metrics import font_fingerprint
+from .pyramid import make_pyramid
+from .trace import json_sink, read_records, span, start, summarize
+from .web import make_html
+
+OUTPUTS = ["svg", "pdf", "tiles", "poster", "pages", "html", "pyramid"]
+FORMATS = {
+    "A3": (29.7 * PX_PER_CM, 42 * PX_PER_CM),
+    "A4": A4,
+    "A5": (14.8 * PX_PER_CM, 21 * PX_PER_CM),
+}
+STAMPS = ".build.json"
+
+
+class Chart:
+    def __init__(
+        self,
+        name: str,
+        title: str,
+        instruments: list[str],
+        outputs: list[str],
+        format: tuple[float, float] = A4,
+        margin: float = PX_PER_CM,
+        min_overlap: float = 2.0 * PX_PER_CM,
+        columns: int = 6,
+        orientation: str | None = None,
+    ) -> None:
+        for output in outputs:
+            if output not in OUTPUTS:
+                raise ValueError(f"chart {name} has invalid output '{output}'")
+        if not instruments:
+            raise ValueError(f"chart {name} has no instruments")
+        self.name = name
+        self.title = title
+        self.instruments = instruments
+        self.outputs = outputs
+        self.format = format
+        self.margin = margin
+        self.min_overlap = min_overlap
+        self.columns = columns
+        if orientation is not None and orientation not in ORIENTATIONS:
+            raise ValueError(f"chart {name} has invalid orientation '{orientation}'")
+        self.orientation = orientation
+
+    @classmethod
+    def from_dict(cls, fields: dict, /, root: str = "."):
+        name = fields["name"]
+        if "instruments" in fields:
+            instruments = list(fields["instruments"])
+        elif "catalog" in fields:
+            instruments = catalog(root, fields["catalog"], fields.get("exclude", []))
+        else:
+            raise ValueError(f"chart {name} needs 'instruments' or 'catalog'")
+        instruments = [os.path.join(root, inst) for inst in instruments]
+
+        format = fields.get("format", "A4")
+        if isinstance(format, str):
+            if format not in FORMATS:
+                raise ValueError(f"chart {name} has unknown format '{format}'")
+            format = FORMATS[format]
+        else:
+            format = (format[0] * PX_PER_CM, format[1] * PX_PER_CM)
+
+        return cls(
+            name,
+            fields.get("title", name),
+            instruments,
+            list(fields.get("outputs", ["pdf"])),
+            format,
+            fields.get("margin", 1.0) * PX_PER_CM,
+            fields.get("min_overlap", 2.0) * PX_PER_CM,
+            fields.get("columns", 6),
+            fields.get("orientation"),
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "title": self.title,
+            "instruments": self.instruments,
+            "outputs": self.outputs,
+            "format": [v / PX_PER_CM for v in self.format],
+            "margin": self.margin / PX_PER_CM,
+            "min_overlap": self.min_overlap / PX_PER_CM,
+            "columns": self.columns,
+            "orientation": self.orientation,
+        }
+
+
+def load_charts(path: str) -> list[Chart]:
+    with open(path, mode="rb") as file:
+        if path.endswith(".json"):
+            manifest = json.load(file)
+        else:
+            manifest = tomllib.load(file)
+    root = os.path.dirname(path)
+    return [Chart.from_dict(fields, root=root) for fields in manifest["chart"]]
+
+
+def output_key(chart: Chart, output: str) -> str:
+    """
+    hash of everything an output depends on
+    """
+    contents = []
+    for name in chart.instruments:
+        with open(f"{name}.txt", mode="rb") as file:
+            contents.append(file.read().decode("utf-8"))
+    # the other outputs of the chart do not matter
+    fields = chart.to_dict()
+    del fields["outputs"]
+    return stable_hash(
+        [
+            RENDER_VERSION,
+            fields,
+            output,
+            contents,
+            layout_constants(),
+            font_fingerprint(),
+        ]
+    )
+
+
+def render_output(
+    chart: Chart,
+    instruments: list[Instrument | StringedInst],
+    output: str,
+    out_dir: str,
+    /,
+    render_column: ColumnRenderer = draw_column,
+) -> list[str]:
+    """
+    renders one output of a chart and returns the written paths
+    """
+    prefix = os.path.join(out_dir, chart.name)
+
+    match output:
+        case "svg":
+            img = make_svg(chart.title, instruments, render_column)
+            img.save_svg(f"{prefix}.svg")
+            return [f"{prefix}.svg"]
+        case "pdf":
+            img = make_svg(chart.title, instruments, render_column)
+            save_as_pdf(img, f"{prefix}.pdf")
+            return [f"{prefix}.pdf"]
+        case "tiles" | "poster":
+            content, content_format = make_graph(
+                chart.title, instruments, render_column
+            )
+            tiles = split_into_tiles(
+                content,
+                content_format,
+                margin=chart.margin,
+                min_overlap=chart.min_overlap,
+                format=chart.format,
+            )
+            if output == "poster":
+                save_tiles_as_pdf(tiles, f"{prefix}_tiles.pdf")
+                return [f"{prefix}_tiles.pdf"]
+            return save_many_as_pdf(
+                [(tile, tile_path(prefix, pos)) for tile, pos in tiles], workers=1
+            )
+        case "pages":
+            pages = make_paged_svg(
+                chart.title,
+                instruments,
+                columns=chart.columns,
+                margin=chart.margin,
+                format=chart.format,
+                orientation=chart.orientation,
+            )
+            return save_many_as_pdf(
+                [(page, f"{prefix}_page_{i}.pdf") for i, page in enumerate(pages)],
+                workers=1,
+            )
+        case "html":
+            return [make_html(chart.title, instruments, f"{prefix}_html")]
+        case "pyramid":
+            make_pyramid(chart.title, instruments, f"{prefix}_pyramid", workers=1)
+            return [f"{prefix}_pyramid"]
+        case _:
+            raise ValueError(f"invalid output '{output}'")
+
+
+def build_output(job: tuple[dict, str, str]) -> list[str]:
+    """
+    renders one output of a chart, runs in a worker process
+    """
+    fields, output, out_dir = job
+    chart = Chart.from_dict(fields)
+    with span("output", chart=chart.name, output=output):
+        return render_output(chart, from_names(chart.instruments), output, out_dir)
+
+
+def _start_tracing(path: str, memory: bool) -> None:
+    """
+    traces a worker process, its spans are appended to path
+    """
+    start(json_sink(path), memory=memory)
+
+
+def load_stamps(out_dir: str) -> dict[str, str]:
+    """
+    the keys of the outputs as they were last built
+    """
+    path = os.path.join(out_dir, STAMPS)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf8") as file:
+        return json.load(file)
+
+
+def save_stamps(out_dir: str, stamps: dict[str, str]) -> None:
+    with open(os.path.join(out_dir, STAMPS), encoding="utf8", mode="w") as file:
+        json.dump(stamps, file, indent=1, sort_keys=True)
+
+
+def build(
+    charts: list[Chart],
+    out_dir: str,
+    /,
+    workers: int | None = None,
+    force: bool = False,
+    trace: str | None = None,
+    trace_memory: bool = False,
+) -> tuple[list[str], list[str]]:
+    """
+    rebuilds the stale outputs of the charts in parallel
+    the spans of the workers are written to trace, which is overwritten
+    returns the built and the failed outputs as chart:output
+    """
+    names = [chart.name for chart in charts]
+    if len(set(names)) != len(names):
+        raise ValueError("chart names must be unique")
+    os.makedirs(out_dir, exist_ok=True)
+    stamps = load_stamps(out_dir)
+
+    stale = {}
+    for chart in charts:
+        for output in chart.outputs:
+            artifact = f"{chart.name}:{output}"
+            key = output_key(chart, output)
+            if force or stamps.get(artifact) != key:
+                stale[artifact] = (key, (chart.to_dict(), output, out_dir))
+
+    initializer: Callable[..., None] | None = None
+    initargs: tuple = ()
+    if trace is not None:
+        open(trace, mode="w").close()
+        initializer, initargs = _start_tracing, (trace, trace_memory)
+
+    built, failed = [], []
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=initializer, initargs=initargs
+    ) as pool:
+        futures = {
+            pool.submit(build_output, job): artifact
+            for artifact, (_, job) in stale.items()
+        }
+        for future in as_completed(futures):
+            artifact = futures[future]
+            try:
+                future.result()
+            except Exception as e:
+                print(f"failed {artifact}: {e}", file=sys.stderr)
+                stamps.pop(artifact, None)
+                failed.append(artifact)
+                continue
+            print(f"built {artifact}")
+            stamps[artifact] = stale[artifact][0]
+            built.append(artifact)
+
+    save_stamps(out_dir, stamps)
+    return built, failed
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="builds the stale outputs of the charts in a manifest"
+    )
+    parser.add_argument("manifest", help="TOML or JSON file describing the charts")
+    parser.add_argument("-o", "--out", default="out", help="output directory")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="worker count")
+    parser.add_argument("--force", action="store_true", help="rebuild everything")
+    parser.add_argument("--trace", help="write the spans of every stage to this file")
+    parser.add_argument(
+        "--trace-memory", action="store_true", help="also trace the memory peaks"
+    )
+    args = parser.parse_args(argv)
+
+    charts = load_charts(args.manifest)
+    built, failed = build(
+        charts,
+        args.out,
+        workers=args.jobs,
+        force=args.force,
+        trace=args.trace,
+        trace_memory=args.trace_memory,
+    )
+    if not built and not failed:
+        print("everything up to date")
+    if args.trace is not None:
+        print(summarize(read_records(args.trace)))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
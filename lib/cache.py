@@ -0,0 +1,202 @@
+# Content addressed cache of rendered svg and pdf artifacts.
+# Svgs are keyed by everything that goes into the layout, pdfs by the svg bytes
+# they are converted from, which relies on the svg output being byte stable.
+
+import hashlib
+import json
+import os
+
+from .chart import (
+    A4,
+    PX_PER_CM,
+    make_graph,
+    make_svg,
+    split_into_tiles,
+)
+from .convert import run_jobs, svg_to_pdf, tile_path, to_svg_bytes
+from .deps import RENDER_VERSION, layout_constants, stable_hash
+from .inst_graph import Instrument, StringedInst
+from .metrics import CACHE_DIR, font_fingerprint
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+def render_key(
+    kind: str, title: str, instruments: list[Instrument | StringedInst], *options
+) -> str:
+    return stable_hash(
+        [
+            RENDER_VERSION,
+            kind,
+            title,
+            [str(inst) for inst in instruments],
+            layout_constants(),
+            font_fingerprint(),
+            options,
+        ]
+    )
+
+
+class RenderCache:
+    """
+    stores artifacts as files named by their key
+    the least recently used artifacts are removed once the total size exceeds max_bytes
+    """
+
+    def __init__(
+        self,
+        directory: str = os.path.join(CACHE_DIR, "render"),
+        max_bytes: int = DEFAULT_MAX_BYTES,
+    ) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.size: int | None = None
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key)
+
+    def get(self, key: str) -> bytes | None:
+        path = self.path(key)
+        try:
+            with open(path, mode="rb") as file:
+                data = file.read()
+        except FileNotFoundError:
+            return None
+        # the modification time is the last use
+        os.utime(path)
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        old_size = os.path.getsize(path) if os.path.exists(path) else 0
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, mode="wb") as file:
+            file.write(data)
+        os.replace(tmp_path, path)
+        if self.size is not None:
+            self.size += len(data) - old_size
+        self.evict()
+
+    def entries(self) -> list[tuple[float, int, str]]:
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for file in files:
+                if file.endswith(".tmp"):
+                    continue
+                path = os.path.join(root, file)
+                stat = os.stat(path)
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def evict(self) -> None:
+        if self.size is not None and self.size <= self.max_bytes:
+            return
+        entries = self.entries()
+        self.size = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if self.size <= self.max_bytes:
+                break
+            os.remove(path)
+            self.size -= size
+
+
+def chart_svg(
+    cache: RenderCache, title: str, instruments: list[Instrument | StringedInst]
+) -> bytes:
+    key = render_key("svg", title, instruments)
+    svg = cache.get(key)
+    if svg is None:
+        svg = to_svg_bytes(make_svg(title, instruments))
+        cache.put(key, svg)
+    return svg
+
+
+def tile_svgs(
+    cache: RenderCache,
+    title: str,
+    instruments: list[Instrument | StringedInst],
+    /,
+    margin: float = PX_PER_CM,
+    min_overlap: float = 2.0 * PX_PER_CM,
+    format: tuple[float, float] = A4,
+) -> list[tuple[bytes, tuple[int, int]]]:
+    options = (margin, min_overlap, format)
+    index_key = render_key("tiles", title, instruments, *options)
+    index = cache.get(index_key)
+    if index is not None:
+        positions = [(x, y) for x, y in json.loads(index)]
+        svgs = [
+            cache.get(render_key("tile", title, instruments, *options, *pos))
+            for pos in positions
+        ]
+        if all(svg is not None for svg in svgs):
+            return list(zip(svgs, positions))  # type: ignore
+
+    content, content_format = make_graph(title, instruments)
+    tiles = []
+    for tile, pos in split_into_tiles(
+        content, content_format, margin=margin, min_overlap=min_overlap, format=format
+    ):
+        svg = to_svg_bytes(tile)
+        cache.put(render_key("tile", title, instruments, *options, *pos), svg)
+        tiles.append((svg, pos))
+    cache.put(index_key, json.dumps([pos for _, pos in tiles]).encode("utf-8"))
+    return tiles
+
+
+def pdf_key(svg: bytes) -> str:
+    return hashlib.sha256(b"pdf\0" + svg).hexdigest()
+
+
+def save_pdfs(
+    cache: RenderCache, jobs: list[tuple[bytes, str]], workers: int | None = None
+) -> list[str]:
+    """
+    writes every svg as pdf to its path, only svgs not converted before are converted
+    """
+    missing = []
+    for svg, path in jobs:
+        pdf = cache.get(pdf_key(svg))
+        if pdf is None:
+            missing.append((svg, path))
+            continue
+        with open(path, mode="wb") as file:
+            file.write(pdf)
+    for svg, path in zip(
+        [svg for svg, _ in missing], run_jobs(svg_to_pdf, missing, workers)
+    ):
+        with open(path, mode="rb") as file:
+            cache.put(pdf_key(svg), file.read())
+    return [path for _, path in jobs]
+
+
+def save_chart_pdf(
+    cache: RenderCache,
+    title: str,
+    instruments: list[Instrument | StringedInst],
+    path: str,
+) -> None:
+    save_pdfs(cache, [(chart_svg(cache, title, instruments), path)])
+
+
+def save_poster_pdf(
+    cache: RenderCache,
+    title: str,
+    instruments: list[Instrument | StringedInst],
+    prefix: str,
+    /,
+    margin: float = PX_PER_CM,
+    min_overlap: float = 2.0 * PX_PER_CM,
+    format: tuple[float, float] = A4,
+    workers: int | None = None,
+) -> list[str]:
+    """
+    writes the chart to {prefix}.pdf and every tile to {prefix}_{x}_{y}.pdf
+    """
+    jobs = [(chart_svg(cache, title, instruments), f"{prefix}.pdf")]
+    for svg, pos in tile_svgs(
+        cache, title, instruments, margin=margin, min_overlap=min_overlap, format=format
+    ):
+        jobs.append((svg, tile_path(prefix, pos)))
+    return save_pdfs(cache, jobs, workers)
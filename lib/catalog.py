@@ -0,0 +1,33 @@
+# Finds the instrument files of catalog directories. Only the standard library is
+# used, so command line tools can resolve their arguments without loading the
+# rendering modules.
+
+import os
+
+
+def catalog(root: str, directory: str, exclude: list[str]) -> list[str]:
+    """
+    all instrument files in root/directory as names for from_names relative to root
+    """
+    excluded = {os.path.normpath(name) for name in exclude}
+    names = []
+    for file in sorted(os.listdir(os.path.join(root, directory))):
+        if not file.endswith(".txt"):
+            continue
+        name = os.path.join(directory, file[: -len(".txt")])
+        if os.path.normpath(name) not in excluded:
+            names.append(name)
+    return names
+
+
+def expand_names(arguments: list[str]) -> list[str]:
+    """
+    the arguments with every directory replaced by the instruments in it
+    """
+    names = []
+    for argument in arguments:
+        if os.path.isdir(argument):
+            names.extend(catalog(".", argument, []))
+        else:
+            names.append(argument)
+    return names
@@ -0,0 +1,756 @@
+# Layout of the staff, the instrument columns and the pages of a chart
+
+from collections.abc import Callable, Collection
+from functools import lru_cache
+from math import ceil
+
+import drawsvg as draw
+
+from .elements import (
+    translated_group,
+    STAFF_STROKE_WIDTH,
+    LF_CLEF,
+    F_CLEF,
+    G_CLEF,
+    UG_CLEF,
+    CLEF_OFFSET,
+    BAR_LINE_WIDTH,
+    CLEF_WIDTH,
+    PX_PER_CM,
+    A4,
+    FONT_FAMILY,
+    TEXT_MARGIN_FACTOR,
+)
+from .inst_graph import (
+    INST_TITLE_MARGIN,
+    LINE_HEIGHT,
+    INST_WIDTH,
+    INST_TITLE_SIZE,
+    TEXT_MARGIN,
+    Instrument,
+    StringedInst,
+)
+from .consts import (
+    LF_RANGE,
+    F_RANGE,
+    G_RANGE,
+    UG_RANGE,
+)
+from .coverage import coverage, draw_coverage
+from .parser import parse, parse_str
+from .trace import span, traced
+
+SECONDARY_COLOR = "#666666"
+
+
+def calc_lowest_line(min_spos: int) -> tuple[int, bool]:
+    """
+    calculates the lowest staff line with the bool indicating if the lower F clef should be drawn
+    """
+    min_spos = min(F_RANGE[0], min_spos)
+
+    draw_lf = False
+    if min_spos < LF_RANGE[0] + 4:
+        draw_lf = True
+        min_spos = min(min_spos, LF_RANGE[0])
+
+    return min_spos, draw_lf
+
+
+def calc_highest_line(max_spos: int) -> tuple[int, bool]:
+    """
+    calculates the highest staff line with the bool indicating if the upper G clef should be drawn
+    """
+    max_spos = max(G_RANGE[1], max_spos)
+
+    draw_ug = False
+    if max_spos > UG_RANGE[1] - 4:
+        draw_ug = True
+        max_spos = max(max_spos, UG_RANGE[1])
+
+    return max_spos, draw_ug
+
+
+# the styles are shared by the charts with the same staff, the elements are new for
+# every chart so a drawing can never change the staff of another one
+@lru_cache(maxsize=64)
+def staff_line_styles(
+    min_spos: int, max_spos: int, draw_ug: bool, draw_lf: bool
+) -> tuple[tuple[int, str, float], ...]:
+    """
+    the staff position, color and stroke width of every staff line
+    """
+    styles = []
+    for staff_pos in range(min_spos, max_spos + 1):
+        if staff_pos % 2 == 1:
+            continue
+        stroke_width = STAFF_STROKE_WIDTH
+        color = "black"
+        if staff_pos > G_RANGE[1] or staff_pos < F_RANGE[0] or staff_pos == 0:
+            stroke_width = STAFF_STROKE_WIDTH / 2
+            color = SECONDARY_COLOR
+
+        if draw_ug and UG_RANGE[0] <= staff_pos <= UG_RANGE[1]:
+            stroke_width = STAFF_STROKE_WIDTH
+            color = "black"
+        if draw_lf and LF_RANGE[0] <= staff_pos <= LF_RANGE[1]:
+            stroke_width = STAFF_STROKE_WIDTH
+            color = "black"
+        styles.append((staff_pos, color, stroke_width))
+    return tuple(styles)
+
+
+def draw_staff_lines(
+    min_spos: int,
+    max_spos: int,
+    x_min: float,
+    x_max: float,
+    draw_ug: bool,
+    draw_lf: bool,
+) -> draw.Group:
+    staff_lines = draw.Group()
+    for staff_pos, color, stroke_width in staff_line_styles(
+        min_spos, max_spos, draw_ug, draw_lf
+    ):
+        staff_lines.append(
+            draw.Line(
+                x_min,
+                -staff_pos,
+                x_max,
+                -staff_pos,
+                stroke=color,
+                stroke_width=stroke_width,
+            )
+        )
+    return staff_lines
+
+
+def draw_clefs(draw_ug: bool, draw_lf: bool) -> draw.Group:
+    clefs = draw.Group()
+    if draw_ug:
+        clefs.append(draw.Use(UG_CLEF, CLEF_OFFSET, -(UG_RANGE[0] + 2)))
+    clefs.append(draw.Use(G_CLEF, CLEF_OFFSET, -(G_RANGE[0] + 2)))
+    clefs.append(draw.Use(F_CLEF, CLEF_OFFSET, -(F_RANGE[1] - 2)))
+    if draw_lf:
+        clefs.append(draw.Use(LF_CLEF, CLEF_OFFSET, -(LF_RANGE[1] - 2)))
+    return clefs
+
+
+DOUBLE_BARLINE_WIDTH = 5 * BAR_LINE_WIDTH
+
+
+def draw_d_barline(x: float, min_y_spos: float, max_y_spos: float) -> draw.Group:
+    group = draw.Group()
+    group.append(
+        draw.Line(
+            x - BAR_LINE_WIDTH * 3 / 2,
+            -min_y_spos,
+            x - BAR_LINE_WIDTH * 3 / 2,
+            -max_y_spos,
+            stroke_width=BAR_LINE_WIDTH * 3,
+            stroke="black",
+        )
+    )
+    group.append(
+        draw.Line(
+            x - 5 * BAR_LINE_WIDTH,
+            -min_y_spos,
+            x - 5 * BAR_LINE_WIDTH,
+            -max_y_spos,
+            stroke_width=BAR_LINE_WIDTH,
+            stroke="black",
+        )
+    )
+    return group
+
+
+def calc_staff_extents(
+    instruments: list[Instrument | StringedInst],
+) -> tuple[tuple[int, bool], tuple[int, bool]]:
+    """
+    calculates the lowest and highest staff line for the instruments
+    with the bools indicating if the lower F clef and upper G clef should be drawn
+    """
+    min_spos = min(
+        map(lambda inst: inst.min_sounding_pitch().to_staff_position(), instruments)
+    )
+    max_spos = max(
+        map(lambda inst: inst.max_sounding_pitch().to_staff_position(), instruments)
+    )
+    return calc_lowest_line(min_spos), calc_highest_line(max_spos)
+
+
+def calc_vertical_extent(
+    instruments: list[Instrument | StringedInst], min_spos: int, max_spos: int
+) -> tuple[float, float]:
+    """
+    calculates the top and bottom of the staff including instrument titles and descriptions
+    """
+    longest_descr = max(map(lambda x: x.description_lines(), instruments))
+
+    y_min = -max_spos - INST_TITLE_SIZE - INST_TITLE_MARGIN
+    y_max = -min_spos + longest_descr * LINE_HEIGHT + TEXT_MARGIN
+    return y_min, y_max
+
+
+def calc_staff_format(
+    instruments: list[Instrument | StringedInst],
+) -> tuple[float, float]:
+    """
+    the width and height of generate_staff without drawing it
+    """
+    (min_spos, _), (max_spos, _) = calc_staff_extents(instruments)
+    y_min, y_max = calc_vertical_extent(instruments, min_spos, max_spos)
+    total_length = (
+        CLEF_OFFSET + CLEF_WIDTH + len(instruments) * INST_WIDTH + DOUBLE_BARLINE_WIDTH
+    )
+    return total_length, y_max - y_min
+
+
+type ColumnRenderer = Callable[[Instrument | StringedInst, float, float], draw.Group]
+
+
+def draw_column(
+    inst: Instrument | StringedInst, y_min: float, y_max: float
+) -> draw.Group:
+    with span("column", instrument=inst.name) as s:
+        column = inst.generate_s_pitch_ranges(y_min, y_max)
+        s.elements(column)
+    return column
+
+
+def generate_staff(
+    instruments: list[Instrument | StringedInst],
+    /,
+    render_column: ColumnRenderer = draw_column,
+) -> tuple[draw.Group, tuple[float, float]]:
+    """
+    generates everything with C4 at 0 and D4 at -1
+    render_column draws the column of an instrument, it can be replaced to reuse columns
+    """
+    (min_spos, draw_lf), (max_spos, draw_ug) = calc_staff_extents(instruments)
+
+    highest_full = G_RANGE[1] if not draw_ug else UG_RANGE[1]
+    lowest_full = F_RANGE[0] if not draw_lf else LF_RANGE[0]
+
+    total_length, height = calc_staff_format(instruments)
+
+    groups: list[draw.Group | draw.Line] = []
+    groups.append(
+        draw_staff_lines(min_spos, max_spos, 0, total_length, draw_ug, draw_lf)
+    )
+    groups.append(draw_d_barline(total_length, highest_full, lowest_full))
+    groups.append(draw_clefs(draw_ug, draw_lf))
+
+    for i, inst in enumerate(instruments):
+        x = CLEF_OFFSET + CLEF_WIDTH + i * INST_WIDTH
+        groups.append(
+            translated_group(
+                render_column(inst, -max_spos, -min_spos),
+                x,
+                0,
+            )
+        )
+        if i < len(instruments) - 1:
+            groups.append(
+                draw.Line(
+                    x + INST_WIDTH,
+                    -highest_full,
+                    x + INST_WIDTH,
+                    -lowest_full,
+                    stroke_width=BAR_LINE_WIDTH,
+                    stroke="black",
+                )
+            )
+    y_min, _ = calc_vertical_extent(instruments, min_spos, max_spos)
+
+    return draw.Group(children=groups, transform=f"translate(0,{-y_min})"), (
+        total_length,
+        height,
+    )
+
+
+LINE_SPACE = 0.2 * PX_PER_CM
+MARGIN = 1 * PX_PER_CM
+TITLE_FONT_SIZE = 50
+TITLE_MARGIN = TITLE_FONT_SIZE * TEXT_MARGIN_FACTOR
+COVERAGE_HEIGHT = 2 * PX_PER_CM
+COVERAGE_MARGIN = 0.5 * PX_PER_CM
+
+
+def graph_format(
+    instruments: list[Instrument | StringedInst], coverage_band: bool = False
+) -> tuple[float, float]:
+    """
+    the size of make_graph without drawing it
+    """
+    width, height = calc_staff_format(instruments)
+    width = width * LINE_SPACE / 2 + 2 * MARGIN
+    height = height * LINE_SPACE / 2 + 2 * MARGIN + TITLE_FONT_SIZE + TITLE_MARGIN
+    if coverage_band:
+        height += COVERAGE_MARGIN + COVERAGE_HEIGHT
+    return width, height
+
+
+def make_graph(
+    title: str,
+    instruments: list[Instrument | StringedInst],
+    /,
+    render_column: ColumnRenderer = draw_column,
+    coverage_band: bool = False,
+) -> tuple[draw.Group, tuple[float, float]]:
+    """
+    coverage_band adds a heatmap of how many instruments can play every pitch
+    under the staff
+    """
+    with span("staff", instruments=len(instruments)) as s:
+        content, _ = generate_staff(instruments, render_column)
+        s.elements(content)
+
+    width, height = graph_format(instruments, coverage_band)
+
+    group = draw.Group()
+    # img.append(draw.Rectangle(0, 0, width, height, fill="#cccccc")) # debug
+    group.append(
+        draw.Text(
+            title,
+            x=width / 2,
+            y=MARGIN,
+            font_size=TITLE_FONT_SIZE,
+            font_family=FONT_FAMILY,
+            text_anchor="middle",
+            dominant_baseline="hanging",
+            font_weight="bold",
+        )
+    )
+    group.append(
+        draw.Group(
+            children=[content],
+            transform=f"translate({MARGIN},{1 * MARGIN + TITLE_FONT_SIZE + TITLE_MARGIN})scale({LINE_SPACE / 2})",
+        )
+    )
+    if coverage_band:
+        with span("coverage", instruments=len(instruments)):
+            band = draw_coverage(
+                coverage(instruments), width - 2 * MARGIN, COVERAGE_HEIGHT
+            )
+        group.append(translated_group(band, MARGIN, height - MARGIN - COVERAGE_HEIGHT))
+    return group, (width, height)
+
+
+def column_extents(n_instruments: int) -> list[tuple[float, float]]:
+    """
+    returns the x range of every instrument column in the coordinates of make_graph
+    """
+    extents = []
+    for i in range(n_instruments):
+        x = CLEF_OFFSET + CLEF_WIDTH + i * INST_WIDTH
+        extents.append(
+            (
+                MARGIN + x * LINE_SPACE / 2,
+                MARGIN + (x + INST_WIDTH) * LINE_SPACE / 2,
+            )
+        )
+    return extents
+
+
+def make_svg(
+    title: str,
+    instruments: list[Instrument | StringedInst],
+    /,
+    render_column: ColumnRenderer = draw_column,
+    coverage_band: bool = False,
+) -> draw.Drawing:
+    content, (width, height) = make_graph(
+        title, instruments, render_column, coverage_band
+    )
+    img = draw.Drawing(width, height)
+    img.append(content)
+    return img
+
+
+def make_split_svg(
+    title: str,
+    instruments: list[Instrument | StringedInst],
+    /,
+    margin: float = PX_PER_CM,
+    min_overlap: float = PX_PER_CM,
+    format: tuple[float, float] = A4,
+) -> list[tuple[draw.Drawing, tuple[int, int]]]:
+    content, content_format = make_graph(title, instruments)
+    return split_into_tiles(
+        content, content_format, format=format, margin=margin, min_overlap=min_overlap
+    )
+
+
+SYSTEM_MARGIN = 1 * PX_PER_CM
+ORIENTATIONS = ["portrait", "landscape", "auto"]
+
+
+def split_into_systems(
+    instruments: list[Instrument | StringedInst], columns: int
+) -> list[list[Instrument | StringedInst]]:
+    if columns < 1:
+        raise ValueError(f"a system needs at least one column, got {columns}")
+    return [instruments[i : i + columns] for i in range(0, len(instruments), columns)]
+
+
+def pack_systems(
+    heights: list[float], page_height: float, first_page_offset: float, gap: float
+) -> list[list[int]]:
+    """
+    greedily fills pages top to bottom with the systems, returns the system indices per page
+    first_page_offset is the space taken by the title on the first page
+    """
+    pages: list[list[int]] = [[]]
+    y = first_page_offset
+    for i, height in enumerate(heights):
+        if pages[-1] and y + height > page_height:
+            pages.append([])
+            y = 0.0
+        pages[-1].append(i)
+        y += height + gap
+    return pages
+
+
+def page_formats(
+    format: tuple[float, float], orientation: str | None
+) -> list[tuple[float, float]]:
+    """
+    the page formats to try for an orientation, None keeps the format as it is
+    """
+    if orientation is None:
+        return [format]
+    portrait = (min(format), max(format))
+    landscape = (max(format), min(format))
+    match orientation:
+        case "portrait":
+            return [portrait]
+        case "landscape":
+            return [landscape]
+        case "auto":
+            return [portrait, landscape]
+        case _:
+            raise ValueError(f"invalid orientation '{orientation}'")
+
+
+def make_paged_svg(
+    title: str,
+    instruments: list[Instrument | StringedInst],
+    /,
+    columns: int = 6,
+    margin: float = PX_PER_CM,
+    format: tuple[float, float] = A4,
+    orientation: str | None = None,
+) -> list[draw.Drawing]:
+    """
+    breaks the instruments into systems of `columns` instruments, each with its own clefs and
+    vertical extent, and packs the systems onto pages of the given format
+    orientation is None for the format as it is or one of ORIENTATIONS,
+    auto uses the one resulting in fewer pages
+    systems are scaled down if they do not fit, no instruments give no pages
+    """
+    formats = page_formats(format, orientation)
+    if not instruments:
+        return []
+    systems = [
+        generate_staff(system) for system in split_into_systems(instruments, columns)
+    ]
+    sizes = [(w * LINE_SPACE / 2, h * LINE_SPACE / 2) for _, (w, h) in systems]
+    title_height = TITLE_FONT_SIZE + TITLE_MARGIN
+    max_width = max(w for w, _ in sizes)
+    max_height = max(h for _, h in sizes)
+
+    layouts = []
+    for page_format in formats:
+        fill_width = page_format[0] - 2 * margin
+        fill_height = page_format[1] - 2 * margin
+        scale = min(
+            1.0, fill_width / max_width, (fill_height - title_height) / max_height
+        )
+        pages = pack_systems(
+            [h * scale for _, h in sizes], fill_height, title_height, SYSTEM_MARGIN
+        )
+        layouts.append((len(pages), -scale, page_format, scale, pages))
+    _, _, page_format, scale, pages = min(layouts, key=lambda l: l[:2])
+
+    drawings = []
+    for page_idx, page in enumerate(pages):
+        img = draw.Drawing(*page_format)
+        y = margin
+        if page_idx == 0:
+            img.append(
+                draw.Text(
+                    title,
+                    x=page_format[0] / 2,
+                    y=margin,
+                    font_size=TITLE_FONT_SIZE,
+                    font_family=FONT_FAMILY,
+                    text_anchor="middle",
+                    dominant_baseline="hanging",
+                    font_weight="bold",
+                )
+            )
+            y += title_height
+        for idx in page:
+            content, _ = systems[idx]
+            img.append(
+                draw.Group(
+                    children=[content],
+                    transform=f"translate({margin},{y})scale({scale * LINE_SPACE / 2})",
+                )
+            )
+            y += sizes[idx][1] * scale + SYSTEM_MARGIN
+        drawings.append(img)
+    return drawings
+
+
+CUT_OFFSET = 8
+MARK_STROKE_WIDTH = 1
+CUT_LINE = {
+    "stroke": "black",
+    "stroke_width": MARK_STROKE_WIDTH,
+}
+
+OVER_LAP_LINE_WIDTH = 0.3
+OVER_LAP_START_LINE = {
+    "stroke": "black",
+    "stroke_width": OVER_LAP_LINE_WIDTH,
+}
+
+
+def get_cut_mark(margin: float) -> draw.Group:
+    group = draw.Group()
+    group.append(
+        draw.Line(
+            -MARK_STROKE_WIDTH / 2,
+            -margin,
+            -MARK_STROKE_WIDTH / 2,
+            -CUT_OFFSET,
+            **CUT_LINE,
+        )
+    )
+    group.append(
+        draw.Line(
+            -margin,
+            -MARK_STROKE_WIDTH / 2,
+            -CUT_OFFSET,
+            -MARK_STROKE_WIDTH / 2,
+            **CUT_LINE,
+        )
+    )
+    return group
+
+
+def calc_tiles(
+    content_format: tuple[float, float],
+    format: tuple[float, float],
+    margin: float,
+    overlap: float,
+) -> tuple[
+    tuple[float, float], tuple[int, int], tuple[float, float], tuple[float, float]
+]:
+    fill_width_a = format[0] - 2 * margin
+    fill_height_a = format[1] - 2 * margin
+    x_tiles_a = ceil((content_format[0] - overlap) / (fill_width_a - overlap))
+    y_tiles_a = ceil((content_format[1] - overlap) / (fill_height_a - overlap))
+
+    fill_width_b = format[1] - 2 * margin
+    fill_height_b = format[0] - 2 * margin
+    x_tiles_b = ceil((content_format[0] - overlap) / (fill_width_b - overlap))
+    y_tiles_b = ceil((content_format[1] - overlap) / (fill_height_b - overlap))
+
+    if x_tiles_a * y_tiles_a <= x_tiles_b * y_tiles_b:
+        fill_width = fill_width_a
+        fill_height = fill_height_a
+        x_tiles = x_tiles_a
+        y_tiles = y_tiles_a
+    else:
+        format = (format[1], format[0])
+        fill_width = fill_width_b
+        fill_height = fill_height_b
+        x_tiles = x_tiles_b
+        y_tiles = y_tiles_b
+
+    x_offset = (
+        fill_width * x_tiles - overlap * (x_tiles - 1) - content_format[0]
+    ) / 2.0
+    y_offset = (
+        fill_height * y_tiles - overlap * (y_tiles - 1) - content_format[1]
+    ) / 2.0
+    return (
+        format,
+        (x_tiles, y_tiles),
+        (fill_width - overlap, fill_height - overlap),
+        (x_offset, y_offset),
+    )
+
+
+def calc_tile_regions(
+    content_format: tuple[float, float],
+    format: tuple[float, float],
+    margin: float,
+    overlap: float,
+) -> dict[tuple[int, int], tuple[float, float, float, float]]:
+    """
+    calculates the part (x_min, y_min, x_max, y_max) of the content which ends up
+    on every tile of split_into_tiles
+    """
+    format, (x_tiles, y_tiles), (tile_width, tile_height), (x_offset, y_offset) = (
+        calc_tiles(content_format, format, margin, overlap)
+    )
+    regions = {}
+    for x in range(x_tiles):
+        for y in range(y_tiles):
+            img_x_min = x * tile_width - x_offset - margin
+            img_y_min = y * tile_height - y_offset - margin
+            regions[(x, y)] = (
+                img_x_min,
+                img_y_min,
+                img_x_min + format[0],
+                img_y_min + format[1],
+            )
+    return regions
+
+
+@traced("tiles")
+def split_into_tiles(
+    content: draw.Group,
+    content_format: tuple[float, float],
+    /,
+    margin: float = PX_PER_CM,
+    min_overlap: float = 2.0 * PX_PER_CM,
+    format: tuple[float, float] = A4,
+    positions: Collection[tuple[int, int]] | None = None,
+) -> list[tuple[draw.Drawing, tuple[int, int]]]:
+    """
+    only the tiles at positions are made if given
+    """
+    format, (x_tiles, y_tiles), (tile_width, tile_height), (x_offset, y_offset) = (
+        calc_tiles(content_format, format, margin, min_overlap)
+    )
+
+    cut_mark = get_cut_mark(margin)
+    mask = draw.Mask()
+    mask.append(
+        draw.Rectangle(
+            margin,
+            margin,
+            format[0] - 2 * margin,
+            format[1] - 2 * margin,
+            fill="white",
+        )
+    )
+
+    tiles = []
+    for x in range(x_tiles):
+        for y in range(y_tiles):
+            if positions is not None and (x, y) not in positions:
+                continue
+            tile = draw.Drawing(*format)
+            img_x_min = x * tile_width - x_offset
+            img_y_min = y * tile_height - y_offset
+            v_x = margin - img_x_min
+            v_y = margin - img_y_min
+
+            tile.append(draw.Group(children=[translated_group(content, v_x, v_y)]))
+
+            # cut marks
+            tile.append(
+                draw.Use(
+                    cut_mark,
+                    0,
+                    0,
+                    transform=f"translate({margin},{margin}) rotate(0)",
+                )
+            )
+            tile.append(
+                draw.Use(
+                    cut_mark,
+                    0,
+                    0,
+                    transform=f"translate({format[0] - margin},{margin}) rotate(90)",
+                )
+            )
+            tile.append(
+                draw.Use(
+                    cut_mark,
+                    0,
+                    0,
+                    transform=f"translate({format[0] - margin},{format[1] - margin}) rotate(180)",
+                )
+            )
+            tile.append(
+                draw.Use(
+                    cut_mark,
+                    0,
+                    0,
+                    transform=f"translate({margin},{format[1] - margin}) rotate(-90)",
+                )
+            )
+
+            # overlap lines
+            if x != x_tiles - 1:
+                tile.append(
+                    draw.Line(
+                        margin + tile_width + OVER_LAP_LINE_WIDTH / 2,
+                        0,
+                        margin + tile_width + OVER_LAP_LINE_WIDTH / 2,
+                        format[1],
+                        **OVER_LAP_START_LINE,
+                    )
+                )
+            if y != y_tiles - 1:
+                tile.append(
+                    draw.Line(
+                        0,
+                        margin + tile_height + OVER_LAP_LINE_WIDTH / 2,
+                        format[0],
+                        margin + tile_height + OVER_LAP_LINE_WIDTH / 2,
+                        **OVER_LAP_START_LINE,
+                    )
+                )
+
+            tiles.append((tile, (x, y)))
+
+    return tiles
+
+
+def test_tiles():
+    out_format = A4[0] * 5, A4[1] * 7.5
+
+    group = draw.Group()
+    p = draw.Path(stroke="black", stroke_width=2, fill="none")
+    p.M(150, 150)
+    import random
+
+    for _ in range(40):
+        p.L(random.random() * out_format[0], random.random() * out_format[1])
+    group.append(p)
+
+    test_img = draw.Drawing(*out_format)
+    test_img.append(group)
+    test_img.save_svg("out/test.svg")
+
+    for tile, (x, y) in split_into_tiles(
+        group, out_format, format=A4, min_overlap=50, margin=20
+    ):
+        tile.save_svg(f"out/test{x}_{y}.svg")
+
+
+def from_fields(name: str, fields: dict[str, list[str]]) -> Instrument | StringedInst:
+    with span("instrument", instrument=name):
+        if "open strings" in fields:
+            return StringedInst.from_strs(name, fields)
+        return Instrument.from_strs(name, fields)
+
+
+def from_names(names: list[str]) -> list[Instrument | StringedInst]:
+    return [from_fields(*parse(f"{name}.txt")) for name in names]
+
+
+def from_str(definition: str) -> Instrument | StringedInst:
+    """
+    the instrument of a definition in the format of the instrument files
+    """
+    return from_fields(*parse_str(definition))
@@ -0,0 +1,252 @@
+import os
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools import chain, islice
+
+import cairocffi as cairo
+import cairosvg
+import drawsvg as draw
+from cairosvg.parser import Tree
+from cairosvg.surface import PDFSurface
+
+from .chart import A4, PX_PER_CM, graph_format, make_graph, split_into_tiles
+from .deps import (
+    column_keys,
+    load_manifest,
+    region_key,
+    save_manifest,
+    shared_key,
+    tile_dependencies,
+)
+from .inst_graph import Instrument, StringedInst
+from .trace import span
+
+DPI = 96
+
+
+def to_svg_bytes(img: draw.Drawing) -> bytes:
+    with span("serialize") as s:
+        data = img.as_svg().encode("utf-8")
+        s.set(bytes=len(data))
+    return data
+
+
+def save_as_pdf(img: draw.Drawing, path: str) -> None:
+    svg_to_pdf((to_svg_bytes(img), path))
+
+
+def tile_label(pos: tuple[int, int]) -> str:
+    x, y = pos
+    return f"{x}_{y}"
+
+
+def tile_path(prefix: str, pos: tuple[int, int]) -> str:
+    return f"{prefix}_{tile_label(pos)}.pdf"
+
+
+def serialize(
+    images: Iterable[tuple[draw.Drawing, str]],
+) -> Iterator[tuple[bytes, str]]:
+    """
+    serializes the drawings one by one as they are needed
+    """
+    return ((to_svg_bytes(img), path) for img, path in images)
+
+
+def svg_to_pdf(job: tuple[bytes, str]) -> str:
+    data, path = job
+    with span("convert", format="pdf", bytes=len(data)):
+        cairosvg.svg2pdf(bytestring=data, write_to=path)
+    return path
+
+
+def svg_to_png(job: tuple[bytes, str]) -> str:
+    data, path = job
+    with span("convert", format="png", bytes=len(data)):
+        cairosvg.svg2png(bytestring=data, write_to=path, background_color="white")
+    return path
+
+
+def svg_to_pdf_bytes(data: bytes) -> bytes:
+    with span("convert", format="pdf", bytes=len(data)):
+        return cairosvg.svg2pdf(bytestring=data)
+
+
+def svg_to_png_bytes(data: bytes) -> bytes:
+    with span("convert", format="png", bytes=len(data)):
+        return cairosvg.svg2png(bytestring=data, background_color="white")
+
+
+def run_jobs(
+    convert: Callable[[tuple[bytes, str]], str],
+    jobs: Iterable[tuple[bytes, str]],
+    workers: int | None,
+) -> list[str]:
+    """
+    runs the conversion of (svg bytes, output path) jobs in a process pool
+    workers=None uses one process per cpu, workers=1 converts in this process
+    the jobs are taken from the iterable as workers become free, so a generator
+    is never held in memory as a whole
+    returns the written paths in the order of the input
+    """
+    jobs = iter(jobs)
+    first = list(islice(jobs, 2))
+    if workers == 1 or len(first) <= 1:
+        return [convert(job) for job in chain(first, jobs)]
+    in_flight = 2 * (workers or os.cpu_count() or 1)
+    written = []
+    pending: deque[Future[str]] = deque()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for job in chain(first, jobs):
+            if len(pending) >= in_flight:
+                written.append(pending.popleft().result())
+            pending.append(pool.submit(convert, job))
+        written.extend(future.result() for future in pending)
+    return written
+
+
+def save_many_as_pdf(
+    images: Iterable[tuple[draw.Drawing, str]], /, workers: int | None = None
+) -> list[str]:
+    """
+    converts the images to pdf in a process pool
+    the drawings are serialized here so only bytes are sent to the workers
+    """
+    return run_jobs(svg_to_pdf, serialize(images), workers)
+
+
+def save_many_as_png(
+    images: Iterable[tuple[draw.Drawing, str]], /, workers: int | None = None
+) -> list[str]:
+    """
+    converts the images to png in a process pool
+    """
+    return run_jobs(svg_to_png, serialize(images), workers)
+
+
+def save_poster_as_pdf(
+    img: draw.Drawing,
+    tiles: list[tuple[draw.Drawing, tuple[int, int]]],
+    prefix: str,
+    /,
+    workers: int | None = None,
+) -> list[str]:
+    """
+    writes the full chart to {prefix}.pdf and every tile to {prefix}_{x}_{y}.pdf
+    """
+    images = [(img, f"{prefix}.pdf")]
+    images.extend(
+        (tile, tile_path(prefix, pos))
+        for tile, pos in sorted(tiles, key=lambda t: t[1])
+    )
+    return save_many_as_pdf(images, workers=workers)
+
+
+def save_poster_incremental(
+    title: str,
+    instruments: list[Instrument | StringedInst],
+    prefix: str,
+    /,
+    margin: float = PX_PER_CM,
+    min_overlap: float = 2.0 * PX_PER_CM,
+    format: tuple[float, float] = A4,
+    workers: int | None = None,
+) -> list[str]:
+    """
+    writes the same files as save_poster_as_pdf but only draws and converts the chart
+    and the tiles whose columns or shared elements changed since the last run
+    the keys of the last run are kept in {prefix}_manifest.json
+    returns the written paths
+    """
+    content_format = graph_format(instruments)
+    shared = shared_key(title, instruments, content_format, margin, min_overlap, format)
+    columns = column_keys(instruments)
+    manifest_path = f"{prefix}_manifest.json"
+    old_manifest = load_manifest(manifest_path)
+
+    def changed(name: str, path: str) -> bool:
+        return old_manifest.get(name) != manifest[name] or not os.path.exists(path)
+
+    manifest = {"full": region_key(shared, columns, list(range(len(columns))))}
+    dependencies = tile_dependencies(
+        len(instruments), content_format, format, margin, min_overlap
+    )
+    positions = set()
+    for pos, used in dependencies.items():
+        name = tile_label(pos)
+        manifest[name] = region_key(shared, columns, used, *pos)
+        if changed(name, tile_path(prefix, pos)):
+            positions.add(pos)
+
+    images = []
+    if positions or changed("full", f"{prefix}.pdf"):
+        content, _ = make_graph(title, instruments)
+        if changed("full", f"{prefix}.pdf"):
+            img = draw.Drawing(*content_format)
+            img.append(content)
+            images.append((img, f"{prefix}.pdf"))
+        tiles = split_into_tiles(
+            content,
+            content_format,
+            margin=margin,
+            min_overlap=min_overlap,
+            format=format,
+            positions=positions,
+        )
+        images.extend(
+            (tile, tile_path(prefix, pos))
+            for tile, pos in sorted(tiles, key=lambda t: t[1])
+        )
+
+    for name in old_manifest.keys() - manifest.keys():
+        path = f"{prefix}_{name}.pdf"
+        if os.path.exists(path):
+            os.remove(path)
+
+    written = save_many_as_pdf(images, workers=workers)
+    save_manifest(manifest_path, manifest)
+    return written
+
+
+# _PageSurface replaces how cairosvg creates and finishes its surface, which is not
+# public API, so pyproject pins cairosvg to the releases it is known to work with
+if not hasattr(PDFSurface, "_create_surface"):
+    raise ImportError("cairosvg.surface.PDFSurface has no _create_surface anymore")
+
+
+class _PageSurface(PDFSurface):
+    """
+    draws a svg tree onto the current page of an already open pdf document
+    instead of creating a new document per svg
+    """
+
+    def __init__(self, document: cairo.PDFSurface, tree: Tree) -> None:
+        self.document = document
+        super().__init__(tree, None, DPI)
+
+    def _create_surface(self, width, height):
+        self.document.set_size(width, height)
+        return self.document, width, height
+
+    def finish(self):
+        self.document.show_page()
+
+
+def save_tiles_as_pdf(
+    tiles: list[tuple[draw.Drawing, tuple[int, int]]], path: str
+) -> None:
+    """
+    writes all tiles as pages of a single pdf ordered by their (x, y) position
+    fonts and other resources are embedded once for the whole document
+    """
+    tiles = sorted(tiles, key=lambda t: t[1])
+    # the size is overwritten for every page
+    document = cairo.PDFSurface(path, 1, 1)
+    for tile, pos in tiles:
+        data = to_svg_bytes(tile)
+        with span("convert", format="pdf", bytes=len(data)):
+            tree = Tree(bytestring=data)
+            document.set_page_label(tile_label(pos))
+            _PageSurface(document, tree).finish()
+    document.finish()
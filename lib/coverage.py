@@ -0,0 +1,268 @@
+# How many instruments of an ensemble can play every sounding pitch.
+#
+#   python -m lib.coverage insts/fl insts/cl insts/tp [--csv OUT.csv] [--svg OUT.svg]
+#
+# The ranges of every instrument are merged and turned into start and end events
+# bucketed by midi pitch, which are swept once from the lowest to the highest pitch.
+# Pitches between two events share their players, so the work grows with the number
+# of ranges and not with the number of instruments times pitches.
+# A pitch nobody can play between the lowest and the highest pitch is a hole.
+
+import argparse
+import csv
+import sys
+from collections import defaultdict
+from typing import IO
+from weakref import WeakKeyDictionary
+
+import drawsvg as draw
+
+from .elements import FONT_FAMILY, PX_PER_CM
+from .inst_graph import Instrument, StringedInst
+from .music import Pitch
+
+# (midi pitch, players, players in a preferred range, indices of the players)
+type PitchCoverage = tuple[int, int, int, tuple[int, ...]]
+
+CELL_WIDTH = 0.3 * PX_PER_CM
+HOLE_COLOR = "#cc0000"
+LABEL_SIZE = 8
+# midi pitches of synthetic instruments can be negative
+MIDI_OFFSET = 128
+
+
+def sounding_ranges(inst: Instrument | StringedInst) -> list[tuple[int, int, bool]]:
+    """
+    the sounding midi pitches of the ranges as (lowest, highest, preferred)
+    """
+    shift = inst.transposition.to_halftones()
+    if isinstance(inst, StringedInst):
+        steps = [
+            (r.start.to_halftones(), r.end.to_halftones(), r.preferred)
+            for r in inst.ranges
+        ]
+        return [
+            (base + low, base + high, preferred)
+            for base in [s.to_midi_pitch() + shift for s in inst.open_strings]
+            for low, high, preferred in steps
+        ]
+    return [
+        (r.start.to_midi_pitch() + shift, r.end.to_midi_pitch() + shift, r.preferred)
+        for r in inst.ranges
+    ]
+
+
+def merged(intervals: list[tuple[int, int]]) -> list[tuple[int, int]]:
+    """
+    the union of inclusive pitch intervals as disjoint intervals
+    """
+    out: list[tuple[int, int]] = []
+    for low, high in sorted(intervals):
+        if out and low <= out[-1][1] + 1:
+            out[-1] = (out[-1][0], max(out[-1][1], high))
+        else:
+            out.append((low, high))
+    return out
+
+
+# instruments are not changed after they are parsed, the watch mode parses new ones
+_intervals: WeakKeyDictionary = WeakKeyDictionary()
+
+
+def playable(
+    inst: Instrument | StringedInst,
+) -> tuple[list[tuple[int, int]], list[tuple[int, int]]]:
+    """
+    the merged intervals of all and of the preferred sounding pitches
+    cached, so interactive tools only pay for the sweep
+    """
+    if inst not in _intervals:
+        ranges = sounding_ranges(inst)
+        _intervals[inst] = (
+            merged([(low, high) for low, high, _ in ranges]),
+            merged([(low, high) for low, high, preferred in ranges if preferred]),
+        )
+    return _intervals[inst]
+
+
+def pitch_masks(inst: Instrument | StringedInst) -> tuple[int, int]:
+    """
+    all and the preferred sounding pitches as bits of integers,
+    bit MIDI_OFFSET + p stands for the midi pitch p
+    """
+    masks = []
+    for intervals in playable(inst):
+        mask = 0
+        for low, high in intervals:
+            mask |= (1 << (high + 1 + MIDI_OFFSET)) - (1 << (low + MIDI_OFFSET))
+        masks.append(mask)
+    return masks[0], masks[1]
+
+
+def coverage(instruments: list[Instrument | StringedInst]) -> list[PitchCoverage]:
+    """
+    the coverage of every pitch from the lowest to the highest sounding pitch
+    an instrument with overlapping ranges, like the strings of a guitar, counts once
+    """
+    # midi pitches are small integers, so bucketing replaces sorting the events
+    starts: dict[int, list[int]] = defaultdict(list)
+    ends: dict[int, list[int]] = defaultdict(list)
+    preferred_delta: dict[int, int] = defaultdict(int)
+    for i, inst in enumerate(instruments):
+        # merged per instrument, so an instrument starts and ends once per interval
+        all_pitches, preferred = playable(inst)
+        for low, high in all_pitches:
+            starts[low].append(i)
+            ends[high + 1].append(i)
+        for low, high in preferred:
+            preferred_delta[low] += 1
+            preferred_delta[high + 1] -= 1
+
+    players: set[int] = set()
+    n_preferred = 0
+    rows: list[PitchCoverage] = []
+    pitches = sorted(starts.keys() | ends.keys() | preferred_delta.keys())
+    for pitch, next_pitch in zip(pitches, pitches[1:]):
+        players.difference_update(ends.get(pitch, ()))
+        players.update(starts.get(pitch, ()))
+        n_preferred += preferred_delta.get(pitch, 0)
+        active = tuple(sorted(players))
+        rows.extend(
+            (p, len(active), n_preferred, active) for p in range(pitch, next_pitch)
+        )
+    return rows
+
+
+def holes(rows: list[PitchCoverage]) -> list[tuple[int, int]]:
+    """
+    the runs of pitches without players as (lowest, highest)
+    """
+    runs: list[tuple[int, int]] = []
+    for pitch, players, _, _ in rows:
+        if players:
+            continue
+        if runs and runs[-1][1] == pitch - 1:
+            runs[-1] = (runs[-1][0], pitch)
+        else:
+            runs.append((pitch, pitch))
+    return runs
+
+
+def pitch_name(midi: int) -> str:
+    return Pitch.from_midi_pitch(midi).display_name()
+
+
+def write_csv(
+    rows: list[PitchCoverage], instruments: list[Instrument | StringedInst], file: IO
+) -> None:
+    writer = csv.writer(file)
+    writer.writerow(["midi", "pitch", "players", "preferred", "instruments"])
+    for pitch, players, preferred, indices in rows:
+        names = ";".join(instruments[i].name for i in indices)
+        writer.writerow(
+            [pitch, str(Pitch.from_midi_pitch(pitch)), players, preferred, names]
+        )
+
+
+def draw_coverage(rows: list[PitchCoverage], width: float, height: float) -> draw.Group:
+    """
+    a heatmap from the lowest pitch on the left to the highest on the right
+    the upper half shows all players, the lower half the preferred ones,
+    the octaves are labeled below
+    """
+    group = draw.Group()
+    if not rows:
+        return group
+    cell = width / len(rows)
+    band = height - LABEL_SIZE * 1.5
+    most = max(players for _, players, _, _ in rows)
+    for i, (pitch, players, preferred, _) in enumerate(rows):
+        x = i * cell
+        if players == 0:
+            group.append(draw.Rectangle(x, 0, cell, band, fill=HOLE_COLOR))
+        else:
+            group.append(
+                draw.Rectangle(x, 0, cell, band / 2, fill_opacity=players / most)
+            )
+            group.append(
+                draw.Rectangle(
+                    x, band / 2, cell, band / 2, fill_opacity=preferred / most
+                )
+            )
+        if pitch % 12 == 0:
+            group.append(
+                draw.Text(
+                    pitch_name(pitch),
+                    font_size=LABEL_SIZE,
+                    x=x,
+                    y=band + LABEL_SIZE * 0.25,
+                    font_family=FONT_FAMILY,
+                    dominant_baseline="hanging",
+                )
+            )
+    group.append(
+        draw.Rectangle(0, 0, width, band, fill="none", stroke="black", stroke_width=0.5)
+    )
+    return group
+
+
+def coverage_svg(
+    title: str, instruments: list[Instrument | StringedInst]
+) -> draw.Drawing:
+    rows = coverage(instruments)
+    margin = PX_PER_CM
+    width = max(len(rows) * CELL_WIDTH, 10 * PX_PER_CM)
+    height = 3 * PX_PER_CM
+    img = draw.Drawing(width + 2 * margin, height + 2 * margin + LABEL_SIZE * 2)
+    img.append(
+        draw.Text(
+            title,
+            font_size=LABEL_SIZE * 1.5,
+            x=margin,
+            y=margin,
+            font_family=FONT_FAMILY,
+            font_weight="bold",
+            dominant_baseline="hanging",
+        )
+    )
+    band = draw_coverage(rows, width, height)
+    img.append(
+        draw.Group(
+            children=[band], transform=f"translate({margin} {margin + LABEL_SIZE * 2})"
+        )
+    )
+    return img
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="how many instruments can play every pitch"
+    )
+    parser.add_argument("instruments", nargs="+", help="instrument names like insts/fl")
+    parser.add_argument("--csv", help="write the coverage of every pitch to this file")
+    parser.add_argument("--svg", help="write the heatmap to this file")
+    parser.add_argument("--title", default="Coverage")
+    args = parser.parse_args(argv)
+
+    # chart draws the coverage band, so it can not be imported at the top
+    from .chart import from_names
+
+    instruments = from_names(args.instruments)
+    rows = coverage(instruments)
+    if rows:
+        print(f"from {pitch_name(rows[0][0])} to {pitch_name(rows[-1][0])}")
+    for low, high in holes(rows):
+        label = (
+            pitch_name(low) if low == high else f"{pitch_name(low)}-{pitch_name(high)}"
+        )
+        print(f"hole: {label}")
+    if args.csv:
+        with open(args.csv, encoding="utf8", mode="w", newline="") as file:
+            write_csv(rows, instruments, file)
+    if args.svg:
+        coverage_svg(args.title, instruments).save_svg(args.svg)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
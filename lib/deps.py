@@ -0,0 +1,115 @@
+# Keys describing which inputs an output region of a chart depends on.
+# A region only depends on the elements shared by the whole chart and the
+# instrument columns it overlaps, so editing one instrument only changes the
+# keys of the regions showing that instrument.
+
+import hashlib
+import json
+import os
+
+from . import chart, elements, inst_graph
+from .chart import calc_staff_extents, calc_tile_regions, column_extents
+from .inst_graph import Instrument, StringedInst
+from .metrics import font_fingerprint
+
+# bump when the rendering changes in a way not reflected by the layout constants
+RENDER_VERSION = 1
+
+
+def layout_constants() -> dict[str, object]:
+    """
+    all upper case module level values of the modules defining the layout
+    """
+    constants: dict[str, object] = {}
+    for module in [elements, inst_graph, chart]:
+        for name, value in vars(module).items():
+            if name.isupper() and isinstance(value, (int, float, str, tuple)):
+                constants[f"{module.__name__}.{name}"] = value
+    return constants
+
+
+def stable_hash(value) -> str:
+    hasher = hashlib.sha256()
+    hasher.update(json.dumps(value).encode("utf-8"))
+    return hasher.hexdigest()
+
+
+def shared_key(
+    title: str,
+    instruments: list[Instrument | StringedInst],
+    content_format: tuple[float, float],
+    *options,
+) -> str:
+    """
+    key of everything drawn across all columns: title, staff lines, clefs and bar lines
+    the layout constants and fonts are included, as they change every region
+    """
+    return stable_hash(
+        [
+            RENDER_VERSION,
+            title,
+            content_format,
+            calc_staff_extents(instruments),
+            layout_constants(),
+            font_fingerprint(),
+            options,
+        ]
+    )
+
+
+def column_keys(instruments: list[Instrument | StringedInst]) -> list[str]:
+    return [stable_hash(str(inst)) for inst in instruments]
+
+
+def intersecting_columns(
+    extents: list[tuple[float, float]], x_min: float, x_max: float
+) -> list[int]:
+    """
+    indices of the columns overlapping [x_min, x_max]
+    the range is widened by one column to the left as descriptions can overflow into the next column
+    """
+    out = []
+    for i, (c_min, c_max) in enumerate(extents):
+        spill = c_max - c_min
+        if c_min < x_max and c_max + spill > x_min:
+            out.append(i)
+    return out
+
+
+def tile_dependencies(
+    n_instruments: int,
+    content_format: tuple[float, float],
+    format: tuple[float, float],
+    margin: float,
+    overlap: float,
+) -> dict[tuple[int, int], list[int]]:
+    """
+    the columns shown on every tile of split_into_tiles
+    the shared elements are part of every tile
+    """
+    extents = column_extents(n_instruments)
+    return {
+        pos: intersecting_columns(extents, x_min, x_max)
+        for pos, (x_min, _, x_max, _) in calc_tile_regions(
+            content_format, format, margin, overlap
+        ).items()
+    }
+
+
+def region_key(shared: str, columns: list[str], used: list[int], *position) -> str:
+    return stable_hash([shared, [(i, columns[i]) for i in used], position])
+
+
+def load_manifest(path: str) -> dict[str, str]:
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, encoding="utf8") as file:
+            return json.load(file)
+    except ValueError:
+        return {}
+
+
+def save_manifest(path: str, manifest: dict[str, str]) -> None:
+    with open(path, encoding="utf8", mode="w") as file:
+        json.dump(manifest, file, indent=1, sort_keys=True)
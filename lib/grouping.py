@@ -0,0 +1,202 @@
+# Groups a catalog into charts of instruments with similar ranges, so every chart
+# has a short staff and needs fewer tiles.
+#
+#   python -m lib.grouping insts voice [-n 8] [-o groups.json]
+#
+# The arguments are instrument names or directories of instrument files, the groups
+# are written as a manifest for lib.build.
+# The sounding pitches of an instrument are a bitset over midi pitches. A row of the
+# overlap matrix is counted at once: every pitch is an integer with a 16 bit field
+# per bitset, adding the integers of the pitches of a bitset counts the pitches it
+# shares with all bitsets in a few big integer additions. Catalogs repeat ranges a
+# lot, the matrix is only computed between different bitsets.
+# The instruments are ordered by their lowest and highest staff position and cut
+# into consecutive groups, the cuts minimize the summed staff height of all charts,
+# which is what makes a chart small. Of cuts with the same height, the one keeping
+# the most similar instruments together is taken.
+
+import argparse
+import json
+import os
+import sys
+from array import array
+from collections import defaultdict
+
+from .catalog import expand_names
+from .chart import calc_highest_line, calc_lowest_line, from_names
+from .coverage import pitch_masks
+from .inst_graph import Instrument, StringedInst
+
+MAX_SIZE = 8
+# bits per count in the packed rows of overlap_matrix, the size of an array "H" item
+FIELD = 16
+
+
+def pitch_mask(inst: Instrument | StringedInst) -> int:
+    """
+    the sounding pitches of an instrument as bits of an integer
+    """
+    return pitch_masks(inst)[0]
+
+
+def unpack(packed: int, n: int) -> array:
+    """
+    the n FIELD bit fields of a packed integer, the lowest first
+    """
+    return array("H", packed.to_bytes(n * FIELD // 8, sys.byteorder))
+
+
+def overlap_matrix(masks: list[int]) -> list[list[float]]:
+    """
+    the jaccard similarity of every pair of bitsets, shared pitches over all pitches
+    """
+    n = len(masks)
+    # every pitch as an integer with a field per bitset which is 1 if it has the pitch,
+    # the sum of the pitches of a bitset counts the pitches shared with every bitset
+    pitches: dict[int, int] = defaultdict(int)
+    for j, mask in enumerate(masks):
+        field = 1 << (FIELD * j)
+        while mask:
+            low = mask & -mask
+            pitches[low.bit_length()] |= field
+            mask ^= low
+    sizes = [mask.bit_count() for mask in masks]
+    packed_sizes = sum(size << (FIELD * j) for j, size in enumerate(sizes))
+    ones = ((1 << (FIELD * n)) - 1) // ((1 << FIELD) - 1)
+
+    matrix = []
+    for i, mask in enumerate(masks):
+        shared = 0
+        while mask:
+            low = mask & -mask
+            shared += pitches[low.bit_length()]
+            mask ^= low
+        union = sizes[i] * ones + packed_sizes - shared
+        matrix.append(
+            [s / u if u else 1.0 for s, u in zip(unpack(shared, n), unpack(union, n))]
+        )
+    return matrix
+
+
+def similarity(
+    instruments: list[Instrument | StringedInst],
+) -> tuple[list[int], list[list[float]]]:
+    """
+    the overlap matrix between the different ranges of the instruments
+    and for every instrument the row of its range in the matrix
+    """
+    rows: dict[int, int] = {}
+    index = [rows.setdefault(pitch_mask(inst), len(rows)) for inst in instruments]
+    return index, overlap_matrix(list(rows))
+
+
+def staff_height(min_spos: int, max_spos: int) -> int:
+    return calc_highest_line(max_spos)[0] - calc_lowest_line(min_spos)[0]
+
+
+def group_instruments(
+    instruments: list[Instrument | StringedInst], /, max_size: int = MAX_SIZE
+) -> list[list[Instrument | StringedInst]]:
+    """
+    splits the instruments into groups of at most max_size which can be passed to
+    make_graph, with the smallest summed staff height, every group from high to low
+    of the groupings with the same height the one with the most similar groups is taken
+    """
+    if not instruments:
+        return []
+    extents = [
+        (
+            inst.min_sounding_pitch().to_staff_position(),
+            inst.max_sounding_pitch().to_staff_position(),
+        )
+        for inst in instruments
+    ]
+    order = sorted(range(len(instruments)), key=lambda i: extents[i])
+    index, matrix = similarity(instruments)
+    rows = [matrix[index[i]] for i in order]
+    columns = [index[i] for i in order]
+
+    # best[k] is the smallest height of the first k instruments in order and the
+    # negated similarity of the pairs in their groups, cut[k] where the last group starts
+    best = [(0, 0.0)] + [(sys.maxsize, 0.0)] * len(order)
+    cut = [0] * (len(order) + 1)
+    for end in range(1, len(order) + 1):
+        low, high = sys.maxsize, -sys.maxsize
+        pairs = 0.0
+        for start in range(end - 1, max(end - max_size, 0) - 1, -1):
+            low = min(low, extents[order[start]][0])
+            high = max(high, extents[order[start]][1])
+            row = rows[start]
+            pairs += sum(row[columns[k]] for k in range(start + 1, end))
+            cost = (
+                best[start][0] + staff_height(low, high),
+                best[start][1] - pairs,
+            )
+            if cost < best[end]:
+                best[end], cut[end] = cost, start
+
+    groups = []
+    end = len(order)
+    while end > 0:
+        members = order[cut[end] : end]
+        members.sort(key=lambda i: extents[i][::-1], reverse=True)
+        groups.append([instruments[i] for i in members])
+        end = cut[end]
+    return groups[::-1]
+
+
+def cohesion(group: list[Instrument | StringedInst]) -> float:
+    """
+    the mean similarity of the pairs in a group
+    """
+    index, matrix = similarity(group)
+    pairs = [(a, b) for a in range(len(group)) for b in range(a + 1, len(group))]
+    if not pairs:
+        return 1.0
+    return sum(matrix[index[a]][index[b]] for a, b in pairs) / len(pairs)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="groups instruments with similar ranges into charts"
+    )
+    parser.add_argument(
+        "instruments", nargs="+", help="instrument names or directories"
+    )
+    parser.add_argument("-n", "--max-size", type=int, default=MAX_SIZE)
+    parser.add_argument("-o", "--out", help="write the groups as a JSON manifest")
+    parser.add_argument("--outputs", nargs="+", default=["pdf"])
+    args = parser.parse_args(argv)
+
+    names = expand_names(args.instruments)
+    instruments = from_names(names)
+    position = {id(inst): i for i, inst in enumerate(instruments)}
+    groups = group_instruments(instruments, max_size=args.max_size)
+
+    charts = []
+    root = os.path.dirname(args.out) if args.out else "."
+    for n, group in enumerate(groups, start=1):
+        members = [position[id(inst)] for inst in group]
+        low = min(inst.min_sounding_pitch().to_staff_position() for inst in group)
+        high = max(inst.max_sounding_pitch().to_staff_position() for inst in group)
+        print(
+            f"group_{n}: {len(group)} instruments, staff height {staff_height(low, high)}, "
+            f"similarity {cohesion(group):.2f}: "
+            f"{', '.join(inst.name for inst in group)}"
+        )
+        charts.append(
+            {
+                "name": f"group_{n}",
+                "title": f"{group[0].name} to {group[-1].name}",
+                "instruments": [os.path.relpath(names[i], root) for i in members],
+                "outputs": args.outputs,
+            }
+        )
+    if args.out:
+        with open(args.out, encoding="utf8", mode="w") as file:
+            json.dump({"chart": charts}, file, indent=1)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,3 +1,5 @@
+from collections.abc import Sequence
+
 import drawsvg as draw
 
 from .music import Interval, Pitch, RelativeRange, AbsoluteRange
@@ -12,6 +14,8 @@ from .elements import (
     FONT_FAMILY,
     TEXT_MARGIN_FACTOR,
 )
+from .metrics import fit_text, text_width
+from .trace import span, traced
 from .utils import length, sub, add, mult
 
 
@@ -139,17 +143,7 @@ class StringedInst:
 
         notes = draw.Group()
         group.append(notes)
-        group.append(
-            draw.Text(
-                self.name,
-                x=INST_MARGIN,
-                y=y_min - INST_TITLE_MARGIN,
-                font_size=INST_TITLE_MARGIN,
-                text_anchor="start",
-                font_family=FONT_FAMILY,
-                font_weight="bold",
-            )
-        )
+        group.append(draw_title(self.name, y_min - INST_TITLE_MARGIN))
 
         for xs, sposs, accs in zip(center_xs, staff_positions, accidentals):
             for x, full, spos, acc in zip(xs, fills, sposs, accs):
@@ -184,41 +178,12 @@ class StringedInst:
             )
         group.append(lines)
 
-        description = draw.Group()
-        start_x, end_x, text_x = TEXT_SIZE * 1.5, TEXT_SIZE * 4.5, TEXT_SIZE * 7.5
-        for i, r in enumerate(reversed(self.ranges)):
-            y = y_max + TEXT_MARGIN + i * LINE_HEIGHT
-            description.append(
-                draw.Text(
-                    r.start.display_name(),
-                    x=start_x,
-                    y=y,
-                    font_weight="bold",
-                    **TEXT_KWARGS,
-                )
-            )
-            description.append(
-                draw.Text(
-                    r.end.display_name(),
-                    x=end_x,
-                    y=y,
-                    font_weight="bold",
-                    **TEXT_KWARGS,
-                )
-            )
-            font_style = "italic" if not r.preferred else ""
-            description.append(
-                draw.Text(
-                    r.descr,
-                    x=text_x,
-                    y=y,
-                    **TEXT_KWARGS,
-                    font_style=font_style,
-                )
-            )
-        group.append(description)
+        group.append(draw_description(self.ranges, y_max + TEXT_MARGIN))
         return group
 
+    def description_lines(self) -> int:
+        return count_description_lines(self.ranges)
+
 
 class Instrument:
     def __init__(
@@ -255,10 +220,8 @@ class Instrument:
         return self.ranges[-1].end.transposed(self.transposition)
 
     def get_sounding_pitch_ranges(self) -> list[AbsoluteRange]:
-        out = []
-        for r in self.ranges:
-            out.append(r.transposed(self.transposition))
-        return out
+        with span("sounding_ranges", instrument=self.name):
+            return [r.transposed(self.transposition) for r in self.ranges]
 
     @classmethod
     def from_strs(cls, name: str, fields: dict[str, list[str]]):
@@ -288,52 +251,15 @@ class Instrument:
         group.append(draw_notes(pitches, preferred, positions, accidentals))
         group.append(draw_range_lines(pitches, positions))
 
+        group.append(draw_title(self.name, y_min - INST_TITLE_MARGIN))
         group.append(
-            draw.Text(
-                self.name,
-                x=INST_MARGIN,
-                y=y_min - INST_TITLE_MARGIN,
-                font_size=INST_TITLE_MARGIN,
-                text_anchor="start",
-                font_family=FONT_FAMILY,
-                font_weight="bold",
-            )
+            draw_description(self.get_sounding_pitch_ranges(), y_max + TEXT_MARGIN)
         )
-        description = draw.Group()
-        start_x, end_x, text_x = TEXT_SIZE * 1.5, TEXT_SIZE * 4.5, TEXT_SIZE * 7.5
-        for i, r in enumerate(reversed(self.get_sounding_pitch_ranges())):
-            y = y_max + TEXT_MARGIN + i * LINE_HEIGHT
-            description.append(
-                draw.Text(
-                    r.start.display_name(),
-                    x=start_x,
-                    y=y,
-                    font_weight="bold",
-                    **TEXT_KWARGS,
-                )
-            )
-            description.append(
-                draw.Text(
-                    r.end.display_name(),
-                    x=end_x,
-                    y=y,
-                    font_weight="bold",
-                    **TEXT_KWARGS,
-                )
-            )
-            font_style = "italic" if not r.preferred else ""
-            description.append(
-                draw.Text(
-                    r.descr,
-                    x=text_x,
-                    y=y,
-                    **TEXT_KWARGS,
-                    font_style=font_style,
-                )
-            )
-        group.append(description)
         return group
 
+    def description_lines(self) -> int:
+        return count_description_lines(self.ranges)
+
 
 INST_WIDTH = 60.0
 INST_MARGIN = 4.0
@@ -349,10 +275,89 @@ TEXT_KWARGS = {
     "text_anchor": "start",
 }
 TEXT_MARGIN = TEXT_SIZE * TEXT_MARGIN_FACTOR
+DESCR_X = TEXT_SIZE * 7.5
+DESCR_WIDTH = INST_WIDTH - DESCR_X - INST_MARGIN
+MIN_TEXT_SIZE = TEXT_SIZE * 0.8
 
 SMALL_STROKE_WIDTH = 0.2
 
 
+def draw_title(name: str, y: float) -> draw.Text:
+    """
+    the instrument name is shrunk if it is wider than the column
+    """
+    font_size = INST_TITLE_MARGIN
+    width = text_width(name, font_size, bold=True)
+    if width > INST_WIDTH - 2 * INST_MARGIN:
+        font_size *= (INST_WIDTH - 2 * INST_MARGIN) / width
+    return draw.Text(
+        name,
+        x=INST_MARGIN,
+        y=y,
+        font_size=font_size,
+        text_anchor="start",
+        font_family=FONT_FAMILY,
+        font_weight="bold",
+    )
+
+
+def fit_description(r: AbsoluteRange | RelativeRange) -> tuple[list[str], float]:
+    return fit_text(
+        r.descr, DESCR_WIDTH, TEXT_SIZE, MIN_TEXT_SIZE, italic=not r.preferred
+    )
+
+
+def count_description_lines(ranges: Sequence[AbsoluteRange | RelativeRange]) -> int:
+    return sum(len(fit_description(r)[0]) for r in ranges)
+
+
+def draw_description(
+    ranges: Sequence[AbsoluteRange | RelativeRange], y_0: float
+) -> draw.Group:
+    """
+    one row per range starting with the highest, descriptions that do not fit
+    into the column are shrunk or wrapped onto multiple lines
+    """
+    description = draw.Group()
+    start_x, end_x = TEXT_SIZE * 1.5, TEXT_SIZE * 4.5
+    line = 0
+    for r in reversed(ranges):
+        y = y_0 + line * LINE_HEIGHT
+        description.append(
+            draw.Text(
+                r.start.display_name(),
+                x=start_x,
+                y=y,
+                font_weight="bold",
+                **TEXT_KWARGS,
+            )
+        )
+        description.append(
+            draw.Text(
+                r.end.display_name(),
+                x=end_x,
+                y=y,
+                font_weight="bold",
+                **TEXT_KWARGS,
+            )
+        )
+        font_style = "italic" if not r.preferred else ""
+        lines, font_size = fit_description(r)
+        text_kwargs = TEXT_KWARGS | {"font_size": font_size}
+        for i, text in enumerate(lines):
+            description.append(
+                draw.Text(
+                    text,
+                    x=DESCR_X,
+                    y=y + i * LINE_HEIGHT,
+                    **text_kwargs,
+                    font_style=font_style,
+                )
+            )
+        line += len(lines)
+    return description
+
+
 def calc_note_heads_relative(
     ranges: list[RelativeRange],
 ) -> tuple[list[Interval], list[bool]]:
@@ -410,6 +415,7 @@ def calc_note_heads(ranges: list[AbsoluteRange]) -> tuple[list[Pitch], list[bool
     return pitches, preferred
 
 
+@traced("find_accidentals")
 def find_accidentals(pitches: list[Pitch]) -> list[str]:
     accidentals = []
     for i in range(len(pitches)):
@@ -431,6 +437,7 @@ def find_accidentals(pitches: list[Pitch]) -> list[str]:
     return accidentals
 
 
+@traced("calc_positions")
 def calc_positions(
     pitches: list[Pitch], accidentals: list[str], x_0: float, x_max: float
 ) -> list[float]:
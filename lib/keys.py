@@ -0,0 +1,294 @@
+# Ranks the transpositions of a piece by how well its parts fit an ensemble.
+#
+#   python -m lib.keys piece.mid voice/soprano voice/alto voice/tenor voice/bass
+#   python -m lib.keys "C4:G5,A3:D5,C3:G4,E2:C4" voice/soprano voice/alto ...
+#   python -m lib.keys pieces voice/soprano ... [-o keys.csv] [-j 8]
+#
+# A piece is a MIDI or MusicXML file or the spans of its parts in sounding pitches,
+# the parts are sung or played by the instruments in the given order.
+# Every note in a range marked with ! costs MARKED_COST, every note the instrument
+# can not play OUTSIDE_COST, relative to the notes of the part.
+# How often every pitch occurs in a part is packed into one integer with a FIELD bit
+# count per pitch, and a mask is packed the other way round. The product of both
+# sums the notes falling into the mask for every transposition at once, field k
+# holds the shift by top - k halftones, top being the highest bit of the mask. So
+# all transpositions of a part take one multiplication per mask.
+# A directory of pieces is ranked in worker processes, the best transposition of
+# every piece is written as CSV.
+
+import argparse
+import csv
+import os
+import sys
+import xml.etree.ElementTree as ET
+from array import array
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import IO
+
+from .chart import from_names
+from .coverage import MIDI_OFFSET, pitch_masks
+from .inst_graph import Instrument, StringedInst
+from .midi import MIDI_SUFFIXES, track_pitches
+from .music import Interval, Pitch
+
+# (halftones, cost, (share in preferred ranges, in ! ranges, outside) of every part)
+type KeyScore = tuple[int, float, tuple[tuple[float, float, float], ...]]
+
+# bits per count in the packed integers, the size of an array "Q" item
+FIELD = 64
+MARKED_COST = 1.0
+OUTSIDE_COST = 10.0
+MUSICXML_SUFFIXES = (".musicxml", ".xml")
+STEPS = {"C": 0, "D": 2, "E": 4, "F": 5, "G": 7, "A": 9, "B": 11}
+
+
+def parse_spans(text: str) -> list[Counter[int]]:
+    """
+    the parts of spans like "C4:G5,A3:D5", every pitch of a span once
+    """
+    parts = []
+    for span in text.split(","):
+        low, high = (Pitch.from_str(p.strip()).to_midi_pitch() for p in span.split(":"))
+        parts.append(Counter(range(low, high + 1)))
+    return parts
+
+
+def musicxml_pitches(path: str) -> list[Counter[int]]:
+    """
+    how often every sounding pitch occurs in every part of a MusicXML file
+    the file is read element by element
+    """
+    parts: list[Counter[int]] = []
+    shift = 0
+    for event, element in ET.iterparse(path, events=("start", "end")):
+        tag = element.tag.rsplit("}", 1)[-1]
+        if event == "start":
+            if tag == "part":
+                parts.append(Counter())
+                shift = 0
+            continue
+        if tag == "transpose":
+            chromatic = element.findtext("chromatic", "0")
+            octaves = element.findtext("octave-change", "0")
+            shift = int(chromatic) + 12 * int(octaves)
+        elif tag == "note":
+            pitch = element.find("pitch")
+            if pitch is not None:
+                midi = (
+                    12 * (int(pitch.findtext("octave", "4")) + 1)
+                    + STEPS[pitch.findtext("step", "C")]
+                    + round(float(pitch.findtext("alter", "0")))
+                )
+                parts[-1][midi + shift] += 1
+            element.clear()
+        elif tag == "measure":
+            element.clear()
+    return [part for part in parts if part]
+
+
+def read_piece(piece: str) -> list[Counter[int]]:
+    if piece.lower().endswith(MIDI_SUFFIXES):
+        return track_pitches(piece)
+    if piece.lower().endswith(MUSICXML_SUFFIXES):
+        return musicxml_pitches(piece)
+    return parse_spans(piece)
+
+
+def histogram(pitches: Counter[int]) -> int:
+    """
+    the count of pitch p in field MIDI_OFFSET + p
+    """
+    return sum(n << (FIELD * (pitch + MIDI_OFFSET)) for pitch, n in pitches.items())
+
+
+@lru_cache(maxsize=256)
+def reversed_fields(mask: int) -> int:
+    """
+    bit q of mask as field top - q, top being the highest bit of mask
+    """
+    top = mask.bit_length() - 1
+    out = 0
+    while mask:
+        low = mask & -mask
+        out |= 1 << (FIELD * (top - low.bit_length() + 1))
+        mask ^= low
+    return out
+
+
+def counts_in(histogram: int, mask: int, shifts: range) -> list[int]:
+    """
+    for every shift in halftones, the notes of the histogram shifted by it which fall
+    into the pitches of mask
+    """
+    product = histogram * reversed_fields(mask)
+    size = -(-product.bit_length() // FIELD) * FIELD // 8
+    fields = array("Q", product.to_bytes(size, sys.byteorder))
+    top = mask.bit_length() - 1
+    return [
+        fields[top - shift] if 0 <= top - shift < len(fields) else 0 for shift in shifts
+    ]
+
+
+def all_shifts(parts: list[Counter[int]]) -> range:
+    """
+    every transposition which keeps all notes midi pitches
+    """
+    pitches = [pitch for part in parts for pitch in part]
+    if not pitches:
+        return range(1)
+    return range(-min(pitches), 127 - max(pitches) + 1)
+
+
+def rank_keys(
+    parts: list[Counter[int]],
+    masks: list[tuple[int, int]],
+    /,
+    max_shift: int | None = None,
+) -> list[KeyScore]:
+    """
+    every transposition, or those from -max_shift to max_shift halftones, the best
+    first, masks are the pitch_masks of the instruments playing the parts
+    """
+    if len(parts) != len(masks):
+        raise ValueError(
+            f"the piece has {len(parts)} parts and the ensemble {len(masks)} instruments"
+        )
+    shifts = all_shifts(parts)
+    if max_shift is not None:
+        shifts = range(max(shifts.start, -max_shift), min(shifts.stop, max_shift + 1))
+    costs = [0.0] * len(shifts)
+    part_shares: list[list[tuple[float, float, float]]] = []
+    for part, (playable, preferred) in zip(parts, masks):
+        total = sum(part.values())
+        if not total:
+            part_shares.append([(1.0, 0.0, 0.0)] * len(shifts))
+            continue
+        packed = histogram(part)
+        shares = []
+        for i, (in_preferred, in_playable) in enumerate(
+            zip(
+                counts_in(packed, preferred, shifts),
+                counts_in(packed, playable, shifts),
+            )
+        ):
+            in_marked = in_playable - in_preferred
+            outside = total - in_playable
+            costs[i] += (in_marked * MARKED_COST + outside * OUTSIDE_COST) / total
+            shares.append((in_preferred / total, in_marked / total, outside / total))
+        part_shares.append(shares)
+    scores = [
+        (shift, costs[i], tuple(shares[i] for shares in part_shares))
+        for i, shift in enumerate(shifts)
+    ]
+    scores.sort(key=lambda score: (score[1], abs(score[0])))
+    return scores
+
+
+def shift_name(shift: int) -> str:
+    return "unchanged" if shift == 0 else str(Interval.from_halftones(shift))
+
+
+def best_key(
+    piece: str, masks: list[tuple[int, int]], max_shift: int | None
+) -> tuple[str, KeyScore | None, str]:
+    """
+    the best transposition of a piece of the library or why there is none
+    """
+    try:
+        return piece, rank_keys(read_piece(piece), masks, max_shift=max_shift)[0], ""
+    except (ValueError, ET.ParseError) as e:
+        return piece, None, str(e)
+
+
+def library_pieces(directory: str) -> list[str]:
+    return sorted(
+        os.path.join(root, name)
+        for root, _, names in os.walk(directory)
+        for name in names
+        if name.lower().endswith(MIDI_SUFFIXES + MUSICXML_SUFFIXES)
+    )
+
+
+def rank_library(
+    pieces: list[str],
+    instruments: list[Instrument | StringedInst],
+    /,
+    max_shift: int | None = None,
+    workers: int | None = None,
+) -> list[tuple[str, KeyScore | None, str]]:
+    # the masks are integers, so they are sent to the workers instead of instruments
+    masks = [pitch_masks(inst) for inst in instruments]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(
+            pool.map(
+                best_key,
+                pieces,
+                [masks] * len(pieces),
+                [max_shift] * len(pieces),
+                chunksize=16,
+            )
+        )
+
+
+def write_library(results: list[tuple[str, KeyScore | None, str]], file: IO) -> None:
+    writer = csv.writer(file)
+    writer.writerow(["piece", "halftones", "transposition", "cost", "error"])
+    for piece, score, error in results:
+        if score is None:
+            writer.writerow([piece, "", "", "", error])
+        else:
+            shift, cost, _ = score
+            writer.writerow([piece, shift, shift_name(shift), f"{cost:.3f}", ""])
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="ranks the transpositions of a piece for an ensemble"
+    )
+    parser.add_argument(
+        "piece",
+        help='MIDI or MusicXML file, spans like "C4:G5,A3:D5" or a directory of pieces',
+    )
+    parser.add_argument("instruments", nargs="+", help="instrument of every part")
+    parser.add_argument("-o", "--out", help="CSV file for a directory of pieces")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="worker count")
+    parser.add_argument(
+        "--max-shift", type=int, default=None, help="halftones, all by default"
+    )
+    parser.add_argument("--top", type=int, default=5, help="transpositions to show")
+    args = parser.parse_args(argv)
+
+    instruments = from_names(args.instruments)
+    if os.path.isdir(args.piece):
+        results = rank_library(
+            library_pieces(args.piece),
+            instruments,
+            max_shift=args.max_shift,
+            workers=args.jobs,
+        )
+        if args.out:
+            with open(args.out, encoding="utf8", mode="w", newline="") as file:
+                write_library(results, file)
+        else:
+            write_library(results, sys.stdout)
+        return 1 if any(score is None for _, score, _ in results) else 0
+
+    masks = [pitch_masks(inst) for inst in instruments]
+    try:
+        scores = rank_keys(read_piece(args.piece), masks, max_shift=args.max_shift)
+    except (ValueError, ET.ParseError) as e:
+        print(e, file=sys.stderr)
+        return 1
+    for shift, cost, shares in scores[: args.top]:
+        parts = ", ".join(
+            f"{inst.name} {preferred:.0%}/{marked:.0%}/{outside:.0%}"
+            for inst, (preferred, marked, outside) in zip(instruments, shares)
+        )
+        print(f"{shift_name(shift)}: cost {cost:.2f}, {parts}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
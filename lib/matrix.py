@@ -0,0 +1,230 @@
+# Renders a chart for every requested combination of instrument groups in one run.
+#
+#   python -m lib.matrix ensembles.toml [-o OUT] [-j JOBS]
+#
+#   title = "{} Ranges"                 # {} is replaced by the label of the chart
+#   outputs = ["pdf"]                   # svg, pdf or png
+#
+#   [groups]
+#   winds = ["insts/fl", "insts/cl"]
+#   brass = ["insts/tp", "insts/tb"]
+#
+#   [[combine]]                         # a chart for the union of every 1 and 2 groups
+#   groups = ["winds", "brass"]
+#   sizes = [1, 2]
+#
+#   [[subsets]]                         # a chart for every 3 or 4 instruments of a group
+#   group = "choir"
+#   sizes = [3, 4]
+#
+# Every instrument is parsed once and every worker process renders the column of an
+# instrument once per staff extent. The charts are sorted by their staff extents
+# so charts sharing columns end up in the same worker.
+
+import argparse
+import os
+import sys
+import time
+import tomllib
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations
+
+import drawsvg as draw
+
+from .chart import calc_staff_extents, draw_column, from_names, make_svg
+from .convert import svg_to_pdf, svg_to_png, to_svg_bytes
+from .inst_graph import Instrument, StringedInst
+
+OUTPUTS = ["svg", "pdf", "png"]
+
+# (name, title, instrument names)
+type MatrixChart = tuple[str, str, list[str]]
+
+
+def expand(spec: dict) -> list[MatrixChart]:
+    """
+    the charts requested by a matrix spec, charts with the same instruments are only
+    listed once
+    """
+    groups: dict[str, list[str]] = spec.get("groups", {})
+    title = spec.get("title", "{} Ranges")
+
+    def group(name: str) -> list[str]:
+        if name not in groups:
+            raise ValueError(f"unknown group '{name}'")
+        return groups[name]
+
+    charts = []
+    for entry in spec.get("combine", []):
+        for size in entry.get("sizes", [1]):
+            for names in combinations(entry["groups"], size):
+                instruments = [inst for name in names for inst in group(name)]
+                label = " & ".join(name.capitalize() for name in names)
+                charts.append(("_".join(names), title.format(label), instruments))
+    for entry in spec.get("subsets", []):
+        name = entry["group"]
+        for size in entry.get("sizes", [len(group(name))]):
+            for instruments in combinations(group(name), size):
+                short = [os.path.basename(inst) for inst in instruments]
+                label = f"{name.capitalize()} ({', '.join(short)})"
+                # the whole path, basenames repeat like in insts/bass and voice/bass
+                paths = [
+                    os.path.normpath(inst).replace(os.sep, "-") for inst in instruments
+                ]
+                charts.append(
+                    ("_".join([name, *paths]), title.format(label), list(instruments))
+                )
+
+    unique: dict[tuple[str, ...], MatrixChart] = {}
+    for chart in charts:
+        unique.setdefault(tuple(chart[2]), chart)
+    named: dict[str, MatrixChart] = {}
+    for chart in unique.values():
+        other = named.setdefault(chart[0], chart)
+        if other is not chart:
+            raise ValueError(
+                f"the charts of {other[2]} and {chart[2]} are both named '{chart[0]}'"
+            )
+    return list(unique.values())
+
+
+class MatrixRenderer:
+    """
+    renders charts from parsed instruments, reusing the columns of earlier charts
+    """
+
+    def __init__(self, instruments: dict[str, Instrument | StringedInst]) -> None:
+        self.instruments = instruments
+        self.columns: dict[tuple[int, float, float], draw.Group] = {}
+        self.column_uses = 0
+
+    def column(
+        self, inst: Instrument | StringedInst, y_min: float, y_max: float
+    ) -> draw.Group:
+        self.column_uses += 1
+        key = (id(inst), y_min, y_max)
+        if key not in self.columns:
+            self.columns[key] = draw_column(inst, y_min, y_max)
+        return self.columns[key]
+
+    def render(self, chart: MatrixChart, out_dir: str, outputs: list[str]) -> list[str]:
+        name, title, names = chart
+        img = make_svg(title, [self.instruments[n] for n in names], self.column)
+        svg_bytes = to_svg_bytes(img)
+        paths = []
+        for output in outputs:
+            path = os.path.join(out_dir, f"{name}.{output}")
+            match output:
+                case "svg":
+                    with open(path, mode="wb") as file:
+                        file.write(svg_bytes)
+                case "pdf":
+                    svg_to_pdf((svg_bytes, path))
+                case "png":
+                    svg_to_png((svg_bytes, path))
+            paths.append(path)
+        return paths
+
+
+_renderer: MatrixRenderer | None = None
+
+
+def _init_worker(instruments: dict[str, Instrument | StringedInst]) -> None:
+    global _renderer
+    _renderer = MatrixRenderer(instruments)
+
+
+def _render_chunk(
+    job: tuple[list[MatrixChart], str, list[str]],
+) -> tuple[list[str], int, int]:
+    """
+    returns the written paths, the number of columns rendered and of columns used
+    """
+    charts, out_dir, outputs = job
+    assert _renderer is not None
+    rendered, uses = len(_renderer.columns), _renderer.column_uses
+    paths = [p for chart in charts for p in _renderer.render(chart, out_dir, outputs)]
+    return (
+        paths,
+        len(_renderer.columns) - rendered,
+        _renderer.column_uses - uses,
+    )
+
+
+def make_matrix(
+    charts: list[MatrixChart],
+    out_dir: str,
+    /,
+    outputs: list[str] | None = None,
+    workers: int | None = None,
+) -> list[str]:
+    """
+    renders all charts to out_dir/{name}.{output}, only as pdf if outputs is None
+    returns the written paths
+    """
+    outputs = outputs or ["pdf"]
+    for output in outputs:
+        if output not in OUTPUTS:
+            raise ValueError(f"invalid output '{output}'")
+    os.makedirs(out_dir, exist_ok=True)
+    names = sorted({name for _, _, chart_names in charts for name in chart_names})
+    instruments = dict(zip(names, from_names(names)))
+
+    # columns are reused by charts with the same staff extents
+    charts = sorted(
+        charts,
+        key=lambda chart: calc_staff_extents([instruments[n] for n in chart[2]]),
+    )
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(charts) <= 1:
+        _init_worker(instruments)
+        results = [_render_chunk((charts, out_dir, outputs))]
+    else:
+        # a few chunks per worker balance the load and keep neighbours together
+        n_chunks = min(len(charts), 4 * workers)
+        chunks = [
+            charts[i * len(charts) // n_chunks : (i + 1) * len(charts) // n_chunks]
+            for i in range(n_chunks)
+        ]
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=(instruments,)
+        ) as pool:
+            results = list(
+                pool.map(_render_chunk, [(chunk, out_dir, outputs) for chunk in chunks])
+            )
+
+    paths = [path for chunk_paths, _, _ in results for path in chunk_paths]
+    rendered = sum(rendered for _, rendered, _ in results)
+    uses = sum(uses for _, _, uses in results)
+    print(f"rendered {rendered} columns for {uses} column uses")
+    return paths
+
+
+def load_spec(path: str) -> dict:
+    with open(path, mode="rb") as file:
+        return tomllib.load(file)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="renders a chart for every combination of instrument groups"
+    )
+    parser.add_argument("spec", help="TOML file with the groups and combinations")
+    parser.add_argument("-o", "--out", default="out/matrix", help="output directory")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="worker count")
+    args = parser.parse_args(argv)
+
+    spec = load_spec(args.spec)
+    charts = expand(spec)
+    start = time.perf_counter()
+    paths = make_matrix(
+        charts, args.out, outputs=spec.get("outputs", ["pdf"]), workers=args.jobs
+    )
+    print(
+        f"{len(charts)} charts, {len(paths)} files in {time.perf_counter() - start:.2f}s"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,230 @@
+# Glyph advance widths read from the sfnt tables of the chart font
+
+import json
+import os
+import struct
+from functools import cache
+
+from .elements import FONT_FAMILY
+
+FONT_DIRS = [
+    "/usr/share/fonts",
+    "/usr/local/share/fonts",
+    "~/.local/share/fonts",
+    "~/.fonts",
+    "/Library/Fonts",
+    "/System/Library/Fonts",
+    "~/Library/Fonts",
+    "C:/Windows/Fonts",
+]
+FONT_EXTENSIONS = [".ttf", ".otf"]
+CACHE_DIR = os.path.join(
+    os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")), "ranges"
+)
+# used for every character if the font can not be found, roughly the average of a serif font
+FALLBACK_ADVANCE = 0.5
+
+
+def style_name(bold: bool, italic: bool) -> str:
+    return ("Bold" if bold else "") + ("Italic" if italic else "")
+
+
+def find_font(family: str, style: str) -> str | None:
+    """
+    looks for {family}{style}.ttf or .otf as the GNU FreeFont files are named
+    """
+    names = {f"{family}{style}{ext}".lower() for ext in FONT_EXTENSIONS}
+    for font_dir in FONT_DIRS:
+        for root, _, files in os.walk(os.path.expanduser(font_dir)):
+            for file in files:
+                if file.lower() in names:
+                    return os.path.join(root, file)
+    return None
+
+
+def _u16(data: bytes, offset: int) -> int:
+    return struct.unpack_from(">H", data, offset)[0]
+
+
+def _u32(data: bytes, offset: int) -> int:
+    return struct.unpack_from(">I", data, offset)[0]
+
+
+def read_cmap(data: bytes, cmap: int) -> dict[int, int]:
+    """
+    maps code points to glyph ids using the first unicode subtable of format 4 or 12
+    """
+    subtables = {}
+    for i in range(_u16(data, cmap + 2)):
+        record = cmap + 4 + 8 * i
+        platform, encoding = _u16(data, record), _u16(data, record + 2)
+        subtables[(platform, encoding)] = cmap + _u32(data, record + 4)
+
+    glyphs: dict[int, int] = {}
+    for key in [(3, 10), (0, 4), (0, 6), (3, 1), (0, 3), (0, 1), (0, 0)]:
+        if key not in subtables:
+            continue
+        table = subtables[key]
+        match _u16(data, table):
+            case 12:
+                for i in range(_u32(data, table + 12)):
+                    group = table + 16 + 12 * i
+                    start, end = _u32(data, group), _u32(data, group + 4)
+                    start_glyph = _u32(data, group + 8)
+                    for code in range(start, end + 1):
+                        glyphs[code] = start_glyph + code - start
+                return glyphs
+            case 4:
+                seg_count = _u16(data, table + 6) // 2
+                end_codes = table + 14
+                start_codes = end_codes + 2 * seg_count + 2
+                deltas = start_codes + 2 * seg_count
+                range_offsets = deltas + 2 * seg_count
+                for seg in range(seg_count):
+                    start = _u16(data, start_codes + 2 * seg)
+                    end = _u16(data, end_codes + 2 * seg)
+                    delta = _u16(data, deltas + 2 * seg)
+                    range_offset = _u16(data, range_offsets + 2 * seg)
+                    for code in range(start, end + 1):
+                        if code == 0xFFFF:
+                            continue
+                        if range_offset == 0:
+                            glyph = (code + delta) & 0xFFFF
+                        else:
+                            address = (
+                                range_offsets
+                                + 2 * seg
+                                + range_offset
+                                + 2 * (code - start)
+                            )
+                            glyph = _u16(data, address)
+                            if glyph != 0:
+                                glyph = (glyph + delta) & 0xFFFF
+                        if glyph != 0:
+                            glyphs[code] = glyph
+                return glyphs
+    return glyphs
+
+
+def read_advances(path: str) -> dict[int, float]:
+    """
+    returns the advance width in em of every code point in the font
+    """
+    with open(path, mode="rb") as file:
+        data = file.read()
+    offset = _u32(data, 12) if data[:4] == b"ttcf" else 0
+
+    tables = {}
+    for i in range(_u16(data, offset + 4)):
+        record = offset + 12 + 16 * i
+        tables[data[record : record + 4].decode("latin-1")] = _u32(data, record + 8)
+
+    units_per_em = _u16(data, tables["head"] + 18)
+    num_h_metrics = _u16(data, tables["hhea"] + 34)
+    hmtx = tables["hmtx"]
+    advances = [_u16(data, hmtx + 4 * i) for i in range(num_h_metrics)]
+    return {
+        code: advances[min(glyph, num_h_metrics - 1)] / units_per_em
+        for code, glyph in read_cmap(data, tables["cmap"]).items()
+    }
+
+
+@cache
+def font_fingerprint() -> tuple[tuple[str, int, float] | None, ...]:
+    """
+    identifies the font files used for measuring, every measured layout depends on them
+    """
+    fingerprint: list[tuple[str, int, float] | None] = []
+    for bold in [False, True]:
+        for italic in [False, True]:
+            path = find_font(FONT_FAMILY, style_name(bold, italic))
+            if path is None:
+                fingerprint.append(None)
+            else:
+                stat = os.stat(path)
+                fingerprint.append((path, stat.st_size, stat.st_mtime))
+    return tuple(fingerprint)
+
+
+@cache
+def load_advances(bold: bool = False, italic: bool = False) -> dict[int, float]:
+    """
+    loads the advance table of FONT_FAMILY in the given style
+    the table is cached in CACHE_DIR and reread when the font file changes
+    an empty table is returned if the font is not installed
+    """
+    style = style_name(bold, italic)
+    path = find_font(FONT_FAMILY, style)
+    if path is None:
+        return {}
+    stat = os.stat(path)
+    source = [path, stat.st_size, stat.st_mtime]
+
+    cache_path = os.path.join(CACHE_DIR, f"{FONT_FAMILY}{style}.json")
+    if os.path.exists(cache_path):
+        try:
+            with open(cache_path, encoding="utf8") as file:
+                cached = json.load(file)
+            if cached["source"] == source:
+                return {int(code): adv for code, adv in cached["advances"].items()}
+        except (ValueError, KeyError):
+            pass
+
+    advances = read_advances(path)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    with open(cache_path, encoding="utf8", mode="w") as file:
+        json.dump({"source": source, "advances": advances}, file)
+    return advances
+
+
+def text_width(
+    text: str, font_size: float, bold: bool = False, italic: bool = False
+) -> float:
+    advances = load_advances(bold, italic)
+    return font_size * sum(advances.get(ord(c), FALLBACK_ADVANCE) for c in text)
+
+
+def wrap_text(
+    text: str,
+    max_width: float,
+    font_size: float,
+    bold: bool = False,
+    italic: bool = False,
+) -> list[str]:
+    """
+    greedily breaks the text at spaces, words longer than max_width get a line of their own
+    """
+    lines: list[str] = []
+    current = ""
+    for word in text.split():
+        candidate = f"{current} {word}" if current else word
+        if current and text_width(candidate, font_size, bold, italic) > max_width:
+            lines.append(current)
+            current = word
+        else:
+            current = candidate
+    if current or not lines:
+        lines.append(current)
+    return lines
+
+
+def fit_text(
+    text: str,
+    max_width: float,
+    font_size: float,
+    min_font_size: float,
+    bold: bool = False,
+    italic: bool = False,
+) -> tuple[list[str], float]:
+    """
+    fits the text into max_width by shrinking it down to min_font_size
+    if that is not enough the text is wrapped at font_size instead
+    returns the lines and the font size to use
+    """
+    width = text_width(text, font_size, bold, italic)
+    if width <= max_width:
+        return [text], font_size
+    shrunk = font_size * max_width / width
+    if shrunk >= min_font_size:
+        return [text], shrunk
+    return wrap_text(text, max_width, font_size, bold, italic), font_size
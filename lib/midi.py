@@ -0,0 +1,256 @@
+# Reads standard MIDI files event by event, a track is never loaded as a whole but
+# read in blocks.
+#
+#   for track, tick, status, data in events(file): ...
+#
+# Channel messages have their status byte with the channel in the low nibble and
+# their data bytes, meta events the status 0xFF and their type followed by their
+# data, system exclusive messages the status 0xF0 or 0xF7.
+# Running status is resolved, so every event has its own status.
+# Tempo changes are expected before the notes they apply to, in format 1 files they
+# are in the first track, so TempoMap converts ticks to seconds while streaming.
+
+import struct
+from bisect import bisect_right
+from collections import Counter
+from collections.abc import Iterator
+from typing import IO
+
+# (track, tick since the start of the track, status, data)
+type Event = tuple[int, int, int, bytes]
+
+MIDI_SUFFIXES = (".mid", ".midi")
+NOTE_ON = 0x90
+META = 0xFF
+END_OF_TRACK = b"\x2f"
+TRACK_NAME = b"\x03"
+SET_TEMPO = b"\x51"
+# microseconds per quarter note until the first tempo event
+DEFAULT_TEMPO = 500_000
+# bytes of a track read at once, and the most an event takes before its data
+BLOCK = 1 << 16
+MAX_HEAD = 10
+# channel 10 is for drums, which have no pitch
+DRUM_CHANNEL = 9
+
+
+def read_exact(file: IO[bytes], n: int) -> bytes:
+    data = file.read(n)
+    if len(data) != n:
+        raise ValueError("unexpected end of MIDI file")
+    return data
+
+
+def varlen_at(data: bytes, pos: int) -> tuple[int, int]:
+    """
+    the variable length quantity at pos and the position after it
+    """
+    value = 0
+    for end in range(pos, pos + 4):
+        byte = data[end]
+        value = (value << 7) | (byte & 0x7F)
+        if not byte & 0x80:
+            return value, end + 1
+    raise ValueError("variable length quantity longer than 4 bytes")
+
+
+def read_header(file: IO[bytes]) -> tuple[int, int, int]:
+    """
+    the format, the number of tracks and the division of a MIDI file
+    """
+    kind, length = struct.unpack(">4sI", read_exact(file, 8))
+    if kind != b"MThd" or length < 6:
+        raise ValueError("not a MIDI file")
+    header = read_exact(file, length)
+    return struct.unpack(">HHH", header[:6])
+
+
+def track_events(file: IO[bytes], track: int, length: int) -> Iterator[Event]:
+    """
+    the events of a track of length bytes, read in blocks of at most BLOCK bytes
+    """
+    buffer = b""
+    pos = 0
+    unread = length
+
+    def ensure(n: int) -> None:
+        # the next n bytes of the track are in the buffer
+        nonlocal buffer, pos, unread
+        if len(buffer) - pos >= n:
+            return
+        take = min(max(BLOCK, n - len(buffer) + pos), unread)
+        buffer = buffer[pos:] + read_exact(file, take)
+        unread -= take
+        pos = 0
+        if len(buffer) < n:
+            raise ValueError(f"track {track} ends in the middle of an event")
+
+    tick = 0
+    status = 0
+    while pos < len(buffer) or unread:
+        if unread and len(buffer) - pos < MAX_HEAD:
+            ensure(min(MAX_HEAD, len(buffer) - pos + unread))
+        try:
+            delta, pos = varlen_at(buffer, pos)
+            first = buffer[pos]
+        except IndexError:
+            raise ValueError(f"track {track} ends in the middle of an event") from None
+        tick += delta
+        if first & 0x80:
+            status = first
+            pos += 1
+        elif not status:
+            raise ValueError("data byte without status")
+
+        if status == META or status in (0xF0, 0xF7):
+            start = pos + 1 if status == META else pos
+            try:
+                size, start = varlen_at(buffer, start)
+            except IndexError:
+                raise ValueError(
+                    f"track {track} ends in the middle of an event"
+                ) from None
+            head = buffer[pos : pos + 1] if status == META else b""
+            pos = start
+            ensure(size)
+            data = head + buffer[pos : pos + size]
+            pos += size
+            # meta and system exclusive messages cancel running status
+            kind, status = status, 0
+            yield track, tick, kind, data
+        else:
+            # MAX_HEAD covers the data of channel messages
+            size = 1 if status & 0xF0 in (0xC0, 0xD0) else 2
+            data = buffer[pos : pos + size]
+            pos += size
+            if len(data) != size:
+                raise ValueError(f"track {track} ends in the middle of an event")
+            yield track, tick, status, data
+
+
+def track_chunks(file: IO[bytes], n_tracks: int) -> Iterator[Event]:
+    """
+    the events of the tracks after the header in the order of the file
+    chunks which are not tracks are skipped
+    """
+    track = 0
+    while track < n_tracks:
+        head = file.read(8)
+        if not head:
+            return
+        if len(head) != 8:
+            raise ValueError("unexpected end of MIDI file")
+        kind, length = struct.unpack(">4sI", head)
+        if kind != b"MTrk":
+            read_exact(file, length)
+            continue
+        yield from track_events(file, track, length)
+        track += 1
+
+
+def events(file: IO[bytes]) -> Iterator[Event]:
+    """
+    the events of every track in the order of the file
+    """
+    _, n_tracks, _ = read_header(file)
+    yield from track_chunks(file, n_tracks)
+
+
+class TempoMap:
+    """
+    converts ticks to seconds with the tempo changes seen so far
+    """
+
+    def __init__(self, division: int):
+        self.division = division
+        # (tick, seconds at the tick, seconds per tick from the tick on)
+        self.changes = [(0, 0.0, self.tick_length(DEFAULT_TEMPO))]
+
+    def tick_length(self, tempo: int) -> float:
+        if self.division & 0x8000:
+            # frames per second as a negative byte and ticks per frame
+            fps = 256 - (self.division >> 8)
+            return 1 / (fps * (self.division & 0xFF))
+        return tempo / 1_000_000 / self.division
+
+    def set_tempo(self, tick: int, tempo: int) -> None:
+        # changes before the last one come too late to convert the notes before them
+        if self.division & 0x8000 or tick < self.changes[-1][0]:
+            return
+        if len(self.changes) > 1 and self.changes[-1][0] == tick:
+            self.changes.pop()
+        self.changes.append((tick, self.seconds(tick), self.tick_length(tempo)))
+
+    def seconds(self, tick: int) -> float:
+        i = bisect_right(self.changes, tick, key=lambda change: change[0]) - 1
+        start, at, length = self.changes[i]
+        return at + (tick - start) * length
+
+
+def tempo_of(data: bytes) -> int | None:
+    """
+    the microseconds per quarter note of a set tempo event
+    """
+    if data[:1] == SET_TEMPO and len(data) == 4:
+        return int.from_bytes(data[1:], "big")
+    return None
+
+
+def encode_varlen(value: int) -> bytes:
+    out = [value & 0x7F]
+    value >>= 7
+    while value:
+        out.append(0x80 | (value & 0x7F))
+        value >>= 7
+    return bytes(out[::-1])
+
+
+def encode_event(delta: int, status: int, data: bytes) -> bytes:
+    """
+    an event with the data as events yields it
+    """
+    if status == META:
+        data = data[:1] + encode_varlen(len(data) - 1) + data[1:]
+    elif status in (0xF0, 0xF7):
+        data = encode_varlen(len(data)) + data
+    return encode_varlen(delta) + bytes([status]) + data
+
+
+def midi_bytes(
+    tracks: list[list[tuple[int, int, bytes]]], /, division: int = 480
+) -> bytes:
+    """
+    a MIDI file of format 1 from tracks of (delta ticks, status, data),
+    the end of every track is added
+    """
+    chunks = [struct.pack(">4sIHHH", b"MThd", 6, 1, len(tracks), division)]
+    for track in tracks:
+        body = b"".join(encode_event(*event) for event in track)
+        body += encode_event(0, META, END_OF_TRACK)
+        chunks.append(struct.pack(">4sI", b"MTrk", len(body)) + body)
+    return b"".join(chunks)
+
+
+def is_note_on(status: int, data: bytes) -> bool:
+    return status & 0xF0 == NOTE_ON and data[1] > 0
+
+
+def track_pitches(path: str) -> list[Counter[int]]:
+    """
+    how often every midi pitch starts in every track with notes, without drums
+    a file with a single track, like every file of format 0, has a part per channel
+    """
+    parts: dict[tuple[int, int], Counter[int]] = {}
+    with open(path, mode="rb") as file:
+        for track, _, status, data in events(file):
+            channel = status & 0x0F
+            if is_note_on(status, data) and channel != DRUM_CHANNEL:
+                if (track, channel) not in parts:
+                    parts[track, channel] = Counter()
+                parts[track, channel][data[0]] += 1
+    if len({track for track, _ in parts}) <= 1:
+        return [parts[key] for key in sorted(parts)]
+    tracks: dict[int, Counter[int]] = {}
+    for (track, _), pitches in parts.items():
+        tracks.setdefault(track, Counter()).update(pitches)
+    return [tracks[track] for track in sorted(tracks)]
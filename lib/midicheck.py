@@ -0,0 +1,249 @@
+# Checks the notes of MIDI files against the ranges of the instruments playing them.
+#
+#   python -m lib.midicheck song.mid --track 2=insts/fl --track 3=insts/cl
+#   python -m lib.midicheck library --catalog insts voice [-j 8] [--csv report.csv]
+#
+# Tracks and channels are counted from 1. A note is played by the instrument of its
+# track, else of its channel, else by the instrument whose name is part of the name
+# of the track, from the catalog directories. Notes of the drum channel are only
+# checked if their track or channel is given explicitly. Every note outside the ranges of its
+# instrument or in a range marked with ! is reported with the time it starts.
+# The files are streamed, a library of files is checked in worker processes which
+# only get the pitch masks of the instruments.
+
+import argparse
+import csv
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import IO
+
+from .catalog import expand_names
+from .chart import from_names
+from .coverage import MIDI_OFFSET, pitch_masks, pitch_name
+from .midi import (
+    DRUM_CHANNEL,
+    META,
+    MIDI_SUFFIXES,
+    TRACK_NAME,
+    TempoMap,
+    is_note_on,
+    read_header,
+    tempo_of,
+    track_chunks,
+)
+from .music import Pitch
+
+# (path, track, channel, seconds, midi pitch, instrument, in a ! range)
+type Finding = tuple[str, int, int, float, int, str, bool]
+# the instruments as (name, all sounding pitches, preferred ones), which of them
+# play the tracks and channels, counted from 0, and whether track names are matched
+type Mapping = tuple[list[tuple[str, int, int]], dict[int, int], dict[int, int], bool]
+
+
+def by_name(track_name: str, instruments: list[tuple[str, int, int]]) -> int | None:
+    """
+    the instrument with the longest name found in the track name
+    """
+    found = None
+    lowered = track_name.lower()
+    for i, (name, _, _) in enumerate(instruments):
+        if name.lower() in lowered and (
+            found is None or len(name) > len(instruments[found][0])
+        ):
+            found = i
+    return found
+
+
+def check_file(path: str, mapping: Mapping) -> tuple[list[Finding], int]:
+    """
+    the notes of a file outside of the ranges or in ! ranges,
+    and how many notes have no instrument
+    """
+    instruments, tracks, channels, match_names = mapping
+    findings: list[Finding] = []
+    unmapped = 0
+    named: dict[int, int | None] = {}
+    with open(path, mode="rb") as file:
+        _, n_tracks, division = read_header(file)
+        tempo = TempoMap(division)
+        for track, tick, status, data in track_chunks(file, n_tracks):
+            if status == META:
+                value = tempo_of(data)
+                if value is not None:
+                    tempo.set_tempo(tick, value)
+                elif match_names and data[:1] == TRACK_NAME and track not in named:
+                    named[track] = by_name(data[1:].decode("latin-1"), instruments)
+                continue
+            channel = status & 0x0F
+            if not is_note_on(status, data):
+                continue
+            inst = tracks.get(track, channels.get(channel))
+            if inst is None:
+                # drums are not pitches, unless the user says they are
+                if channel == DRUM_CHANNEL:
+                    continue
+                inst = named.get(track)
+            if inst is None:
+                unmapped += 1
+                continue
+            name, playable, preferred = instruments[inst]
+            bit = data[0] + MIDI_OFFSET
+            if preferred >> bit & 1:
+                continue
+            findings.append(
+                (
+                    path,
+                    track + 1,
+                    channel + 1,
+                    tempo.seconds(tick),
+                    data[0],
+                    name,
+                    bool(playable >> bit & 1),
+                )
+            )
+    findings.sort(key=lambda finding: (finding[3], finding[1]))
+    return findings, unmapped
+
+
+def check_one(path: str, mapping: Mapping) -> tuple[str, list[Finding], int, str]:
+    """
+    check_file for the workers, errors are returned instead of raised
+    """
+    try:
+        return path, *check_file(path, mapping), ""
+    except (OSError, ValueError) as e:
+        return path, [], 0, str(e)
+
+
+def check_files(
+    paths: list[str], mapping: Mapping, /, workers: int | None = None
+) -> list[tuple[str, list[Finding], int, str]]:
+    if len(paths) <= 1:
+        return [check_one(path, mapping) for path in paths]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(check_one, paths, [mapping] * len(paths), chunksize=8))
+
+
+def midi_files(arguments: list[str]) -> list[str]:
+    paths = []
+    for argument in arguments:
+        if not os.path.isdir(argument):
+            paths.append(argument)
+            continue
+        paths.extend(
+            sorted(
+                os.path.join(root, name)
+                for root, _, names in os.walk(argument)
+                for name in names
+                if name.lower().endswith(MIDI_SUFFIXES)
+            )
+        )
+    return paths
+
+
+def format_time(seconds: float) -> str:
+    minutes, seconds = divmod(seconds, 60)
+    return f"{int(minutes)}:{seconds:06.3f}"
+
+
+def problem_name(marked: bool) -> str:
+    return "in ! range" if marked else "outside"
+
+
+def write_csv(results: list[tuple[str, list[Finding], int, str]], file: IO) -> None:
+    writer = csv.writer(file)
+    writer.writerow(
+        ["file", "track", "channel", "seconds", "pitch", "instrument", "problem"]
+    )
+    for _, findings, _, _ in results:
+        for path, track, channel, seconds, pitch, name, marked in findings:
+            writer.writerow(
+                [
+                    path,
+                    track,
+                    channel,
+                    f"{seconds:.3f}",
+                    str(Pitch.from_midi_pitch(pitch)),
+                    name,
+                    problem_name(marked),
+                ]
+            )
+
+
+def parse_assignments(
+    entries: list[str], names: list[str], kind: str
+) -> dict[int, int]:
+    """
+    entries like 2=insts/fl as index from 0 to the index of the instrument in names,
+    the instrument is added to names
+    """
+    assignments = {}
+    for entry in entries:
+        number, sep, name = entry.partition("=")
+        if not sep or not number.isdigit() or int(number) < 1:
+            raise ValueError(f"invalid {kind} '{entry}', expected like 2=insts/fl")
+        if name not in names:
+            names.append(name)
+        assignments[int(number) - 1] = names.index(name)
+    return assignments
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="reports the notes of MIDI files outside of the ranges"
+    )
+    parser.add_argument("paths", nargs="+", help="MIDI files or directories")
+    parser.add_argument(
+        "--track",
+        action="append",
+        default=[],
+        help="instrument of a track like 2=insts/fl",
+    )
+    parser.add_argument(
+        "--channel",
+        action="append",
+        default=[],
+        help="instrument of a channel like 1=insts/tp",
+    )
+    parser.add_argument(
+        "--catalog", nargs="+", default=[], help="instruments matched by track name"
+    )
+    parser.add_argument("--csv", help="write the findings to this file")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="worker count")
+    args = parser.parse_args(argv)
+
+    names = expand_names(args.catalog)
+    try:
+        tracks = parse_assignments(args.track, names, "track")
+        channels = parse_assignments(args.channel, names, "channel")
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    instruments = [(inst.name, *pitch_masks(inst)) for inst in from_names(names)]
+    mapping = (instruments, tracks, channels, bool(args.catalog))
+
+    results = check_files(midi_files(args.paths), mapping, workers=args.jobs)
+    problems = 0
+    for path, findings, unmapped, error in results:
+        if error:
+            print(f"{path}: {error}")
+            problems += 1
+            continue
+        for _, track, channel, seconds, pitch, name, marked in findings:
+            print(
+                f"{path} {format_time(seconds)} track {track} channel {channel} "
+                f"{name}: {pitch_name(pitch)} {problem_name(marked)}"
+            )
+        if unmapped:
+            print(f"{path}: {unmapped} notes without instrument")
+        problems += len(findings)
+    if args.csv:
+        with open(args.csv, encoding="utf8", mode="w", newline="") as file:
+            write_csv(results, file)
+    print(f"{problems} problems in {len(results)} files")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -12,6 +12,7 @@ from .consts import (
     ACC_UNICODE,
     MIDI_PITCH_TO_NOTE,
 )
+from .trace import count
 
 
 class Interval:
@@ -271,14 +272,12 @@ class Pitch:
         current_midi = Pitch.from_staff_position(position).to_midi_pitch()
         correct_midi = self.to_midi_pitch() + interval.to_halftones()
         additional_shift = correct_midi - current_midi
-        try:
-            accidental = ACCIDENTALS[additional_shift + 2]
-            return Pitch.from_staff_position(position, accidental)
-        except (
-            IndexError
-        ):  # happens if the needed accidental exceeds double sharps or double flats
-            print("had to return normalized pitch")
+        # a negative index would silently wrap around to the double sharp
+        if not 0 <= additional_shift + 2 < len(ACCIDENTALS):
+            # the needed accidental exceeds double sharps or double flats
+            count("double_accidental_fallback", pitch=str(self), interval=str(interval))
             return Pitch.from_midi_pitch(correct_midi)
+        return Pitch.from_staff_position(position, ACCIDENTALS[additional_shift + 2])
 
     def display_name(self) -> str:
         if self.accidental in ["+", "&"]:
@@ -352,13 +351,9 @@ class RelativeRange:
         self.preferred = preferred
 
     def __lt__(self, other: Self) -> bool:
-        assert not (
-            (self.start.num_lex_ord() <= other.start.num_lex_ord())
-            and (other.start.num_lex_ord() < self.end.num_lex_ord())
-        ), f"tried to compare incompareable ranges {self} {other}"
-        assert not (
-            (self.start.num_lex_ord() < other.end.num_lex_ord())
-            and (other.start.num_lex_ord() <= self.end.num_lex_ord())
+        # ranges sharing a bound are comparable in both orders
+        assert (self.start.num_lex_ord() >= other.end.num_lex_ord()) or (
+            other.start.num_lex_ord() >= self.end.num_lex_ord()
         ), f"tried to compare incompareable ranges {self} {other}"
 
         return self.start.num_lex_ord() < other.start.num_lex_ord()
@@ -1,17 +1,30 @@
+from .trace import span
+
+
 def parse(path: str) -> tuple[str, dict[str, list[str]]]:
-    with open(path, encoding="utf8", mode="r") as file:
-        lines = []
-        for line in file.readlines():
-            line, *_ = line.strip().split("//")
-            line = line.strip()
-            if line:
-                lines.append(line)
-    return __parse_lines(lines, path=path)
+    with span("parse", source=path):
+        with open(path, encoding="utf8", mode="r") as file:
+            lines = __clean_lines(file.readlines())
+        return __parse_lines(lines, path=path)
 
 
 def parse_str(string: str) -> tuple[str, dict[str, list[str]]]:
-    lines = string.splitlines()
-    return __parse_lines(lines)
+    with span("parse"):
+        lines = __clean_lines(string.splitlines())
+        return __parse_lines(lines)
+
+
+def __clean_lines(raw_lines: list[str]) -> list[str]:
+    """
+    removes comments and empty lines
+    """
+    lines = []
+    for line in raw_lines:
+        line, *_ = line.strip().split("//")
+        line = line.strip()
+        if line:
+            lines.append(line)
+    return lines
 
 
 def __parse_lines(lines: list[str], /, path=None) -> tuple[str, dict[str, list[str]]]:
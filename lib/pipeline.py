@@ -0,0 +1,198 @@
+# Renders batches of charts in overlapping stages connected by bounded queues:
+#
+#   load     parses the instrument files            asyncio threads
+#   layout   generate_staff and svg serialization   process pool
+#   convert  pdf or png conversion                  process pool
+#   write    writes the result to its path          asyncio threads
+#
+# While one chart is laid out the next is already loaded and the previous one converted,
+# so disk and cpu are busy at the same time instead of taking turns.
+# The drawings are serialized in the layout workers, sending a drawing between
+# processes would cost about as much as serializing it.
+
+import asyncio
+import multiprocessing
+import os
+import sys
+import time
+from collections.abc import Awaitable, Callable
+from concurrent.futures import ProcessPoolExecutor
+
+from .chart import from_names, make_svg
+from .convert import svg_to_pdf_bytes, svg_to_png_bytes, to_svg_bytes
+from .inst_graph import Instrument, StringedInst
+
+IO_CONCURRENCY = 4
+QUEUE_SIZE = 8
+CONVERTERS = {".pdf": svg_to_pdf_bytes, ".png": svg_to_png_bytes}
+
+# (title, instrument names, output path), the extension of the path selects the format
+type ChartJob = tuple[str, list[str], str]
+
+
+class StageStats:
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.done = 0
+        self.failed = 0
+        # sum of the time spent on single items, greater than the elapsed time if concurrent
+        self.busy = 0.0
+        self.start: float | None = None
+        self.end: float | None = None
+
+    def elapsed(self) -> float:
+        if self.start is None or self.end is None:
+            return 0.0
+        return self.end - self.start
+
+    def throughput(self) -> float:
+        """
+        items per second from the first item started to the last finished
+        """
+        elapsed = self.elapsed()
+        return self.done / elapsed if elapsed > 0 else 0.0
+
+    def __str__(self) -> str:
+        failed = f", {self.failed} failed" if self.failed else ""
+        return (
+            f"{self.name:<8}{self.done:>5} charts{failed} in {self.elapsed():.2f}s, "
+            f"{self.throughput():.1f}/s, busy {self.busy:.2f}s"
+        )
+
+
+# marks the end of the items in a queue, one per consumer
+_DONE = object()
+
+
+async def _stage(
+    stats: StageStats,
+    function: Callable[[tuple], Awaitable[tuple]],
+    inbox: asyncio.Queue,
+    outbox: asyncio.Queue | None,
+    concurrency: int,
+    consumers: int,
+) -> None:
+    """
+    applies function to the items of inbox with concurrency workers and puts the results
+    into outbox, once inbox is exhausted one end marker per consumer is put into outbox
+    """
+
+    async def work() -> None:
+        while (item := await inbox.get()) is not _DONE:
+            start = time.perf_counter()
+            if stats.start is None:
+                stats.start = start
+            try:
+                result = await function(item)
+            except Exception as e:
+                print(f"{stats.name} failed for {item[-1]}: {e}", file=sys.stderr)
+                stats.failed += 1
+                continue
+            stats.end = time.perf_counter()
+            stats.busy += stats.end - start
+            stats.done += 1
+            if outbox is not None:
+                await outbox.put(result)
+
+    await asyncio.gather(*[work() for _ in range(concurrency)])
+    if outbox is not None:
+        for _ in range(consumers):
+            await outbox.put(_DONE)
+
+
+def layout_chart(job: tuple[str, list[Instrument | StringedInst], str]) -> bytes:
+    title, instruments, _ = job
+    return to_svg_bytes(make_svg(title, instruments))
+
+
+async def run_pipeline(
+    jobs: list[ChartJob],
+    /,
+    workers: int | None = None,
+    queue_size: int = QUEUE_SIZE,
+) -> list[StageStats]:
+    """
+    renders every job to its path, the jobs are not written in order
+    returns the statistics of every stage
+    """
+    for _, _, path in jobs:
+        ext = os.path.splitext(path)[1]
+        if ext != ".svg" and ext not in CONVERTERS:
+            raise ValueError(f"can not render '{path}', use .svg, .pdf or .png")
+    workers = workers or os.cpu_count() or 1
+    loop = asyncio.get_running_loop()
+
+    async def load(job: ChartJob) -> tuple:
+        title, names, path = job
+        return title, await asyncio.to_thread(from_names, names), path
+
+    async def layout(job: tuple) -> tuple:
+        svg = await loop.run_in_executor(pool, layout_chart, job)
+        return svg, job[2]
+
+    async def convert(job: tuple[bytes, str]) -> tuple[bytes, str]:
+        svg, path = job
+        ext = os.path.splitext(path)[1]
+        if ext == ".svg":
+            return svg, path
+        return await loop.run_in_executor(pool, CONVERTERS[ext], svg), path
+
+    async def write(job: tuple[bytes, str]) -> tuple:
+        data, path = job
+
+        def write_file() -> None:
+            with open(path, mode="wb") as file:
+                file.write(data)
+
+        await asyncio.to_thread(write_file)
+        return (path,)
+
+    stats = [StageStats(name) for name in ["load", "layout", "convert", "write"]]
+    # load, layout, convert and write
+    concurrency = [IO_CONCURRENCY, workers, workers, IO_CONCURRENCY]
+    queues: list[asyncio.Queue] = [asyncio.Queue(queue_size) for _ in range(4)]
+
+    async def feed() -> None:
+        for job in jobs:
+            await queues[0].put(job)
+        for _ in range(concurrency[0]):
+            await queues[0].put(_DONE)
+
+    # layout and conversion share the pool, so a full pool never idles between stages,
+    # the workers start while the load and write threads run, which forking can
+    # deadlock, so they are spawned
+    with ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+    ) as pool:
+        await asyncio.gather(
+            feed(),
+            *[
+                _stage(
+                    stats[i],
+                    function,
+                    queues[i],
+                    queues[i + 1] if i + 1 < len(queues) else None,
+                    concurrency[i],
+                    concurrency[i + 1] if i + 1 < len(queues) else 0,
+                )
+                for i, function in enumerate([load, layout, convert, write])
+            ],
+        )
+    return stats
+
+
+def render_batch(
+    jobs: list[ChartJob],
+    /,
+    workers: int | None = None,
+    queue_size: int = QUEUE_SIZE,
+) -> list[StageStats]:
+    """
+    runs the pipeline and prints the throughput of every stage
+    """
+    start = time.perf_counter()
+    stats = asyncio.run(run_pipeline(jobs, workers=workers, queue_size=queue_size))
+    for stage in stats:
+        print(stage)
+    print(f"{len(jobs)} charts in {time.perf_counter() - start:.2f}s")
+    return stats
@@ -0,0 +1,134 @@
+import os
+from collections.abc import Iterator
+from itertools import count
+from math import ceil, log2
+
+import drawsvg as draw
+
+from .chart import ColumnRenderer, column_extents, draw_column, graph_format, make_graph
+from .convert import save_many_as_png
+from .deps import (
+    column_keys,
+    intersecting_columns,
+    load_manifest,
+    region_key,
+    save_manifest,
+    shared_key,
+)
+from .inst_graph import Instrument, StringedInst
+
+TILE_SIZE = 256
+MANIFEST = "manifest.json"
+
+
+def calc_levels(
+    content_format: tuple[float, float], tile_size: int, max_scale: float
+) -> int:
+    """
+    number of zoom levels so that level 0 fits the whole chart into one tile
+    and the last level renders the chart at max_scale
+    """
+    longest = max(content_format) * max_scale
+    return max(0, ceil(log2(longest / tile_size))) + 1
+
+
+def level_scale(z: int, levels: int, max_scale: float) -> float:
+    return max_scale * 2.0 ** (z - levels + 1)
+
+
+def column_subset(used: list[int]) -> ColumnRenderer:
+    """
+    renders only the columns in used and leaves the others empty
+    generate_staff renders the columns in order, so the call count is the index
+    """
+    index = iter(count())
+
+    def render(inst: Instrument | StringedInst, y_min: float, y_max: float):
+        if next(index) in used:
+            return draw_column(inst, y_min, y_max)
+        return draw.Group()
+
+    return render
+
+
+def tile_drawings(
+    title: str,
+    instruments: list[Instrument | StringedInst],
+    tiles: list[tuple[str, float, int, int, list[int]]],
+    tile_size: int,
+) -> Iterator[tuple[draw.Drawing, str]]:
+    """
+    the drawing of every (path, scale, x, y, used columns) tile, created one at a time
+    a tile contains the shared elements and only the columns it shows
+    """
+    last_used = None
+    for path, scale, x, y, used in tiles:
+        # the tiles of a level are ordered by x, so neighbours show the same columns
+        if used != last_used:
+            content, _ = make_graph(title, instruments, column_subset(used))
+            last_used = used
+        tile = draw.Drawing(tile_size, tile_size)
+        tile.append(
+            draw.Group(
+                children=[content],
+                transform=f"scale({scale})translate({-x * tile_size / scale},{-y * tile_size / scale})",
+            )
+        )
+        yield tile, path
+
+
+def make_pyramid(
+    title: str,
+    instruments: list[Instrument | StringedInst],
+    out_dir: str,
+    /,
+    tile_size: int = TILE_SIZE,
+    max_scale: float = 1.0,
+    workers: int | None = None,
+) -> list[str]:
+    """
+    renders the chart into a XYZ tile pyramid at {out_dir}/{z}/{x}/{y}.png
+    only tiles covering the chart are rendered, tiles whose columns did not change
+    since the last build (according to {out_dir}/manifest.json) are skipped
+    the tiles are drawn while the workers convert them
+    returns the paths of the rendered tiles
+    """
+    content_format = graph_format(instruments)
+    extents = column_extents(len(instruments))
+    shared = shared_key(title, instruments, content_format, tile_size, max_scale)
+    columns = column_keys(instruments)
+
+    manifest_path = os.path.join(out_dir, MANIFEST)
+    old_manifest = load_manifest(manifest_path)
+
+    levels = calc_levels(content_format, tile_size, max_scale)
+    manifest: dict[str, str] = {}
+    tiles: list[tuple[str, float, int, int, list[int]]] = []
+    for z in range(levels):
+        scale = level_scale(z, levels, max_scale)
+        x_tiles = ceil(content_format[0] * scale / tile_size)
+        y_tiles = ceil(content_format[1] * scale / tile_size)
+        for x in range(x_tiles):
+            x_min = x * tile_size / scale
+            x_max = (x + 1) * tile_size / scale
+            used = intersecting_columns(extents, x_min, x_max)
+            for y in range(y_tiles):
+                name = f"{z}/{x}/{y}"
+                key = region_key(shared, columns, used, z, x, y)
+                manifest[name] = key
+                path = os.path.join(out_dir, f"{name}.png")
+                if old_manifest.get(name) == key and os.path.exists(path):
+                    continue
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tiles.append((path, scale, x, y, used))
+
+    for name in old_manifest.keys() - manifest.keys():
+        path = os.path.join(out_dir, f"{name}.png")
+        if os.path.exists(path):
+            os.remove(path)
+
+    written = save_many_as_png(
+        tile_drawings(title, instruments, tiles, tile_size), workers=workers
+    )
+    save_manifest(manifest_path, manifest)
+    return written
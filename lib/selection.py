@@ -0,0 +1,274 @@
+# Selects the smallest or cheapest set of instruments which covers a span of
+# sounding pitches.
+#
+#   python -m lib.selection C3 C6 insts voice [--players 2] [--preferred]
+#   python -m lib.selection C2 C7 roster --costs fees.csv
+#
+# The instruments are given by name or as directories of instrument files, the
+# costs as CSV rows of name and cost, instruments without a cost cost 1.
+# Every pitch of the span needs --players instruments which can play it, with
+# --preferred only ranges without ! count.
+# The pitches an instrument covers are a bitset over the span. What every pitch still
+# needs is kept as bitsets too, need[j] are the pitches which need more than j
+# players, so adding an instrument is an and and an or per level.
+# Up to EXACT_LIMIT different candidates a branch and bound search finds the best
+# selection, larger catalogs are covered greedily by the most new pitches per cost,
+# after which instruments which are not needed anymore are dropped.
+
+import argparse
+import csv
+import heapq
+import math
+import sys
+
+from .catalog import expand_names
+from .chart import from_names
+from .coverage import MIDI_OFFSET, pitch_masks, pitch_name
+from .inst_graph import Instrument, StringedInst
+from .music import Pitch
+
+EXACT_LIMIT = 24
+
+
+def span_masks(
+    instruments: list[Instrument | StringedInst],
+    low: int,
+    high: int,
+    /,
+    preferred: bool = False,
+) -> list[int]:
+    """
+    the pitches from low to high every instrument can play,
+    bit 0 stands for the midi pitch low
+    """
+    window = (1 << (high - low + 1)) - 1
+    return [
+        (pitch_masks(inst)[1 if preferred else 0] >> (low + MIDI_OFFSET)) & window
+        for inst in instruments
+    ]
+
+
+def add_player(need: list[int], mask: int) -> list[int]:
+    """
+    the need after an instrument playing the pitches of mask is added
+    """
+    return [
+        (level & ~mask) | (above & mask) for level, above in zip(need, need[1:] + [0])
+    ]
+
+
+def uncovered(masks: list[int], window: int, players: int) -> int:
+    """
+    the pitches of the window which all instruments together can not cover
+    """
+    need = [window] * players
+    for mask in masks:
+        need = add_player(need, mask)
+    return need[0]
+
+
+def prune(
+    selection: list[int],
+    masks: list[int],
+    costs: list[float],
+    window: int,
+    players: int,
+) -> list[int]:
+    """
+    drops the most expensive instruments which are not needed
+    """
+    kept = sorted(selection, key=lambda i: costs[i], reverse=True)
+    for i in list(kept):
+        rest = [j for j in kept if j != i]
+        if not uncovered([masks[j] for j in rest], window, players):
+            kept = rest
+    return sorted(kept)
+
+
+def greedy_cover(
+    masks: list[int], costs: list[float], window: int, players: int
+) -> list[int] | None:
+    """
+    adds the instrument with the most needed pitches per cost until nothing is needed
+    the gains only shrink, so they are updated lazily from a heap
+    """
+    need = [window] * players
+    heap = [(-mask.bit_count() / costs[i], i) for i, mask in enumerate(masks) if mask]
+    heapq.heapify(heap)
+    selection = []
+    while need[0] and heap:
+        _, i = heapq.heappop(heap)
+        gain = (masks[i] & need[0]).bit_count() / costs[i]
+        if not gain:
+            continue
+        if heap and gain < -heap[0][0]:
+            heapq.heappush(heap, (-gain, i))
+            continue
+        selection.append(i)
+        need = add_player(need, masks[i])
+    if need[0]:
+        return None
+    return prune(selection, masks, costs, window, players)
+
+
+def exact_cover(
+    masks: list[int],
+    costs: list[float],
+    window: int,
+    players: int,
+    bound: tuple[float, list[int]] | None = None,
+) -> list[int] | None:
+    """
+    the cheapest selection, found by branching over the instruments which can play
+    the pitch with the fewest of them, bound is a known selection and its cost
+    """
+    best = bound if bound is not None else (math.inf, [])
+
+    def search(
+        need: list[int], available: list[int], cost: float, chosen: list[int]
+    ) -> None:
+        nonlocal best
+        if not need[0]:
+            if cost < best[0]:
+                best = cost, chosen
+            return
+        gains = [(masks[i] & need[0]).bit_count() for i in available]
+        if not any(gains):
+            return
+        # every instrument adds at most the largest gain to the summed need
+        missing = sum(level.bit_count() for level in need)
+        cheapest = min(costs[i] for i in available)
+        if cost + math.ceil(missing / max(gains)) * cheapest >= best[0]:
+            return
+
+        fewest: list[int] = []
+        for bit in range(need[0].bit_length()):
+            if not need[0] >> bit & 1:
+                continue
+            able = [i for i in available if masks[i] >> bit & 1]
+            if len(able) < sum(level >> bit & 1 for level in need):
+                return
+            if not fewest or len(able) < len(fewest):
+                fewest = able
+        # one of the players of the pitch with the fewest is chosen,
+        # the ones tried before are not
+        fewest.sort(key=lambda i: costs[i] / max((masks[i] & need[0]).bit_count(), 1))
+        rest = list(available)
+        for i in fewest:
+            rest.remove(i)
+            search(
+                add_player(need, masks[i]), list(rest), cost + costs[i], chosen + [i]
+            )
+
+    search([window] * players, list(range(len(masks))), 0, [])
+    if best[0] == math.inf:
+        return None
+    return sorted(best[1])
+
+
+def select(
+    instruments: list[Instrument | StringedInst],
+    low: int,
+    high: int,
+    /,
+    players: int = 1,
+    preferred: bool = False,
+    costs: list[float] | None = None,
+    exact_limit: int = EXACT_LIMIT,
+) -> list[int] | None:
+    """
+    the indices of the cheapest instruments found which together cover every
+    pitch from low to high with players instruments, None if all of them can not
+    """
+    if low > high:
+        raise ValueError(
+            f"the lowest pitch {pitch_name(low)} is above the highest {pitch_name(high)}"
+        )
+    if costs is None:
+        costs = [1.0] * len(instruments)
+    if any(cost <= 0 for cost in costs):
+        raise ValueError("the costs of the instruments must be positive")
+    window = (1 << (high - low + 1)) - 1
+    masks = span_masks(instruments, low, high, preferred=preferred)
+
+    # catalogs repeat ranges, more than players cheapest copies of a range are
+    # never needed
+    copies: dict[int, list[int]] = {}
+    for i in sorted(range(len(masks)), key=lambda i: costs[i]):
+        if masks[i] and len(copies.setdefault(masks[i], [])) < players:
+            copies[masks[i]].append(i)
+    candidates = sorted(i for same in copies.values() for i in same)
+    sub_masks = [masks[i] for i in candidates]
+    sub_costs = [costs[i] for i in candidates]
+
+    found = greedy_cover(sub_masks, sub_costs, window, players)
+    if found is not None and len(candidates) <= exact_limit:
+        bound = sum(sub_costs[i] for i in found), found
+        found = exact_cover(sub_masks, sub_costs, window, players, bound)
+    if found is None:
+        return None
+    return [candidates[i] for i in found]
+
+
+def read_costs(path: str) -> dict[str, float]:
+    with open(path, encoding="utf8", newline="") as file:
+        return {row[0]: float(row[1]) for row in csv.reader(file) if row}
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="selects the fewest or cheapest instruments covering a span"
+    )
+    parser.add_argument("low", help="lowest sounding pitch like C3")
+    parser.add_argument("high", help="highest sounding pitch like C6")
+    parser.add_argument(
+        "instruments", nargs="+", help="instrument names or directories"
+    )
+    parser.add_argument(
+        "--players", type=int, default=1, help="instruments needed for every pitch"
+    )
+    parser.add_argument(
+        "--preferred", action="store_true", help="ignore the ranges marked with !"
+    )
+    parser.add_argument("--costs", help="CSV file of instrument names and costs")
+    parser.add_argument("--exact-limit", type=int, default=EXACT_LIMIT)
+    args = parser.parse_args(argv)
+
+    low = Pitch.from_str(args.low).to_midi_pitch()
+    high = Pitch.from_str(args.high).to_midi_pitch()
+    names = expand_names(args.instruments)
+    instruments = from_names(names)
+    costs = None
+    if args.costs:
+        fees = read_costs(args.costs)
+        costs = [fees.get(name, 1.0) for name in names]
+
+    try:
+        selection = select(
+            instruments,
+            low,
+            high,
+            players=args.players,
+            preferred=args.preferred,
+            costs=costs,
+            exact_limit=args.exact_limit,
+        )
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    if selection is None:
+        window = (1 << (high - low + 1)) - 1
+        masks = span_masks(instruments, low, high, preferred=args.preferred)
+        missing = uncovered(masks, window, args.players)
+        pitches = [low + bit for bit in range(high - low + 1) if missing >> bit & 1]
+        print(f"not covered: {', '.join(pitch_name(p) for p in pitches)}")
+        return 1
+    total = sum(costs[i] for i in selection) if costs else len(selection)
+    print(f"{len(selection)} instruments, cost {total:g}")
+    for i in selection:
+        print(f"{names[i]}: {instruments[i].name}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
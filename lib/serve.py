@@ -0,0 +1,303 @@
+# Serves charts over http from a long running process, so the instruments stay parsed
+# and recent results stay in memory.
+#
+#   python -m lib.serve [--port 8000] [--root .] [-j JOBS]
+#
+#   /chart.svg?title=Winds&inst=insts/fl&inst=insts/cl
+#   /chart.pdf?...
+#   /tile/{x}/{y}.svg?...&format=A4
+#   /tile/{x}/{y}.pdf?...
+#
+# Identical requests arriving while one is rendered wait for the same result.
+# Layouts run in a thread and pdf conversions in a process pool,
+# so the event loop keeps answering requests for cached results.
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import sys
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+from .chart import from_names, make_graph, make_svg, split_into_tiles
+from .build import FORMATS
+from .cache import pdf_key, render_key
+from .convert import svg_to_pdf_bytes, to_svg_bytes
+from .inst_graph import Instrument, StringedInst
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+CONTENT_TYPES = {"svg": "image/svg+xml", "pdf": "application/pdf"}
+
+
+class HTTPError(Exception):
+    def __init__(self, status: HTTPStatus, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+class MemoryCache:
+    """
+    results by key, the least recently used are dropped once they exceed max_bytes
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        self.max_bytes = max_bytes
+        self.entries: OrderedDict[str, bytes] = OrderedDict()
+        self.size = 0
+
+    def get(self, key: str) -> bytes | None:
+        data = self.entries.get(key)
+        if data is not None:
+            self.entries.move_to_end(key)
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        if key in self.entries:
+            self.size -= len(self.entries.pop(key))
+        self.entries[key] = data
+        self.size += len(data)
+        while self.size > self.max_bytes:
+            _, old = self.entries.popitem(last=False)
+            self.size -= len(old)
+
+
+def render_chart(title: str, instruments: list[Instrument | StringedInst]) -> bytes:
+    return to_svg_bytes(make_svg(title, instruments))
+
+
+def render_tiles(
+    title: str,
+    instruments: list[Instrument | StringedInst],
+    format: tuple[float, float],
+) -> list[tuple[bytes, tuple[int, int]]]:
+    content, content_format = make_graph(title, instruments)
+    return [
+        (to_svg_bytes(tile), pos)
+        for tile, pos in split_into_tiles(content, content_format, format=format)
+    ]
+
+
+class RenderServer:
+    def __init__(
+        self,
+        root: str = ".",
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        workers: int | None = None,
+    ) -> None:
+        self.root = root
+        self.results = MemoryCache(max_bytes)
+        self.pending: dict[str, asyncio.Future] = {}
+        self.instruments: dict[str, tuple[int, Instrument | StringedInst]] = {}
+        # drawsvg is not thread safe, so layouts run one at a time
+        self.layout_pool = ThreadPoolExecutor(max_workers=1)
+        # forked workers would inherit the open client connections
+        self.convert_pool = ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+        )
+
+    def close(self) -> None:
+        self.layout_pool.shutdown()
+        self.convert_pool.shutdown()
+
+    def instrument(self, name: str) -> Instrument | StringedInst:
+        """
+        the parsed instrument, parsed again if its file changed
+        """
+        name = os.path.normpath(name)
+        if os.path.isabs(name) or name.split(os.sep)[0] == "..":
+            raise HTTPError(
+                HTTPStatus.FORBIDDEN, f"instrument '{name}' outside of root"
+            )
+        path = os.path.join(self.root, name)
+        try:
+            mtime = os.stat(f"{path}.txt").st_mtime_ns
+        except FileNotFoundError:
+            raise HTTPError(HTTPStatus.NOT_FOUND, f"unknown instrument '{name}'")
+        cached = self.instruments.get(name)
+        if cached is None or cached[0] != mtime:
+            cached = (mtime, from_names([path])[0])
+            self.instruments[name] = cached
+        return cached[1]
+
+    async def once[T](self, key: str, compute: Callable[[], Awaitable[T]]) -> T:
+        """
+        awaits the result of compute, which only runs once for all concurrent calls with key
+        """
+        if key not in self.pending:
+            self.pending[key] = asyncio.ensure_future(compute())
+            self.pending[key].add_done_callback(lambda _: self.pending.pop(key))
+        # a client going away must not cancel the render the others wait for
+        return await asyncio.shield(self.pending[key])
+
+    async def cached(self, key: str, compute: Callable[[], Awaitable[bytes]]) -> bytes:
+        data = self.results.get(key)
+        if data is not None:
+            return data
+
+        async def compute_and_store() -> bytes:
+            data = await compute()
+            self.results.put(key, data)
+            return data
+
+        return await self.once(key, compute_and_store)
+
+    async def layout[T](self, function: Callable[..., T], *args) -> T:
+        return await asyncio.get_running_loop().run_in_executor(
+            self.layout_pool, function, *args
+        )
+
+    async def chart_svg(
+        self, title: str, instruments: list[Instrument | StringedInst]
+    ) -> bytes:
+        return await self.cached(
+            render_key("svg", title, instruments),
+            lambda: self.layout(render_chart, title, instruments),
+        )
+
+    async def tile_svg(
+        self,
+        title: str,
+        instruments: list[Instrument | StringedInst],
+        format: tuple[float, float],
+        pos: tuple[int, int],
+    ) -> bytes:
+        def key(pos: tuple[int, int]) -> str:
+            return render_key("tile", title, instruments, format, *pos)
+
+        async def compute() -> bytes:
+            # all tiles of a chart are laid out together and cached for the next requests
+            tiles = await self.once(
+                render_key("tiles", title, instruments, format),
+                lambda: self.layout(render_tiles, title, instruments, format),
+            )
+            found = None
+            for svg, tile_pos in tiles:
+                if tile_pos == pos:
+                    found = svg
+                else:
+                    self.results.put(key(tile_pos), svg)
+            if found is None:
+                raise HTTPError(HTTPStatus.NOT_FOUND, f"no tile at {pos}")
+            return found
+
+        return await self.cached(key(pos), compute)
+
+    async def pdf(self, svg: bytes) -> bytes:
+        loop = asyncio.get_running_loop()
+        return await self.cached(
+            pdf_key(svg),
+            lambda: loop.run_in_executor(self.convert_pool, svg_to_pdf_bytes, svg),
+        )
+
+    async def respond(self, target: str) -> tuple[str, bytes]:
+        url = urlsplit(target)
+        query = parse_qs(url.query)
+        title = query.get("title", ["Ranges"])[0]
+        names = query.get("inst", [])
+        if not names:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "no instruments, add inst=...")
+        instruments = [self.instrument(name) for name in names]
+        format_name = query.get("format", ["A4"])[0]
+        if format_name not in FORMATS:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"unknown format '{format_name}'")
+
+        match url.path.strip("/").split("/"):
+            case ["chart.svg" | "chart.pdf" as file]:
+                ext = file.removeprefix("chart.")
+                svg = await self.chart_svg(title, instruments)
+            case ["tile", x, file] if file.endswith((".svg", ".pdf")):
+                y, ext = file.rsplit(".", 1)
+                pos = (int(x), int(y))
+                svg = await self.tile_svg(title, instruments, FORMATS[format_name], pos)
+            case _:
+                raise HTTPError(HTTPStatus.NOT_FOUND, f"no such path '{url.path}'")
+        if ext == "pdf":
+            return ext, await self.pdf(svg)
+        return ext, svg
+
+    async def handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            request_line = await reader.readline()
+            # the headers are not needed
+            while (await reader.readline()).strip():
+                pass
+            try:
+                method, target, _ = request_line.decode("latin-1").split(" ", 2)
+                if method != "GET":
+                    raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED, "only GET is served")
+                ext, body = await self.respond(target)
+                status, content_type = HTTPStatus.OK, CONTENT_TYPES[ext]
+            except HTTPError as e:
+                status, content_type = e.status, "text/plain"
+                body = f"{e}\n".encode("utf-8")
+            except (ValueError, AssertionError) as e:
+                status, content_type = HTTPStatus.BAD_REQUEST, "text/plain"
+                body = f"{e}\n".encode("utf-8")
+            except Exception as e:
+                print(f"failed {target}: {e!r}", file=sys.stderr)
+                status, content_type = HTTPStatus.INTERNAL_SERVER_ERROR, "text/plain"
+                body = f"{e!r}\n".encode("utf-8")
+            head = (
+                f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                f"Content-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                "Connection: close\r\n\r\n"
+            )
+            writer.write(head.encode("latin-1") + body)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+async def serve(
+    host: str = "127.0.0.1",
+    port: int = 8000,
+    /,
+    root: str = ".",
+    max_bytes: int = DEFAULT_MAX_BYTES,
+    workers: int | None = None,
+) -> None:
+    server = RenderServer(root, max_bytes, workers)
+    try:
+        async with await asyncio.start_server(server.handle, host, port) as listener:
+            print(f"serving charts on http://{host}:{port}/")
+            await listener.serve_forever()
+    finally:
+        server.close()
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="renders charts on request")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--root", default=".", help="directory of the instruments")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="pdf workers")
+    parser.add_argument(
+        "--cache-mb", type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024)
+    )
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(
+            serve(
+                args.host,
+                args.port,
+                root=args.root,
+                max_bytes=args.cache_mb * 1024 * 1024,
+                workers=args.jobs,
+            )
+        )
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
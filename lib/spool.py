@@ -0,0 +1,397 @@
+# A render job queue in a spool directory, shared by workers on every machine
+# which mounts it. Paths in the jobs are relative to the directory the workers run in.
+#
+#   python -m lib.spool SPOOL enqueue charts.toml [-o OUT]
+#   python -m lib.spool SPOOL work [--lease SECONDS] [--exit]
+#   python -m lib.spool SPOOL status
+#
+#   SPOOL/pending/{id}.json   waiting jobs
+#   SPOOL/claimed/{id}.json   jobs being rendered, the modification time is the lease
+#   SPOOL/done/{id}.json      finished jobs
+#   SPOOL/failed/{id}.json    jobs which failed MAX_ATTEMPTS times, with their errors
+#
+# A job is claimed by renaming it from pending to claimed, which only one worker
+# can do, so there are no locks which would need a working lock daemon on network
+# filesystems. The claiming worker renews the lease by touching the file, a job with
+# an expired lease is put back to pending by whichever process notices first.
+# Outputs are replaced atomically, so a job rendered twice after a lost lease is harmless.
+
+import argparse
+import hashlib
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from functools import lru_cache
+
+from .chart import (
+    calc_tile_regions,
+    from_names,
+    graph_format,
+    make_graph,
+    make_svg,
+    split_into_tiles,
+)
+from .build import load_charts
+from .convert import svg_to_pdf_bytes, tile_path, to_svg_bytes
+from .deps import stable_hash
+
+STATES = ["pending", "claimed", "done", "failed"]
+LEASE = 120.0
+MAX_ATTEMPTS = 3
+POLL_INTERVAL = 1.0
+
+
+def write_atomic(path: str, data: bytes) -> None:
+    tmp_path = f"{path}.{socket.gethostname()}.{os.getpid()}.tmp"
+    with open(tmp_path, mode="wb") as file:
+        file.write(data)
+    os.replace(tmp_path, path)
+
+
+def file_hashes(names: list[str]) -> list[str | None]:
+    """
+    hashes of the contents of the instrument files, None for missing files
+    """
+    hashes: list[str | None] = []
+    for name in names:
+        try:
+            with open(f"{name}.txt", mode="rb") as file:
+                hashes.append(hashlib.sha256(file.read()).hexdigest())
+        except FileNotFoundError:
+            hashes.append(None)
+    return hashes
+
+
+class Spool:
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        for state in STATES:
+            os.makedirs(os.path.join(directory, state), exist_ok=True)
+
+    def path(self, state: str, job_id: str) -> str:
+        return os.path.join(self.directory, state, f"{job_id}.json")
+
+    def ids(self, state: str) -> list[str]:
+        return sorted(
+            file[: -len(".json")]
+            for file in os.listdir(os.path.join(self.directory, state))
+            if file.endswith(".json")
+        )
+
+    def read(self, state: str, job_id: str) -> dict:
+        with open(self.path(state, job_id), encoding="utf8") as file:
+            return json.load(file)
+
+    def write(self, state: str, job: dict) -> None:
+        write_atomic(self.path(state, job["id"]), json.dumps(job).encode("utf-8"))
+
+    def now(self) -> float:
+        """
+        the time of the filesystem, leases are compared against it
+        so the clocks of the machines do not have to agree
+        """
+        clock = os.path.join(self.directory, f".clock.{socket.gethostname()}")
+        with open(clock, mode="wb"):
+            pass
+        return os.stat(clock).st_mtime
+
+    def enqueue(self, job: dict) -> bool:
+        """
+        adds a job unless the same job is already queued or done
+        a job for edited instrument files is not the same job
+        returns whether it was added
+        """
+        job = {"attempts": 0, "errors": [], **job}
+        fields = {k: v for k, v in job.items() if k not in ["attempts", "errors"]}
+        job["id"] = stable_hash([fields, file_hashes(job["instruments"])])[:16]
+        for state in STATES:
+            if os.path.exists(self.path(state, job["id"])):
+                return False
+        self.write("pending", job)
+        return True
+
+    def claim(self) -> dict | None:
+        for job_id in self.ids("pending"):
+            if os.path.exists(self.path("done", job_id)):
+                # a job requeued after a lost lease which finished anyway
+                os.remove(self.path("pending", job_id))
+                continue
+            try:
+                # the lease starts before the rename, so it is never seen expired
+                os.utime(self.path("pending", job_id))
+                os.rename(self.path("pending", job_id), self.path("claimed", job_id))
+            except FileNotFoundError:
+                # claimed by another worker first
+                continue
+            return self.read("claimed", job_id)
+        return None
+
+    def renew(self, job: dict) -> None:
+        try:
+            os.utime(self.path("claimed", job["id"]))
+        except FileNotFoundError:
+            pass
+
+    def finish(self, job: dict) -> None:
+        self.write("done", job)
+        try:
+            os.remove(self.path("claimed", job["id"]))
+        except FileNotFoundError:
+            pass
+
+    def fail(self, job: dict, error: str) -> None:
+        job["attempts"] += 1
+        job["errors"].append(f"{socket.gethostname()}: {error}")
+        self.write("pending" if job["attempts"] < MAX_ATTEMPTS else "failed", job)
+        try:
+            os.remove(self.path("claimed", job["id"]))
+        except FileNotFoundError:
+            pass
+
+    def expired(self, lease: float = LEASE) -> list[str]:
+        now = self.now()
+        expired = []
+        for job_id in self.ids("claimed"):
+            try:
+                if now - os.stat(self.path("claimed", job_id)).st_mtime >= lease:
+                    expired.append(job_id)
+            except FileNotFoundError:
+                pass
+        return expired
+
+    def requeue_expired(self, lease: float = LEASE) -> list[str]:
+        """
+        puts claimed jobs whose lease ran out back to pending, counting it as an attempt
+        """
+        requeued = []
+        for job_id in self.expired(lease):
+            path = self.path("claimed", job_id)
+            try:
+                job = self.read("claimed", job_id)
+                # whoever renames it first requeues it
+                os.rename(path, f"{path}.expired")
+            except FileNotFoundError:
+                continue
+            self.fail(job, "lease expired")
+            os.remove(f"{path}.expired")
+            requeued.append(job_id)
+        return requeued
+
+    def status(self, lease: float = LEASE) -> dict[str, int]:
+        counts = {state: len(self.ids(state)) for state in STATES}
+        counts["expired"] = len(self.expired(lease))
+        return counts
+
+
+def chart_job(title: str, instruments: list[str], path: str) -> dict:
+    return {"kind": "chart", "title": title, "instruments": instruments, "path": path}
+
+
+def tile_jobs(
+    title: str,
+    instruments: list[str],
+    prefix: str,
+    /,
+    margin: float,
+    min_overlap: float,
+    format: tuple[float, float],
+) -> list[dict]:
+    content_format = graph_format(from_names(instruments))
+    return [
+        {
+            "kind": "tile",
+            "title": title,
+            "instruments": instruments,
+            "margin": margin,
+            "min_overlap": min_overlap,
+            "format": list(format),
+            "pos": list(pos),
+            "path": tile_path(prefix, pos),
+        }
+        for pos in calc_tile_regions(content_format, format, margin, min_overlap)
+    ]
+
+
+@lru_cache(maxsize=4)
+def _tiles(layout: str, mtimes: tuple[int, ...]) -> dict[tuple[int, int], bytes]:
+    """
+    all tiles of a chart, so a worker claiming several tiles of a chart lays it out once
+    the modification times of the instrument files invalidate the cached tiles
+    """
+    fields = json.loads(layout)
+    content, content_format = make_graph(
+        fields["title"], from_names(fields["instruments"])
+    )
+    return {
+        pos: to_svg_bytes(tile)
+        for tile, pos in split_into_tiles(
+            content,
+            content_format,
+            margin=fields["margin"],
+            min_overlap=fields["min_overlap"],
+            format=tuple(fields["format"]),
+        )
+    }
+
+
+def render_job(job: dict) -> None:
+    match job["kind"]:
+        case "chart":
+            svg = make_svg(job["title"], from_names(job["instruments"]))
+            svg_bytes = to_svg_bytes(svg)
+        case "tile":
+            layout = {
+                k: job[k]
+                for k in ["title", "instruments", "margin", "min_overlap", "format"]
+            }
+            mtimes = tuple(
+                os.stat(f"{name}.txt").st_mtime_ns for name in job["instruments"]
+            )
+            tiles = _tiles(json.dumps(layout, sort_keys=True), mtimes)
+            pos = (job["pos"][0], job["pos"][1])
+            if pos not in tiles:
+                raise ValueError(f"the chart has no tile {pos}")
+            svg_bytes = tiles[pos]
+        case kind:
+            raise ValueError(f"unknown job kind '{kind}'")
+    directory = os.path.dirname(job["path"])
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    write_atomic(job["path"], svg_to_pdf_bytes(svg_bytes))
+
+
+def _renew_until(
+    spool: Spool, job: dict, stop: threading.Event, interval: float
+) -> None:
+    while not stop.wait(interval):
+        spool.renew(job)
+
+
+def work(
+    spool: Spool,
+    /,
+    lease: float = LEASE,
+    exit_when_empty: bool = False,
+    poll_interval: float = POLL_INTERVAL,
+) -> int:
+    """
+    renders jobs until interrupted, or until no job is left if exit_when_empty
+    returns the number of finished jobs
+    """
+    finished = 0
+    while True:
+        spool.requeue_expired(lease)
+        job = spool.claim()
+        if job is None:
+            if (
+                exit_when_empty
+                and not spool.ids("pending")
+                and not spool.ids("claimed")
+            ):
+                return finished
+            time.sleep(poll_interval)
+            continue
+
+        stop = threading.Event()
+        renewer = threading.Thread(
+            target=_renew_until, args=(spool, job, stop, lease / 3), daemon=True
+        )
+        renewer.start()
+        try:
+            render_job(job)
+        except Exception as e:
+            print(f"failed {job['path']}: {e}", file=sys.stderr)
+            spool.fail(job, repr(e))
+            continue
+        finally:
+            stop.set()
+            renewer.join()
+        spool.finish(job)
+        finished += 1
+        print(f"rendered {job['path']}")
+
+
+def enqueue_manifest(spool: Spool, manifest: str, out_dir: str) -> int:
+    """
+    queues the pdf and tiles outputs of the charts in a manifest
+    returns the number of added jobs
+    """
+    jobs = []
+    for chart in load_charts(manifest):
+        prefix = os.path.join(out_dir, chart.name)
+        for output in chart.outputs:
+            match output:
+                case "pdf":
+                    jobs.append(
+                        chart_job(chart.title, chart.instruments, f"{prefix}.pdf")
+                    )
+                case "tiles":
+                    jobs.extend(
+                        tile_jobs(
+                            chart.title,
+                            chart.instruments,
+                            prefix,
+                            margin=chart.margin,
+                            min_overlap=chart.min_overlap,
+                            format=chart.format,
+                        )
+                    )
+                case _:
+                    print(
+                        f"skipping {chart.name}:{output}, only pdf and tiles are queued"
+                    )
+    return sum(spool.enqueue(job) for job in jobs)
+
+
+def format_status(counts: dict[str, int]) -> str:
+    total = sum(counts[state] for state in STATES)
+    done = counts["done"] + counts["failed"]
+    percent = 100 * done / total if total else 100.0
+    return (
+        f"{done}/{total} ({percent:.0f}%) finished: {counts['done']} done, "
+        f"{counts['failed']} failed, {counts['claimed']} rendering "
+        f"({counts['expired']} expired), {counts['pending']} pending"
+    )
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="render job queue in a shared directory"
+    )
+    parser.add_argument("spool", help="the shared spool directory")
+    commands = parser.add_subparsers(dest="command", required=True)
+    enqueue = commands.add_parser("enqueue", help="queue the outputs of a manifest")
+    enqueue.add_argument("manifest", help="TOML or JSON file describing the charts")
+    enqueue.add_argument("-o", "--out", default="out", help="output directory")
+    worker = commands.add_parser("work", help="render queued jobs")
+    worker.add_argument("--lease", type=float, default=LEASE, help="lease in seconds")
+    worker.add_argument(
+        "--exit", action="store_true", help="stop once the queue is empty"
+    )
+    commands.add_parser("status", help="print the progress")
+    args = parser.parse_args(argv)
+
+    spool = Spool(args.spool)
+    match args.command:
+        case "enqueue":
+            print(f"queued {enqueue_manifest(spool, args.manifest, args.out)} jobs")
+        case "work":
+            try:
+                work(spool, lease=args.lease, exit_when_empty=args.exit)
+            except KeyboardInterrupt:
+                pass
+        case "status":
+            counts = spool.status()
+            print(format_status(counts))
+            for job_id in spool.ids("failed"):
+                job = spool.read("failed", job_id)
+                print(f"failed {job['path']}: {job['errors'][-1]}")
+            return 1 if counts["failed"] else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,288 @@
+# Generates catalogs of random but valid instrument files, to test the library at
+# the scale of real catalogs.
+#
+#   python -m lib.synth OUT [-n 1000] [--seed 0] [--stringed 0.3]
+#   python -m lib.synth OUT --check [-n 200] [--seed 0]
+#
+# The same seed always gives the same files. The instruments have random
+# transpositions, ranges with and without !, up to MAX_STRINGS open strings,
+# pitches with double accidentals in extreme registers and long descriptions.
+# --check also runs the differential checks, every fast path is compared against
+# the straightforward way of computing the same thing:
+#
+#   parse        parse of the file against parse_str of its text
+#   transpose    Pitch.transposed against adding the halftones to the midi pitch
+#   columns      a chart drawn with columns reused from other charts against a fresh one
+
+import argparse
+import os
+import random
+import sys
+
+from .chart import draw_column, from_names, from_str, make_svg
+from .inst_graph import Instrument, StringedInst
+from .music import Interval, Pitch
+from .parser import parse, parse_str
+
+MAX_RANGES = 6
+MAX_STRINGS = 12
+# staff positions of C0 to B8 and of C2 to B6
+EXTREME_REGISTER = (-28, 34)
+COMMON_REGISTER = (-14, 20)
+ACCIDENTAL_WEIGHTS = {"": 10, "b": 3, "#": 3, "&": 1, "+": 1}
+# intervals which from_halftones never returns
+ODD_INTERVALS = ["a1", "a4", "d5", "-a4", "-d5", "d8", "-a8", "a2", "-d7"]
+WORDS = (
+    "airy bright brilliant covered dark dull easy edgy focused full harsh lead "
+    "light loud muddy nasal open piercing pressed rich soft strained sweet thin "
+    "warm weak breathy comfortable extended falsetto growl harmonics pedal tones"
+).split()
+
+
+def random_words(rng: random.Random, low: int, high: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(low, high)))
+
+
+def random_accidental(rng: random.Random) -> str:
+    return rng.choices(list(ACCIDENTAL_WEIGHTS), list(ACCIDENTAL_WEIGHTS.values()))[0]
+
+
+def random_pitches(rng: random.Random, n: int, register: tuple[int, int]) -> list[str]:
+    """
+    n pitches ascending in staff position and in pitch
+    """
+    positions = sorted(rng.sample(range(register[0], register[1] + 1), n))
+    naturals = [str(Pitch.from_staff_position(position)) for position in positions]
+    for _ in range(10):
+        pitches = [f"{p[0]}{random_accidental(rng)}{p[1:]}" for p in naturals]
+        midi = [Pitch.from_str(p).to_midi_pitch() for p in pitches]
+        if all(low < high for low, high in zip(midi, midi[1:])):
+            return pitches
+    return naturals
+
+
+def random_intervals(rng: random.Random, n: int) -> list[str]:
+    """
+    n different upward intervals of at most three octaves in ascending order
+    """
+    intervals: dict[str, Interval] = {}
+    while len(intervals) < n:
+        interval = Interval.from_halftones(rng.randint(0, 36))
+        if rng.random() < 0.2:
+            interval = Interval.from_str(
+                rng.choice([i for i in ODD_INTERVALS if i[0] != "-"])
+            )
+        intervals[str(interval)] = interval
+    return sorted(intervals, key=lambda i: intervals[i].num_lex_ord())
+
+
+def random_transposition(rng: random.Random) -> str | None:
+    if rng.random() < 0.4:
+        return None
+    if rng.random() < 0.2:
+        return rng.choice(ODD_INTERVALS)
+    return str(Interval.from_halftones(rng.randint(-24, 24)))
+
+
+def range_lines(rng: random.Random, bounds: list[str]) -> list[str]:
+    """
+    ranges between the bounds, neighbouring ranges share a bound by chance
+    the ranges are shuffled, the instruments sort them
+    """
+    ranges = []
+    i = 0
+    while i + 1 < len(bounds):
+        start, end = bounds[i], bounds[i + 1]
+        mark = "!" if rng.random() < 0.3 else ""
+        description = random_words(rng, 0, 3 if rng.random() < 0.8 else 20)
+        ranges.append(f"{mark}{start} {end} {description}".rstrip())
+        # a shared bound continues at the end, otherwise the next range starts later
+        i += 1 if rng.random() < 0.3 else 2
+    rng.shuffle(ranges)
+    return ranges
+
+
+def is_valid(text: str) -> bool:
+    """
+    whether the library accepts the instrument file
+    a transposition can turn a range around, when a pitch would need more than a
+    double accidental it falls back to the spelling of the normalized pitch
+    """
+    try:
+        inst = from_str(text)
+        if isinstance(inst, Instrument):
+            inst.get_sounding_pitch_ranges()
+    except (AssertionError, ValueError):
+        return False
+    return True
+
+
+def synth_instrument(rng: random.Random, index: int, stringed: float = 0.3) -> str:
+    """
+    the text of a random instrument file, invalid instruments are drawn again
+    """
+    while True:
+        text = random_instrument(rng, index, stringed)
+        if is_valid(text):
+            return text
+
+
+def random_instrument(rng: random.Random, index: int, stringed: float) -> str:
+    name = f"{random_words(rng, 1, 2).title()} {index}"
+    sections = [name]
+    transposition = random_transposition(rng)
+    if transposition is not None:
+        sections.append(f"Transposition: {transposition}")
+
+    n_ranges = rng.randint(1, MAX_RANGES)
+    if rng.random() < stringed:
+        register = COMMON_REGISTER
+        n_strings = rng.randint(2, MAX_STRINGS)
+        strings = random_pitches(rng, n_strings, register)
+        sections.append(f"Open Strings: {' '.join(strings)}")
+        bounds = random_intervals(rng, 2 * n_ranges)
+    else:
+        extreme = rng.random() < 0.1
+        register = EXTREME_REGISTER if extreme else COMMON_REGISTER
+        bounds = random_pitches(rng, 2 * n_ranges, register)
+    sections.append("Ranges:\n" + "\n".join(range_lines(rng, bounds)))
+
+    if rng.random() < 0.3:
+        sections.append(f"Notes:\n{random_words(rng, 5, 40)}")
+    return "\n\n".join(sections) + "\n"
+
+
+def synth_catalog(n: int, /, seed: int = 0, stringed: float = 0.3) -> list[str]:
+    rng = random.Random(seed)
+    return [synth_instrument(rng, i, stringed) for i in range(n)]
+
+
+def write_catalog(texts: list[str], out_dir: str) -> list[str]:
+    """
+    writes the instrument files and returns their names as used by from_names
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    names = []
+    for i, text in enumerate(texts):
+        name = os.path.join(out_dir, f"{i:05}")
+        with open(f"{name}.txt", encoding="utf8", mode="w") as file:
+            file.write(text)
+        names.append(name)
+    return names
+
+
+def check_parse(name: str) -> list[str]:
+    with open(f"{name}.txt", encoding="utf8") as file:
+        text = file.read()
+    if parse(f"{name}.txt") != parse_str(text):
+        return [f"parse: {name} differs from parse_str"]
+    return []
+
+
+def check_transpose(inst: Instrument | StringedInst) -> list[str]:
+    if isinstance(inst, StringedInst):
+        steps = [
+            (string, interval)
+            for string in inst.open_strings
+            for r in inst.ranges
+            for interval in [r.start, r.end]
+        ]
+        steps += [
+            (pitch.transposed(interval), inst.transposition)
+            for pitch, interval in steps
+        ]
+    else:
+        steps = [(p, inst.transposition) for r in inst.ranges for p in [r.start, r.end]]
+    errors = []
+    for pitch, interval in steps:
+        transposed = pitch.transposed(interval)
+        if (
+            transposed.to_midi_pitch()
+            != pitch.to_midi_pitch() + interval.to_halftones()
+        ):
+            errors.append(
+                f"transpose: {pitch} by {interval} gave {transposed} in {inst.name}"
+            )
+    return errors
+
+
+def check_columns(
+    instruments: list[Instrument | StringedInst], chart_size: int
+) -> list[str]:
+    """
+    draws overlapping charts once with a shared column memo and once fresh
+    """
+    columns = {}
+
+    def memoized(inst, y_min, y_max):
+        key = (id(inst), y_min, y_max)
+        if key not in columns:
+            columns[key] = draw_column(inst, y_min, y_max)
+        return columns[key]
+
+    errors = []
+    step = max(1, chart_size // 2)
+    for start in range(0, max(1, len(instruments) - chart_size + 1), step):
+        chart = instruments[start : start + chart_size]
+        # the reversed chart has the same extents, so it fills the memo with its columns
+        make_svg("Check", chart[::-1], memoized).as_svg()
+        if (
+            make_svg("Check", chart, memoized).as_svg()
+            != make_svg("Check", chart).as_svg()
+        ):
+            errors.append(f"columns: chart of {', '.join(i.name for i in chart)}")
+    return errors
+
+
+def differential(names: list[str], /, chart_size: int = 8) -> list[str]:
+    """
+    runs every check on the catalog and returns the differences found
+    instruments which can not be drawn are reported and left out of the charts
+    """
+    errors = []
+    instruments = []
+    for name in names:
+        errors.extend(check_parse(name))
+        try:
+            inst = from_names([name])[0]
+            errors.extend(check_transpose(inst))
+            make_svg("Check", [inst])
+        except Exception as e:
+            errors.append(f"draw: {name}: {e!r}")
+            continue
+        instruments.append(inst)
+    errors.extend(check_columns(instruments, chart_size))
+    return errors
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="generates random instrument files")
+    parser.add_argument("out", help="directory for the instrument files")
+    parser.add_argument("-n", type=int, default=1000, help="number of instruments")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--stringed", type=float, default=0.3, help="share of stringed instruments"
+    )
+    parser.add_argument(
+        "--check", action="store_true", help="run the differential checks"
+    )
+    parser.add_argument(
+        "--chart-size", type=int, default=8, help="instruments per checked chart"
+    )
+    args = parser.parse_args(argv)
+
+    texts = synth_catalog(args.n, seed=args.seed, stringed=args.stringed)
+    names = write_catalog(texts, args.out)
+    print(f"wrote {len(names)} instruments to {args.out}")
+    if not args.check:
+        return 0
+
+    errors = differential(names, chart_size=args.chart_size)
+    for error in errors:
+        print(error)
+    print(f"{len(errors)} differences")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,319 @@
+# Opt-in tracing of the render stages. The library opens a span around every stage,
+# without an active tracer a span does nothing, so nothing has to be switched on
+# in the code that is traced.
+#
+#   with tracing(json_sink("trace.jsonl")) as tracer:
+#       make_svg(...)
+#   print(tracer.summary)
+#
+#   python -m lib.trace trace.jsonl [--top N]    # summarizes a trace file
+#
+# Every finished span is passed to the sink as a record:
+#
+#   {"span": "column", "instrument": "Flute", "seconds": 0.0012, "elements": 41,
+#    "peak": 18624, "depth": 3, "pid": 4242}
+#
+# A span inherits the fields of the span it is opened in, so the spans inside
+# a column know their instrument. peak is the highest memory traced while the span
+# was open, relative to its start, and only recorded with memory=True.
+# Counters record rare events, like a transposition which needs more than a double
+# accidental, as {"counter": name, "n": 1, "span": enclosing span, ...fields}.
+# Spans are tracked per thread, a process pool has to start a tracer in every worker.
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from collections.abc import Callable, Iterable, Iterator
+from contextlib import contextmanager
+from functools import wraps
+
+type Sink = Callable[[dict], None]
+
+
+def count_elements(element) -> int:
+    """
+    the number of svg elements in a drawing or group, including itself
+    """
+    children = getattr(element, "children", None) or getattr(element, "elements", [])
+    return 1 + sum(count_elements(child) for child in children)
+
+
+class Summary:
+    """
+    aggregates span and counter records
+    """
+
+    def __init__(self) -> None:
+        # name: [count, seconds, max seconds, elements, max peak]
+        self.spans: dict[str, list[float]] = defaultdict(lambda: [0, 0.0, 0.0, 0, 0])
+        self.instruments: dict[tuple[str, str], float] = defaultdict(float)
+        self.counters: dict[str, int] = defaultdict(int)
+        self.lock = threading.Lock()
+
+    def add(self, record: dict) -> None:
+        with self.lock:
+            if "counter" in record:
+                self.counters[record["counter"]] += record["n"]
+                return
+            stats = self.spans[record["span"]]
+            stats[0] += 1
+            stats[1] += record["seconds"]
+            stats[2] = max(stats[2], record["seconds"])
+            stats[3] += record.get("elements", 0)
+            stats[4] = max(stats[4], record.get("peak", 0))
+            if "instrument" in record:
+                self.instruments[(record["span"], record["instrument"])] += record[
+                    "seconds"
+                ]
+
+    def format(self, top: int = 10) -> str:
+        lines = [
+            f"{'span':<20}{'count':>8}{'total':>12}{'max':>12}{'elements':>10}{'peak':>10}"
+        ]
+        for name, (n, seconds, longest, elements, peak) in sorted(
+            self.spans.items(), key=lambda item: -item[1][1]
+        ):
+            lines.append(
+                f"{name:<20}{n:>8}{seconds * 1000:>10.1f}ms{longest * 1000:>10.1f}ms"
+                f"{elements:>10}{peak / 1024:>8.0f}kB"
+            )
+        if self.instruments:
+            lines.append(f"slowest instruments (top {top}):")
+            for (name, instrument), seconds in sorted(
+                self.instruments.items(), key=lambda item: -item[1]
+            )[:top]:
+                lines.append(f"  {name:<18}{seconds * 1000:>10.1f}ms  {instrument}")
+        for name, n in sorted(self.counters.items()):
+            lines.append(f"counter {name}: {n}")
+        return "\n".join(lines)
+
+    def __str__(self) -> str:
+        return self.format()
+
+
+class Span:
+    def __init__(self, tracer: "Tracer", name: str, fields: dict) -> None:
+        self.tracer = tracer
+        self.name = name
+        self.fields = fields
+        self.values: dict = {}
+        self.parent: Span | None = None
+        # the highest memory seen in the spans opened inside this one
+        self.child_peak = 0
+
+    def set(self, **values) -> None:
+        """
+        records values like sizes with the span
+        """
+        self.values.update(values)
+
+    def elements(self, element) -> None:
+        self.values["elements"] = count_elements(element)
+
+    def __enter__(self) -> "Span":
+        stack = self.tracer.stack()
+        if stack:
+            self.parent = stack[-1]
+            self.fields = {**self.parent.fields, **self.fields}
+        stack.append(self)
+        if self.tracer.memory:
+            self.memory_start, peak = tracemalloc.get_traced_memory()
+            if self.parent is not None:
+                self.parent.child_peak = max(self.parent.child_peak, peak)
+            tracemalloc.reset_peak()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, *_) -> None:
+        seconds = time.perf_counter() - self.start
+        record = {"span": self.name, **self.fields, **self.values, "seconds": seconds}
+        if exc_type is not None:
+            record["error"] = exc_type.__name__
+        if self.tracer.memory:
+            peak = max(tracemalloc.get_traced_memory()[1], self.child_peak)
+            record["peak"] = peak - self.memory_start
+            if self.parent is not None:
+                self.parent.child_peak = max(self.parent.child_peak, peak)
+        self.tracer.stack().pop()
+        record["depth"] = len(self.tracer.stack())
+        self.tracer.emit(record)
+
+
+class _NullSpan:
+    """
+    the span without an active tracer
+    """
+
+    def set(self, **values) -> None:
+        pass
+
+    def elements(self, element) -> None:
+        pass
+
+    def __enter__(self) -> "_NullSpan":
+        return self
+
+    def __exit__(self, *_) -> None:
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Tracer:
+    def __init__(self, sink: Sink | None = None, /, memory: bool = False) -> None:
+        self.sink = sink
+        self.memory = memory
+        # whether tracemalloc was started for this tracer and has to be stopped with it
+        self.owns_tracemalloc = False
+        self.summary = Summary()
+        self.local = threading.local()
+
+    def stack(self) -> list[Span]:
+        if not hasattr(self.local, "stack"):
+            self.local.stack = []
+        return self.local.stack
+
+    def emit(self, record: dict) -> None:
+        record["pid"] = os.getpid()
+        self.summary.add(record)
+        if self.sink is not None:
+            self.sink(record)
+
+    def count(self, name: str, n: int, fields: dict) -> None:
+        stack = self.stack()
+        context = {"span": stack[-1].name, **stack[-1].fields} if stack else {}
+        self.emit({"counter": name, "n": n, **context, **fields})
+
+
+_tracer: Tracer | None = None
+
+
+def span(name: str, **fields) -> Span | _NullSpan:
+    """
+    a context manager timing a stage, fields like the instrument are recorded with it
+    """
+    if _tracer is None:
+        return _NULL_SPAN
+    return Span(_tracer, name, fields)
+
+
+def traced(name: str) -> Callable[[Callable], Callable]:
+    """
+    decorates a function to run in a span
+    """
+
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            if _tracer is None:
+                return function(*args, **kwargs)
+            with Span(_tracer, name, {}):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def count(name: str, n: int = 1, **fields) -> None:
+    """
+    counts an event in the innermost span
+    """
+    if _tracer is not None:
+        _tracer.count(name, n, fields)
+
+
+def start(sink: Sink | None = None, /, memory: bool = False) -> Tracer:
+    """
+    starts tracing in this process, memory=True also records the memory peaks
+    which makes everything a lot slower
+    """
+    global _tracer
+    if _tracer is not None:
+        raise RuntimeError("already tracing")
+    _tracer = Tracer(sink, memory=memory)
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        _tracer.owns_tracemalloc = True
+    return _tracer
+
+
+def stop() -> None:
+    """
+    stops tracing and closes the sink if it can be closed
+    """
+    global _tracer
+    if _tracer is None:
+        return
+    if _tracer.owns_tracemalloc:
+        tracemalloc.stop()
+    close = getattr(_tracer.sink, "close", None)
+    if close is not None:
+        close()
+    _tracer = None
+
+
+@contextmanager
+def tracing(sink: Sink | None = None, /, memory: bool = False) -> Iterator[Tracer]:
+    tracer = start(sink, memory=memory)
+    try:
+        yield tracer
+    finally:
+        stop()
+
+
+class JsonSink:
+    """
+    appends every record as a JSON line, several processes can share the file
+    """
+
+    def __init__(self, path: str) -> None:
+        self.file = open(path, encoding="utf8", mode="a")
+        self.lock = threading.Lock()
+
+    def __call__(self, record: dict) -> None:
+        with self.lock:
+            # one write per record, so the lines of processes are not interleaved
+            self.file.write(json.dumps(record) + "\n")
+            self.file.flush()
+
+    def close(self) -> None:
+        self.file.close()
+
+
+def json_sink(path: str) -> JsonSink:
+    return JsonSink(path)
+
+
+def read_records(path: str) -> Iterable[dict]:
+    with open(path, encoding="utf8") as file:
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+
+
+def summarize(records: Iterable[dict]) -> Summary:
+    summary = Summary()
+    for record in records:
+        summary.add(record)
+    return summary
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="summarizes a trace file")
+    parser.add_argument("trace", help="JSON lines written by json_sink")
+    parser.add_argument("--top", type=int, default=10, help="instruments to list")
+    args = parser.parse_args(argv)
+
+    print(summarize(read_records(args.trace)).format(top=args.top))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
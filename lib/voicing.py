@@ -0,0 +1,190 @@
+# Assigns the sounding pitches of chords to the instruments of an ensemble.
+#
+#   python -m lib.voicing chords.txt insts/fl insts/cl insts/tp insts/fh
+#
+# Every line of the chord file is a chord of sounding pitches like "C4 E4 G4 C5",
+# empty lines are skipped. Every pitch of a chord gets its own instrument, which
+# has to be able to play it. Pitches in a range marked with ! cost PENALTY, the
+# assignment with the smallest cost is chosen, so preferred ranges are favored.
+# For every midi pitch the instruments which can play it are a bitset, the search
+# assigns the pitch with the fewest players first and memoizes on the pitch and the
+# used instruments which could still play one of the remaining pitches. Doubled
+# instruments are tried once per pitch and a branch stops as soon as it reaches the
+# lowest cost still possible. Chords which repeat in a progression are solved once.
+
+import argparse
+import sys
+from functools import cache
+
+from .chart import from_names
+from .coverage import MIDI_OFFSET, pitch_masks, pitch_name
+from .inst_graph import Instrument, StringedInst
+from .music import Pitch
+
+# (cost, (midi pitch, index of the instrument) from low to high)
+type Voicing = tuple[int, tuple[tuple[int, int], ...]]
+
+PENALTY = 1
+
+
+def parse_chord(text: str) -> tuple[int, ...]:
+    """
+    the midi pitches of a chord like "C4 E4 G4"
+    """
+    return tuple(Pitch.from_str(word).to_midi_pitch() for word in text.split())
+
+
+def read_chords(path: str) -> list[tuple[int, ...]]:
+    with open(path, encoding="utf8") as file:
+        return [parse_chord(line) for line in file if line.strip()]
+
+
+def instruments_of(mask: int) -> list[int]:
+    """
+    the indices of the set bits
+    """
+    indices = []
+    while mask:
+        low = mask & -mask
+        indices.append(low.bit_length() - 1)
+        mask ^= low
+    return indices
+
+
+class VoicingSolver:
+    def __init__(self, instruments: list[Instrument | StringedInst]):
+        self.instruments = instruments
+        # players[p] and preferred[p] have bit i set if instrument i can play p
+        self.players: dict[int, int] = {}
+        self.preferred: dict[int, int] = {}
+        for i, inst in enumerate(instruments):
+            all_pitches, preferred = pitch_masks(inst)
+            for table, mask in [
+                (self.players, all_pitches),
+                (self.preferred, preferred),
+            ]:
+                for bit in instruments_of(mask):
+                    pitch = bit - MIDI_OFFSET
+                    table[pitch] = table.get(pitch, 0) | (1 << i)
+        self.solutions: dict[tuple[int, ...], Voicing | None] = {}
+
+    def unplayable(self, chord: tuple[int, ...]) -> list[int]:
+        """
+        the pitches of the chord nobody can play
+        """
+        return [pitch for pitch in chord if not self.players.get(pitch, 0)]
+
+    def solve(self, chord: tuple[int, ...]) -> Voicing | None:
+        """
+        the cheapest assignment of the chord, None if there is none
+        """
+        chord = tuple(sorted(chord))
+        if chord not in self.solutions:
+            self.solutions[chord] = self._search(chord)
+        return self.solutions[chord]
+
+    def solve_all(self, chords: list[tuple[int, ...]]) -> list[Voicing | None]:
+        return [self.solve(chord) for chord in chords]
+
+    def _search(self, chord: tuple[int, ...]) -> Voicing | None:
+        if len(chord) > len(self.instruments) or self.unplayable(chord):
+            return None
+        order = sorted(chord, key=lambda p: self.players[p].bit_count())
+        candidates = [self.players[p] for p in order]
+        preferred = [self.preferred.get(p, 0) for p in order]
+        n = len(order)
+        # relevant[k] are the instruments which can play one of the pitches from k on,
+        # preferring[k] the ones which prefer one of them,
+        # bound[k] the cost of the pitches from k on which nobody prefers
+        relevant = [0] * (n + 1)
+        preferring = [0] * (n + 1)
+        bound = [0] * (n + 1)
+        for k in range(n - 1, -1, -1):
+            relevant[k] = relevant[k + 1] | candidates[k]
+            preferring[k] = preferring[k + 1] | preferred[k]
+            bound[k] = bound[k + 1] + (0 if preferred[k] else PENALTY)
+
+        # instruments which play and prefer the same pitches of the chord are
+        # interchangeable, only the first free one of them is tried
+        twins: dict[tuple[int, ...], int] = {}
+        earlier: dict[int, int] = {}
+        for i in instruments_of(relevant[0]):
+            signature = tuple(mask >> i & 1 for mask in candidates + preferred)
+            earlier[i] = twins.get(signature, 0)
+            twins[signature] = earlier[i] | 1 << i
+
+        @cache
+        def best(k: int, used: int) -> tuple[int, tuple[int, ...]] | None:
+            if k == n:
+                return 0, ()
+            free = ~used
+            # fewer free players than pitches left, or a pitch without a free player
+            if (relevant[k] & free).bit_count() < n - k or any(
+                not candidates[j] & free for j in range(k + 1, n)
+            ):
+                return None
+            # every pitch left without a free player preferring it costs a penalty
+            lowest = max(
+                bound[k], (n - k - (preferring[k] & free).bit_count()) * PENALTY
+            )
+            result = None
+            options = candidates[k] & free
+            for mask, cost in [
+                (options & preferred[k], 0),
+                (options & ~preferred[k], PENALTY),
+            ]:
+                for i in instruments_of(mask):
+                    if earlier[i] & free:
+                        continue
+                    rest = best(k + 1, (used | 1 << i) & relevant[k + 1])
+                    if rest is None:
+                        continue
+                    if result is None or cost + rest[0] < result[0]:
+                        result = cost + rest[0], (i, *rest[1])
+                        if result[0] == lowest:
+                            return result
+            return result
+
+        found = best(0, 0)
+        if found is None:
+            return None
+        cost, players = found
+        return cost, tuple(sorted(zip(order, players)))
+
+    def describe(self, voicing: Voicing) -> str:
+        """
+        the pitches with their instruments, pitches in a ! range are marked
+        """
+        parts = []
+        for pitch, i in voicing[1]:
+            mark = "" if self.preferred.get(pitch, 0) >> i & 1 else "!"
+            parts.append(f"{mark}{pitch_name(pitch)} {self.instruments[i].name}")
+        return ", ".join(parts)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="assigns the pitches of chords to the instruments of an ensemble"
+    )
+    parser.add_argument("chords", help="file with a chord of sounding pitches per line")
+    parser.add_argument("instruments", nargs="+", help="instrument names like insts/fl")
+    args = parser.parse_args(argv)
+
+    solver = VoicingSolver(from_names(args.instruments))
+    failed = 0
+    for n, chord in enumerate(read_chords(args.chords), start=1):
+        voicing = solver.solve(chord)
+        if voicing is not None:
+            print(f"{n}: {solver.describe(voicing)}")
+            continue
+        failed += 1
+        missing = solver.unplayable(chord)
+        if missing:
+            print(f"{n}: nobody plays {', '.join(pitch_name(p) for p in missing)}")
+        else:
+            print(f"{n}: too few instruments for {len(chord)} pitches")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,160 @@
+# Keeps the outputs of a chart manifest up to date while it and the instrument files are edited.
+#
+#   python -m lib.watch charts.toml [-o OUT] [--interval SECONDS]
+#
+# Parsed instruments and their rendered columns stay in memory, on a change only the
+# changed files are parsed again and only the charts using them are rendered again.
+# Files are polled as the standard library has no portable file notification.
+
+import argparse
+import hashlib
+import os
+import sys
+import time
+
+import drawsvg as draw
+
+from .chart import from_names
+from .build import Chart, load_charts, load_stamps, output_key, render_output
+from .build import save_stamps
+from .inst_graph import Instrument, StringedInst
+
+POLL_INTERVAL = 0.2
+
+
+class Watcher:
+    def __init__(self, manifest: str, out_dir: str) -> None:
+        self.manifest = manifest
+        self.out_dir = out_dir
+        self.charts: list[Chart] = []
+        self.instruments: dict[str, Instrument | StringedInst] = {}
+        # the file and content hash of every loaded instrument, by the loaded object
+        self.sources: dict[int, tuple[str, str]] = {}
+        self.columns: dict[tuple[str, str, float, float], draw.Group] = {}
+        self.mtimes: dict[str, int] = {}
+        self.stamps = load_stamps(out_dir)
+
+    def watched_files(self) -> dict[str, int]:
+        """
+        modification times of the manifest and every instrument file next to the used ones
+        """
+        files = {self.manifest: os.stat(self.manifest).st_mtime_ns}
+        directories = {
+            os.path.dirname(os.path.normpath(name))
+            for chart in self.charts
+            for name in chart.instruments
+        }
+        for directory in directories:
+            for entry in os.scandir(directory or "."):
+                if entry.name.endswith(".txt"):
+                    files[os.path.normpath(entry.path)] = entry.stat().st_mtime_ns
+        return files
+
+    def column(
+        self, inst: Instrument | StringedInst, y_min: float, y_max: float
+    ) -> draw.Group:
+        source = self.sources.get(id(inst))
+        if source is None:
+            return inst.generate_s_pitch_ranges(y_min, y_max)
+        key = (*source, y_min, y_max)
+        if key not in self.columns:
+            self.columns[key] = inst.generate_s_pitch_ranges(y_min, y_max)
+        return self.columns[key]
+
+    def load(self, name: str) -> None:
+        with open(f"{name}.txt", mode="rb") as file:
+            digest = hashlib.sha256(file.read()).hexdigest()
+        inst = from_names([name])[0]
+        old = self.instruments.get(name)
+        if old is not None:
+            self.sources.pop(id(old), None)
+        self.columns = {
+            key: col
+            for key, col in self.columns.items()
+            if key[0] != name or key[1] == digest
+        }
+        self.instruments[name] = inst
+        self.sources[id(inst)] = (name, digest)
+
+    def update(self) -> list[str]:
+        """
+        parses the changed files and renders the stale outputs of the affected charts
+        the changes are only taken as seen once everything rendered, so a failed
+        update is tried again on the next poll
+        returns the rendered outputs as chart:output
+        """
+        if not self.charts:
+            self.charts = load_charts(self.manifest)
+        current = self.watched_files()
+        changed = {
+            path
+            for path in current.keys() | self.mtimes.keys()
+            if current.get(path) != self.mtimes.get(path)
+        }
+        if not changed:
+            return []
+        # new or removed files can change the instruments of a catalog
+        if self.manifest in changed or current.keys() != self.mtimes.keys():
+            self.charts = load_charts(self.manifest)
+            current = self.watched_files()
+
+        used = {
+            os.path.normpath(name)
+            for chart in self.charts
+            for name in chart.instruments
+        }
+        for name in used:
+            if name not in self.instruments or f"{name}.txt" in changed:
+                self.load(name)
+
+        rendered = []
+        for chart in self.charts:
+            instruments = [
+                self.instruments[os.path.normpath(name)] for name in chart.instruments
+            ]
+            for output in chart.outputs:
+                artifact = f"{chart.name}:{output}"
+                key = output_key(chart, output)
+                if self.stamps.get(artifact) == key:
+                    continue
+                start = time.perf_counter()
+                render_output(chart, instruments, output, self.out_dir, self.column)
+                self.stamps[artifact] = key
+                rendered.append(artifact)
+                print(f"built {artifact} in {time.perf_counter() - start:.2f}s")
+        save_stamps(self.out_dir, self.stamps)
+        self.mtimes = current
+        return rendered
+
+
+def watch(manifest: str, out_dir: str, interval: float = POLL_INTERVAL) -> None:
+    os.makedirs(out_dir, exist_ok=True)
+    watcher = Watcher(manifest, out_dir)
+    while True:
+        try:
+            watcher.update()
+        except (ValueError, AssertionError, OSError, KeyError) as e:
+            # most likely a file in the middle of being edited, the old state is kept
+            print(f"error: {e}", file=sys.stderr)
+        time.sleep(interval)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="rebuilds the charts of a manifest whenever a file changes"
+    )
+    parser.add_argument("manifest", help="TOML or JSON file describing the charts")
+    parser.add_argument("-o", "--out", default="out", help="output directory")
+    parser.add_argument(
+        "--interval", type=float, default=POLL_INTERVAL, help="seconds between polls"
+    )
+    args = parser.parse_args(argv)
+    try:
+        watch(args.manifest, args.out, args.interval)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,224 @@
+import json
+import os
+from collections.abc import Sequence
+from html import escape
+from string import Template
+
+import drawsvg as draw
+
+from .chart import (
+    DOUBLE_BARLINE_WIDTH,
+    LINE_SPACE,
+    calc_staff_extents,
+    calc_vertical_extent,
+    draw_clefs,
+    draw_d_barline,
+    draw_staff_lines,
+)
+from .consts import F_RANGE, G_RANGE, LF_RANGE, UG_RANGE
+from .elements import BAR_LINE_WIDTH, CLEF_OFFSET, CLEF_WIDTH
+from .inst_graph import INST_WIDTH, Instrument, StringedInst
+from .music import AbsoluteRange, RelativeRange
+
+PX_SCALE = LINE_SPACE / 2
+HEAD_WIDTH = CLEF_OFFSET + CLEF_WIDTH
+# columns mounted outside of the visible area on each side
+OVERSCAN = 2
+
+
+def describe(inst: Instrument | StringedInst) -> list[str]:
+    """
+    the searchable text of an instrument, the same as printed in its column
+    """
+    ranges: Sequence[AbsoluteRange | RelativeRange] = (
+        inst.get_sounding_pitch_ranges()
+        if isinstance(inst, Instrument)
+        else inst.ranges
+    )
+    lines = [inst.name]
+    for r in reversed(ranges):
+        lines.append(f"{r.start.display_name()} {r.end.display_name()} {r.descr}")
+    if inst.notes:
+        lines.append(inst.notes)
+    return lines
+
+
+def _piece(width: float, y_min: float, height: float) -> draw.Drawing:
+    img = draw.Drawing(width, height, origin=(0, y_min))
+    img.set_pixel_scale(PX_SCALE)
+    return img
+
+
+def make_html(
+    title: str, instruments: list[Instrument | StringedInst], out_dir: str
+) -> str:
+    """
+    writes a scrollable and searchable chart to {out_dir}/index.html
+    the staff background is written once as three svgs (clefs, one column, end)
+    the last column is drawn over the end, which has no bar line after the column
+    every instrument column is its own svg which is only mounted while it is in view
+    returns the path of the html file
+    """
+    (min_spos, draw_lf), (max_spos, draw_ug) = calc_staff_extents(instruments)
+    y_min, y_max = calc_vertical_extent(instruments, min_spos, max_spos)
+    height = y_max - y_min
+    highest_full = G_RANGE[1] if not draw_ug else UG_RANGE[1]
+    lowest_full = F_RANGE[0] if not draw_lf else LF_RANGE[0]
+
+    os.makedirs(os.path.join(out_dir, "columns"), exist_ok=True)
+
+    head = _piece(HEAD_WIDTH, y_min, height)
+    head.append(draw_staff_lines(min_spos, max_spos, 0, HEAD_WIDTH, draw_ug, draw_lf))
+    head.append(draw_clefs(draw_ug, draw_lf))
+    head.save_svg(os.path.join(out_dir, "staff_head.svg"))
+
+    slot = _piece(INST_WIDTH, y_min, height)
+    slot.append(draw_staff_lines(min_spos, max_spos, 0, INST_WIDTH, draw_ug, draw_lf))
+    slot.append(
+        draw.Line(
+            INST_WIDTH - BAR_LINE_WIDTH / 2,
+            -highest_full,
+            INST_WIDTH - BAR_LINE_WIDTH / 2,
+            -lowest_full,
+            stroke_width=BAR_LINE_WIDTH,
+            stroke="black",
+        )
+    )
+    slot.save_svg(os.path.join(out_dir, "staff_slot.svg"))
+
+    tail_width = INST_WIDTH + DOUBLE_BARLINE_WIDTH
+    tail = _piece(tail_width, y_min, height)
+    tail.append(draw_staff_lines(min_spos, max_spos, 0, tail_width, draw_ug, draw_lf))
+    tail.append(draw_d_barline(tail_width, highest_full, lowest_full))
+    tail.save_svg(os.path.join(out_dir, "staff_tail.svg"))
+
+    meta = []
+    for i, inst in enumerate(instruments):
+        src = f"columns/{i}.svg"
+        column = _piece(INST_WIDTH, y_min, height)
+        column.append(inst.generate_s_pitch_ranges(-max_spos, -min_spos))
+        column.save_svg(os.path.join(out_dir, src))
+        meta.append({"name": inst.name, "src": src, "text": "\n".join(describe(inst))})
+
+    path = os.path.join(out_dir, "index.html")
+    with open(path, encoding="utf8", mode="w") as file:
+        file.write(
+            HTML_TEMPLATE.substitute(
+                title=escape(title),
+                meta=json.dumps(meta).replace("</", "<\\/"),
+                head_width=HEAD_WIDTH * PX_SCALE,
+                slot_width=INST_WIDTH * PX_SCALE,
+                tail_width=tail_width * PX_SCALE,
+                height=height * PX_SCALE,
+                overscan=OVERSCAN,
+            )
+        )
+    return path
+
+
+HTML_TEMPLATE = Template("""<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>$title</title>
+<style>
+body { font-family: FreeSerif, serif; margin: 1em; }
+h1 { text-align: center; }
+#scroller { overflow-x: auto; overflow-y: hidden; }
+#track { position: relative; height: ${height}px; }
+#track img { position: absolute; top: 0; height: ${height}px; }
+#head { position: sticky; left: 0; z-index: 1; background: white; }
+#slots {
+  position: absolute; top: 0; left: ${head_width}px; height: ${height}px;
+  background: url(staff_slot.svg) repeat-x;
+  background-size: ${slot_width}px ${height}px;
+}
+</style>
+</head>
+<body>
+<h1>$title</h1>
+<input id="search" type="search" placeholder="Filter instruments">
+<div id="scroller">
+<div id="track">
+<img id="head" src="staff_head.svg" alt="">
+<div id="slots"></div>
+<img id="tail" src="staff_tail.svg" alt="">
+</div>
+</div>
+<script>
+const META = $meta;
+const HEAD = $head_width, SLOT = $slot_width, TAIL = $tail_width, OVERSCAN = $overscan;
+const scroller = document.getElementById("scroller");
+const track = document.getElementById("track");
+const slots = document.getElementById("slots");
+const tail = document.getElementById("tail");
+const search = document.getElementById("search");
+let shown = META.map((_, i) => i);
+const mounted = new Map();
+
+function unmountAll() {
+  for (const el of mounted.values()) el.remove();
+  mounted.clear();
+}
+
+function render() {
+  const left = scroller.scrollLeft - HEAD;
+  const first = Math.max(0, Math.floor(left / SLOT) - OVERSCAN);
+  const last = Math.min(
+    shown.length,
+    Math.ceil((left + scroller.clientWidth) / SLOT) + OVERSCAN
+  );
+  for (const [k, el] of mounted) {
+    if (k < first || k >= last) {
+      el.remove();
+      mounted.delete(k);
+    }
+  }
+  for (let k = first; k < last; k++) {
+    if (mounted.has(k)) continue;
+    const inst = META[shown[k]];
+    const img = document.createElement("img");
+    img.src = inst.src;
+    img.alt = inst.name;
+    img.title = inst.text;
+    img.style.left = (HEAD + k * SLOT) + "px";
+    img.style.width = SLOT + "px";
+    track.appendChild(img);
+    mounted.set(k, img);
+  }
+}
+
+function layout() {
+  // the last column is on the tail
+  const width = Math.max(shown.length - 1, 0) * SLOT;
+  track.style.width = (HEAD + width + TAIL) + "px";
+  slots.style.width = width + "px";
+  tail.style.left = (HEAD + width) + "px";
+  render();
+}
+
+search.addEventListener("input", () => {
+  const query = search.value.trim().toLowerCase();
+  shown = [];
+  META.forEach((inst, i) => {
+    if (inst.text.toLowerCase().includes(query)) shown.push(i);
+  });
+  unmountAll();
+  layout();
+});
+let pending = false;
+scroller.addEventListener("scroll", () => {
+  if (pending) return;
+  pending = true;
+  requestAnimationFrame(() => {
+    pending = false;
+    render();
+  });
+}, { passive: true });
+window.addEventListener("resize", render);
+layout();
+</script>
+</body>
+</html>
+""")
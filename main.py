@@ -1,14 +1,10 @@
 import drawsvg as draw
-import cairosvg
 from lib import from_names, make_graph, split_into_tiles
+from lib.cache import RenderCache, save_chart_pdf
+from lib.convert import save_as_pdf, save_poster_incremental, save_tiles_as_pdf
 
 
-def save_as_pdf(img, path):
-    svg_bytes = img.as_svg().encode("utf-8")
-    cairosvg.svg2pdf(bytestring=svg_bytes, write_to=path)
-
-
-def polyband():
+def polyband(single_pdf: bool = False, workers: int | None = None):
     instruments = from_names(
         [
             "voice/mezzosoprano",
@@ -26,6 +22,12 @@ def polyband():
         ]
     )
 
+    if not single_pdf:
+        save_poster_incremental(
+            "Polyband Ranges", instruments, "out/polyband", workers=workers
+        )
+        return
+
     content, content_format = make_graph("Polyband Ranges", instruments)
     img = draw.Drawing(*content_format)
 
@@ -33,9 +35,7 @@ def polyband():
     save_as_pdf(img, "out/polyband.pdf")
 
     tiles = split_into_tiles(content, content_format)
-    for tile, (x, y) in tiles:
-        name = f"out/polyband_{x}_{y}.pdf"
-        save_as_pdf(tile, name)
+    save_tiles_as_pdf(tiles, "out/polyband_tiles.pdf")
 
 
 def choir():
@@ -50,11 +50,7 @@ def choir():
         ]
     )
 
-    content, content_format = make_graph("Choir Ranges", instruments)
-    img = draw.Drawing(*content_format)
-
-    img.append(content)
-    save_as_pdf(img, "out/choir.pdf")
+    save_chart_pdf(RenderCache(), "Choir Ranges", instruments, "out/choir.pdf")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,34 @@
+import io
+import json
+
+from lib.batch import serve_lines
+
+TRUMPET = """Trumpet // inline
+Transposition: -j2
+
+Ranges:
+F#3 C6 Normal
+"""
+
+
+def test_serve_lines():
+    requests = [
+        {
+            "id": 1,
+            "title": "Brass",
+            "instruments": ["insts/tp", {"definition": TRUMPET}],
+        },
+        {"id": 2, "instruments": ["insts/missing"]},
+        {"id": 3, "output": "pdf", "instruments": ["insts/tp"]},
+    ]
+    output = io.StringIO()
+    serve_lines(
+        io.StringIO("\n".join(json.dumps(r) for r in requests) + "\n\nnot json\n"),
+        output,
+    )
+    responses = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert [r["id"] for r in responses] == [1, 2, 3, None]
+    assert [r["ok"] for r in responses] == [True, False, False, False]
+    assert responses[0]["svg"].startswith("<?xml")
+    assert set(responses[0]["timings"]) == {"parse", "layout", "convert", "total"}
+    assert "insts/missing" in responses[1]["error"]
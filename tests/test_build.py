@@ -0,0 +1,88 @@
+import json
+import os
+import shutil
+
+import pytest
+
+from lib.build import FORMATS, PX_PER_CM, build, load_charts, output_key
+
+MANIFEST = """
+[[chart]]
+name = "winds"
+title = "Winds"
+instruments = ["insts/fl", "insts/cl"]
+outputs = ["svg", "html"]
+format = "A3"
+
+[[chart]]
+name = "brass"
+catalog = "insts"
+exclude = ["insts/fl", "insts/cl"]
+outputs = ["svg"]
+format = [20, 30]
+"""
+
+
+@pytest.fixture
+def manifest(tmp_path):
+    os.makedirs(tmp_path / "insts")
+    for name in ["fl", "cl", "tp", "tb"]:
+        shutil.copy(f"insts/{name}.txt", tmp_path / "insts")
+    path = tmp_path / "charts.toml"
+    path.write_text(MANIFEST)
+    return path
+
+
+def test_load_charts(manifest, tmp_path):
+    winds, brass = load_charts(str(manifest))
+    assert winds.instruments == [str(tmp_path / "insts/fl"), str(tmp_path / "insts/cl")]
+    assert winds.format == FORMATS["A3"]
+    assert brass.title == "brass"
+    assert brass.instruments == [str(tmp_path / "insts/tb"), str(tmp_path / "insts/tp")]
+    assert brass.format == (20 * PX_PER_CM, 30 * PX_PER_CM)
+
+    as_json = tmp_path / "charts.json"
+    as_json.write_text(json.dumps({"chart": [winds.to_dict()]}))
+    assert load_charts(str(as_json))[0].to_dict()["format"] == winds.to_dict()["format"]
+
+    for invalid in [
+        '[[chart]]\nname = "x"\ninstruments = ["insts/fl"]\noutputs = ["gif"]',
+        '[[chart]]\nname = "x"\ninstruments = ["insts/fl"]\nformat = "B5"',
+        '[[chart]]\nname = "x"',
+    ]:
+        manifest.write_text(invalid)
+        with pytest.raises(ValueError):
+            load_charts(str(manifest))
+
+
+def test_up_to_date(manifest, tmp_path):
+    out = str(tmp_path / "out")
+    charts = load_charts(str(manifest))
+    built, failed = build(charts, out, workers=2)
+    assert sorted(built) == ["brass:svg", "winds:html", "winds:svg"] and not failed
+    assert os.path.exists(os.path.join(out, "winds.svg"))
+    assert build(charts, out, workers=2) == ([], [])
+
+    key = output_key(charts[0], "svg")
+    with open(tmp_path / "insts/fl.txt", mode="a") as file:
+        file.write("\nNotes:\nedited\n")
+    assert output_key(charts[0], "svg") != key
+    built, _ = build(charts, out, workers=2)
+    assert sorted(built) == ["winds:html", "winds:svg"]
+    assert sorted(build(charts, out, force=True)[0]) == [
+        "brass:svg",
+        "winds:html",
+        "winds:svg",
+    ]
+
+
+def test_failed_output(manifest, tmp_path):
+    out = str(tmp_path / "out")
+    charts = load_charts(str(manifest))
+    build(charts, out)
+    with open(tmp_path / "insts/tp.txt", mode="w") as file:
+        file.write("Trumpet\n\nRanges:\nC6 C4\n")
+    built, failed = build(charts, out)
+    assert failed == ["brass:svg"] and not built
+    # a failed output is built again on the next run
+    assert build(charts, out)[1] == ["brass:svg"]
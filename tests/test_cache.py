@@ -0,0 +1,61 @@
+import os
+
+from lib import chart, deps
+from lib.cache import RenderCache, chart_svg, render_key, tile_svgs
+from lib.chart import from_names, graph_format
+from lib.convert import to_svg_bytes
+from lib.deps import column_keys, region_key, shared_key
+
+NAMES = ["insts/fl", "insts/cl"]
+
+
+def tile_keys(instruments):
+    shared = shared_key("Test", instruments, graph_format(instruments))
+    columns = column_keys(instruments)
+    return [region_key(shared, columns, [i], i, 0) for i in range(len(columns))]
+
+
+def test_constants_change_keys(monkeypatch):
+    instruments = from_names(NAMES)
+    keys = tile_keys(instruments)
+    svg_key = render_key("svg", "Test", instruments)
+    assert tile_keys(instruments) == keys
+
+    monkeypatch.setattr(chart, "COVERAGE_MARGIN", chart.COVERAGE_MARGIN + 1)
+    changed = tile_keys(instruments)
+    assert all(old != new for old, new in zip(keys, changed))
+    assert render_key("svg", "Test", instruments) != svg_key
+
+    monkeypatch.setattr(deps, "RENDER_VERSION", deps.RENDER_VERSION + 1)
+    assert tile_keys(instruments) != changed
+
+
+def test_byte_stable(tmp_path):
+    instruments = from_names(NAMES)
+    cache = RenderCache(str(tmp_path))
+    svg = chart_svg(cache, "Test", instruments)
+    # a second render is byte for byte the same, so pdfs can be keyed by the svg
+    assert to_svg_bytes(chart.make_svg("Test", instruments)) == svg
+    assert chart_svg(cache, "Test", instruments) == svg
+    tiles = tile_svgs(cache, "Test", instruments)
+    assert tile_svgs(cache, "Test", instruments) == tiles
+    assert tile_svgs(RenderCache(str(tmp_path / "other")), "Test", instruments) == tiles
+
+
+def test_eviction(tmp_path):
+    cache = RenderCache(str(tmp_path), max_bytes=10)
+    cache.put("aa", b"1234")
+    cache.put("bb", b"1234")
+    # b was used before a
+    os.utime(cache.path("aa"), (2, 2))
+    os.utime(cache.path("bb"), (1, 1))
+    cache.put("cc", b"1234")
+    assert cache.get("bb") is None
+    assert cache.get("aa") == b"1234" and cache.get("cc") == b"1234"
+    assert cache.size == 8
+
+    # the size is counted again by a new instance
+    cache = RenderCache(str(tmp_path), max_bytes=4)
+    cache.put("aa", b"12")
+    assert cache.get("cc") is None and cache.get("aa") == b"12"
+    assert cache.size == 2
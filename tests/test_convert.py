@@ -0,0 +1,162 @@
+import re
+from types import SimpleNamespace
+
+import pytest
+
+from lib.chart import (
+    PX_PER_CM,
+    from_names,
+    from_str,
+    graph_format,
+    make_graph,
+    split_into_tiles,
+)
+from lib.deps import intersecting_columns, tile_dependencies
+
+try:
+    from lib import convert
+except (ImportError, OSError):
+    # cairocffi raises an OSError when the cairo library is not installed
+    convert = None
+
+needs_cairo = pytest.mark.skipif(convert is None, reason="needs the cairo library")
+NAMES = ["insts/fl", "insts/cl", "insts/tp", "insts/tb"]
+FORMAT = (8 * PX_PER_CM, 10 * PX_PER_CM)
+
+
+class Document:
+    def __init__(self, path, width, height):
+        self.path = path
+        self.sizes = []
+        self.labels = []
+        self.pages = 0
+        self.finished = False
+
+    def set_size(self, width, height):
+        self.sizes.append((width, height))
+
+    def set_page_label(self, label):
+        self.labels.append(label)
+
+    def show_page(self):
+        self.pages += 1
+
+    def finish(self):
+        self.finished = True
+
+
+class Page:
+    def __init__(self, document, tree):
+        self.document = document
+        document.set_size(1, 1)
+
+    def finish(self):
+        self.document.show_page()
+
+
+def poster_tiles():
+    content, content_format = make_graph("Poster", from_names(NAMES))
+    # small pages, so the chart needs several tiles
+    return split_into_tiles(content, content_format, format=FORMAT)
+
+
+def test_tile_dependencies():
+    dependencies = tile_dependencies(
+        4, graph_format(from_names(NAMES)), FORMAT, PX_PER_CM, 2 * PX_PER_CM
+    )
+    assert sorted(dependencies) == sorted(pos for _, pos in poster_tiles())
+    assert sorted({i for used in dependencies.values() for i in used}) == [0, 1, 2, 3]
+    # descriptions overflow into the next column
+    assert intersecting_columns([(0, 10), (10, 20), (20, 30)], 12, 15) == [0, 1]
+
+
+@needs_cairo
+def test_tiles_as_pages(tmp_path, monkeypatch):
+    documents = []
+
+    def open_document(path, width, height):
+        documents.append(Document(path, width, height))
+        return documents[-1]
+
+    monkeypatch.setattr(convert, "cairo", SimpleNamespace(PDFSurface=open_document))
+    monkeypatch.setattr(convert, "Tree", lambda bytestring: bytestring)
+    monkeypatch.setattr(convert, "_PageSurface", Page)
+    tiles = poster_tiles()
+    convert.save_tiles_as_pdf(tiles[::-1], str(tmp_path / "tiles.pdf"))
+
+    assert len(tiles) > 1
+    (document,) = documents
+    assert document.pages == len(tiles) == len(document.sizes)
+    assert document.labels == [
+        convert.tile_label(pos) for _, pos in sorted(tiles, key=lambda t: t[1])
+    ]
+    assert document.finished
+
+
+@needs_cairo
+def test_tiles_pdf_pages(tmp_path):
+    tiles = poster_tiles()
+    path = tmp_path / "tiles.pdf"
+    convert.save_tiles_as_pdf(tiles, str(path))
+    data = path.read_bytes()
+    assert len(re.findall(rb"/Type\s*/Page(?!s)", data)) == len(tiles)
+
+
+@needs_cairo
+def test_run_jobs(tmp_path):
+    jobs = [(f"<svg>{i}</svg>".encode(), str(tmp_path / f"{i}.pdf")) for i in range(5)]
+    paths = [path for _, path in jobs]
+    assert convert.run_jobs(convert.svg_to_pdf, jobs, 2) == paths
+    assert convert.run_jobs(convert.svg_to_pdf, jobs[:1], None) == paths[:1]
+    for path in paths:
+        assert (tmp_path / path).stat().st_size > 0
+
+
+@needs_cairo
+def test_save_poster(tmp_path):
+    content, content_format = make_graph("Poster", from_names(["insts/fl"]))
+    img = convert.draw.Drawing(*content_format)
+    img.append(content)
+    tiles = poster_tiles()
+    prefix = str(tmp_path / "poster")
+    written = convert.save_poster_as_pdf(img, tiles[::-1], prefix, workers=2)
+    assert written[0] == f"{prefix}.pdf"
+    assert written[1:] == [
+        convert.tile_path(prefix, pos) for _, pos in sorted(tiles, key=lambda t: t[1])
+    ]
+    for path in written:
+        assert (tmp_path / path).exists()
+    many = convert.save_many_as_png([(img, str(tmp_path / "chart.png"))], workers=1)
+    assert many == [str(tmp_path / "chart.png")]
+
+
+@needs_cairo
+def test_save_poster_incremental(tmp_path):
+    instruments = from_names(NAMES)
+    prefix = str(tmp_path / "poster")
+    format = FORMAT
+    first = convert.save_poster_incremental(
+        "Poster", instruments, prefix, format=format
+    )
+    assert first[0] == f"{prefix}.pdf" and len(first) > 2
+    assert (
+        convert.save_poster_incremental("Poster", instruments, prefix, format=format)
+        == []
+    )
+
+    # only the tiles showing the trombone change
+    with open("insts/tb.txt", encoding="utf8") as file:
+        edited = from_str(file.read().replace("Trombone", "Bass Trombone", 1))
+    rebuilt = convert.save_poster_incremental(
+        "Poster", [*instruments[:3], edited], prefix, format=format
+    )
+    dependencies = tile_dependencies(
+        4, graph_format(instruments), format, PX_PER_CM, 2 * PX_PER_CM
+    )
+    assert rebuilt[0] == f"{prefix}.pdf"
+    assert rebuilt[1:] == [
+        convert.tile_path(prefix, pos)
+        for pos, used in sorted(dependencies.items())
+        if 3 in used
+    ]
+    assert len(rebuilt) < len(first)
@@ -0,0 +1,38 @@
+import io
+
+from lib.chart import from_str, make_graph
+from lib.coverage import coverage, holes, write_csv
+
+HIGH = "High\nRanges:\nC5 D5\n!D5 E5"
+LOW = "Low\nTransposition: -8\nRanges:\nC4 D4"
+# both strings reach E3, it must count once
+STRINGS = "Strings\nOpen Strings: C3 D3\nRanges:\n1 j2"
+
+
+def test_coverage():
+    rows = coverage([from_str(HIGH), from_str(LOW), from_str(STRINGS)])
+    by_pitch = {
+        pitch: (players, preferred, ids) for pitch, players, preferred, ids in rows
+    }
+    assert rows[0][0] == 48 and rows[-1][0] == 76
+    assert by_pitch[50] == (2, 2, (1, 2))
+    assert by_pitch[52] == (1, 1, (2,))
+    assert by_pitch[74] == (1, 1, (0,))
+    assert by_pitch[75] == (1, 0, (0,))
+    assert holes(rows) == [(53, 71)]
+
+
+def test_csv():
+    instruments = [from_str(HIGH)]
+    file = io.StringIO()
+    write_csv(coverage(instruments), instruments, file)
+    lines = file.getvalue().splitlines()
+    assert lines[0] == "midi,pitch,players,preferred,instruments"
+    assert lines[1] == "72,C5,1,1,High"
+
+
+def test_band():
+    instruments = [from_str(HIGH), from_str(LOW)]
+    _, (_, height) = make_graph("Test", instruments)
+    _, (_, band_height) = make_graph("Test", instruments, coverage_band=True)
+    assert band_height > height
@@ -0,0 +1,46 @@
+import random
+
+from lib.chart import calc_staff_extents, from_str
+from lib.grouping import (
+    group_instruments,
+    overlap_matrix,
+    pitch_mask,
+    similarity,
+    staff_height,
+)
+from lib.synth import synth_catalog
+
+
+def test_similarity():
+    a = from_str("A\nRanges:\nC4 C5")
+    b = from_str("B\nTransposition: 8\nRanges:\nC3 C4")
+    c = from_str("C\nRanges:\nC6 C7")
+    assert pitch_mask(a) == pitch_mask(b)
+    index, matrix = similarity([a, b, c])
+    assert index == [0, 0, 1]
+    assert matrix[0][0] == 1.0 and matrix[0][1] == matrix[1][0] == 0.0
+
+
+def test_overlap_matrix():
+    rng = random.Random(0)
+    masks = [0, 0b1, 0b11, 1 << 127] + [rng.getrandbits(128) for _ in range(40)]
+    for a, row in zip(masks, overlap_matrix(masks)):
+        for b, value in zip(masks, row):
+            union = (a | b).bit_count()
+            assert value == ((a & b).bit_count() / union if union else 1.0)
+
+
+def test_groups():
+    instruments = [from_str(text) for text in synth_catalog(60, seed=4, stringed=0)]
+    groups = group_instruments(instruments, max_size=6)
+    assert all(len(group) <= 6 for group in groups)
+    assert sorted(id(i) for g in groups for i in g) == sorted(
+        id(i) for i in instruments
+    )
+
+    def height(group):
+        (low, _), (high, _) = calc_staff_extents(group)
+        return staff_height(low, high)
+
+    chunks = [instruments[i : i + 6] for i in range(0, len(instruments), 6)]
+    assert sum(map(height, groups)) <= sum(map(height, chunks))
@@ -0,0 +1,23 @@
+import subprocess
+import sys
+
+
+def test_music_without_rendering():
+    # a fresh interpreter, the other tests already imported the rendering modules
+    code = (
+        "import sys, lib, lib.consts, lib.music, lib.parser\n"
+        "loaded = [m for m in ['drawsvg', 'cairosvg', 'cairocffi'] if m in sys.modules]\n"
+        "assert not loaded, loaded"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True)
+
+
+def test_tools_without_cairo():
+    # grouping and midicheck only read instruments, the png and pdf conversion is
+    # not needed
+    code = (
+        "import sys, lib.grouping, lib.midicheck\n"
+        "loaded = [m for m in ['cairosvg', 'cairocffi'] if m in sys.modules]\n"
+        "assert not loaded, loaded"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True)
@@ -0,0 +1,83 @@
+import os
+from collections import Counter
+
+import pytest
+
+from lib.chart import from_names
+from lib.coverage import pitch_masks
+from lib.keys import (
+    all_shifts,
+    counts_in,
+    histogram,
+    library_pieces,
+    musicxml_pitches,
+    parse_spans,
+    rank_keys,
+    rank_library,
+)
+from lib.midi import midi_bytes
+
+SATB = ["voice/soprano", "voice/alto", "voice/tenor", "voice/bass"]
+
+MUSICXML = """<?xml version="1.0" encoding="UTF-8"?>
+<score-partwise version="4.0">
+  <part-list><score-part id="P1"><part-name>Clarinet</part-name></score-part></part-list>
+  <part id="P1">
+    <measure number="1">
+      <attributes><transpose><diatonic>-1</diatonic><chromatic>-2</chromatic></transpose></attributes>
+      <note><pitch><step>D</step><octave>5</octave></pitch><duration>1</duration></note>
+      <note><pitch><step>F</step><alter>1</alter><octave>5</octave></pitch><duration>1</duration></note>
+      <note><rest/><duration>1</duration></note>
+      <note><pitch><step>D</step><octave>5</octave></pitch><duration>1</duration></note>
+    </measure>
+  </part>
+</score-partwise>
+"""
+
+
+def test_counts_in():
+    pitches = Counter({60: 5, 62: 2, 64: 1, 0: 3, 127: 1})
+    shifts = all_shifts([pitches])
+    assert shifts == range(1)
+    shifts = range(-70, 70)
+    packed = histogram(pitches)
+    for mask in [0, *(m for inst in from_names(SATB) for m in pitch_masks(inst))]:
+        expected = [
+            sum(n for p, n in pitches.items() if mask >> (p + shift + 128) & 1)
+            for shift in shifts
+        ]
+        assert counts_in(packed, mask, shifts) == expected
+
+
+def test_rank_keys():
+    masks = [pitch_masks(inst) for inst in from_names(SATB)]
+    # every part a fourth too high
+    parts = parse_spans("F4:C6,D4:G5,F3:C5,A2:F4")
+    best = rank_keys(parts, masks)[0]
+    assert best[0] < 0
+    assert all(outside == 0 for _, _, outside in best[2])
+    assert rank_keys(parts, masks, max_shift=0)[0][1] > best[1]
+    # every transposition keeping the notes midi pitches, A2 is 45 and C6 is 84
+    assert len(rank_keys(parts, masks)) == 45 + (127 - 84) + 1
+    assert rank_keys(parts, masks, max_shift=6)[0] == best
+    with pytest.raises(ValueError):
+        rank_keys(parts[:3], masks)
+
+
+def test_musicxml(tmp_path):
+    path = tmp_path / "piece.musicxml"
+    path.write_text(MUSICXML)
+    # written D5 and F#5 for a clarinet in B flat
+    assert musicxml_pitches(str(path)) == [Counter({72: 2, 76: 1})]
+
+
+def test_library(tmp_path):
+    notes = [(0, 0x90, bytes([p, 80])) for p in [72, 74, 76]]
+    (tmp_path / "song.mid").write_bytes(midi_bytes([notes]))
+    (tmp_path / "broken.mid").write_bytes(b"not midi")
+    (tmp_path / "notes.txt").write_text("")
+    pieces = library_pieces(str(tmp_path))
+    assert [os.path.basename(piece) for piece in pieces] == ["broken.mid", "song.mid"]
+    results = rank_library(pieces, from_names(["voice/soprano"]), workers=2)
+    assert results[0][1] is None and results[0][2]
+    assert results[1][1] is not None and results[1][1][0] == 0
@@ -0,0 +1,35 @@
+import pytest
+from lib import from_names, make_paged_svg, pack_systems, split_into_systems
+
+
+def test_split_into_systems():
+    assert split_into_systems(list(range(7)), 3) == [[0, 1, 2], [3, 4, 5], [6]]
+    assert split_into_systems(list(range(3)), 3) == [[0, 1, 2]]
+    with pytest.raises(ValueError):
+        split_into_systems(list(range(3)), 0)
+
+
+def test_pack_systems():
+    assert pack_systems([40, 40, 40], 100, 10, 5) == [[0, 1], [2]]
+    assert pack_systems([40, 40, 40], 200, 10, 5) == [[0, 1, 2]]
+    # a system taller than the page still gets its own page
+    assert pack_systems([150, 40], 100, 0, 5) == [[0], [1]]
+
+
+def test_make_paged_svg():
+    instruments = from_names(["insts/fl", "insts/cl", "insts/tp", "insts/b"] * 6)
+    pages = make_paged_svg("Test", instruments, columns=4)
+    assert 1 <= len(pages) < 6
+
+
+def test_orientation():
+    instruments = from_names(["insts/fl", "insts/cl", "insts/tp", "insts/b"] * 6)
+    portrait = make_paged_svg("Test", instruments, columns=8)
+    assert all(page.width < page.height for page in portrait)
+    landscape = make_paged_svg("Test", instruments, columns=8, orientation="landscape")
+    assert all(page.width > page.height for page in landscape)
+    auto = make_paged_svg("Test", instruments, columns=8, orientation="auto")
+    assert len(auto) == min(len(portrait), len(landscape))
+    with pytest.raises(ValueError):
+        make_paged_svg("Test", instruments, orientation="sideways")
+    assert make_paged_svg("Test", []) == []
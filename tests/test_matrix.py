@@ -0,0 +1,64 @@
+import os
+
+import pytest
+
+from lib.chart import from_names, make_svg
+from lib.convert import to_svg_bytes
+from lib.matrix import expand, make_matrix
+
+
+def test_expand():
+    spec = {
+        "title": "{}",
+        "groups": {"winds": ["insts/fl", "insts/cl"], "brass": ["insts/tp"]},
+        "combine": [{"groups": ["winds", "brass"], "sizes": [1, 2]}],
+        "subsets": [{"group": "winds", "sizes": [1, 2]}],
+    }
+    charts = expand(spec)
+    assert [name for name, _, _ in charts] == [
+        "winds",
+        "brass",
+        "winds_brass",
+        "winds_insts-fl",
+        "winds_insts-cl",
+    ]
+    assert charts[2] == (
+        "winds_brass",
+        "Winds & Brass",
+        ["insts/fl", "insts/cl", "insts/tp"],
+    )
+    assert charts[3][1] == "Winds (fl)"
+
+    # the same basename in one group, and a group name which looks like a chart name
+    spec["groups"]["winds"].append("voice/fl")
+    assert expand(spec)[-1][0] == "winds_insts-cl_voice-fl"
+    spec["groups"]["winds_brass"] = ["insts/tb"]
+    spec["combine"].append({"groups": ["winds_brass"]})
+    with pytest.raises(ValueError):
+        expand(spec)
+
+
+def test_two_matrices(tmp_path):
+    first = expand(
+        {
+            "title": "{}",
+            "groups": {"winds": ["insts/fl", "insts/cl"], "brass": ["insts/tp"]},
+            "combine": [{"groups": ["winds", "brass"], "sizes": [1, 2]}],
+        }
+    )
+    second = expand(
+        {
+            "title": "{} Ranges",
+            "groups": {"low": ["insts/tb", "insts/cl"], "high": ["insts/fl"]},
+            "combine": [{"groups": ["low", "high"], "sizes": [2]}],
+            "subsets": [{"group": "low", "sizes": [1]}],
+        }
+    )
+    # the second matrix is rendered in the same process after the first one
+    for i, charts in enumerate([first, second]):
+        out = str(tmp_path / str(i))
+        make_matrix(charts, out, outputs=["svg"], workers=1)
+        for name, title, names in charts:
+            with open(os.path.join(out, f"{name}.svg"), mode="rb") as file:
+                rendered = file.read()
+            assert rendered == to_svg_bytes(make_svg(title, from_names(names)))
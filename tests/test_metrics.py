@@ -0,0 +1,27 @@
+from lib.metrics import fit_text, text_width, wrap_text
+
+
+def test_text_width():
+    assert text_width("", 3.2) == 0
+    assert text_width("ab", 6.4) == 2 * text_width("ab", 3.2)
+    assert text_width("abc", 3.2) > text_width("ab", 3.2)
+
+
+def test_fit_text():
+    text = "Warm Controlable"
+    width = text_width(text, 3.2)
+    assert fit_text(text, width, 3.2, 2.0) == ([text], 3.2)
+
+    lines, size = fit_text(text, width * 0.9, 3.2, 2.0)
+    assert lines == [text]
+    assert 2.0 <= size < 3.2
+
+    lines, size = fit_text(text, width / 2, 3.2, 3.0)
+    assert lines == ["Warm", "Controlable"]
+    assert size == 3.2
+
+
+def test_wrap_text():
+    assert wrap_text("a b c", 1000, 3.2) == ["a b c"]
+    assert wrap_text("", 10, 3.2) == [""]
+    assert wrap_text("aaaa b", text_width("aa", 3.2), 3.2) == ["aaaa", "b"]
@@ -0,0 +1,42 @@
+import io
+
+import pytest
+
+from lib.midi import META, events, midi_bytes, track_pitches
+
+
+def test_events():
+    data = midi_bytes([[(0, META, b"\x03Flute")]])
+    data = data[:10] + b"\x00\x02" + data[12:]
+    # the second note uses running status
+    body = bytes([0, 0x90, 60, 64, 0x83, 0x60, 60, 0, 0, META, 0x2F, 0])
+    data += b"MTrk" + len(body).to_bytes(4, "big") + body
+    found = list(events(io.BytesIO(data)))
+    assert found == [
+        (0, 0, META, b"\x03Flute"),
+        (0, 0, META, b"\x2f"),
+        (1, 0, 0x90, bytes([60, 64])),
+        (1, 480, 0x90, bytes([60, 0])),
+        (1, 480, META, b"\x2f"),
+    ]
+    with pytest.raises(ValueError):
+        list(events(io.BytesIO(data[:-3])))
+    with pytest.raises(ValueError):
+        list(events(io.BytesIO(b"RIFF" + data[4:])))
+
+
+def test_track_pitches(tmp_path):
+    path = tmp_path / "piece.mid"
+    path.write_bytes(
+        midi_bytes(
+            [
+                [(0, 0x90, bytes([72, 80])), (10, 0x90, bytes([72, 80]))],
+                [(0, 0x91, bytes([48, 80])), (0, 0x99, bytes([36, 80]))],
+            ]
+        )
+    )
+    assert track_pitches(str(path)) == [{72: 2}, {48: 1}]
+    path.write_bytes(
+        midi_bytes([[(0, 0x90, bytes([72, 80])), (0, 0x91, bytes([48, 80]))]])
+    )
+    assert track_pitches(str(path)) == [{72: 1}, {48: 1}]
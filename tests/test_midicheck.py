@@ -0,0 +1,75 @@
+import csv
+
+from lib.midi import META, midi_bytes
+from lib.midicheck import check_file, format_time, main
+
+
+def note(delta, pitch, channel=0):
+    return delta, 0x90 | channel, bytes([pitch, 80])
+
+
+SONG = midi_bytes(
+    [
+        # a second per quarter, half a second from the third quarter on
+        [
+            (0, META, b"\x51" + (1_000_000).to_bytes(3, "big")),
+            (960, META, b"\x51" + (500_000).to_bytes(3, "big")),
+        ],
+        [
+            (0, META, b"\x03Flute 1"),
+            note(0, 72),
+            note(480, 60),
+            note(960, 50),
+            note(0, 36, channel=9),
+        ],
+        [note(0, 58, channel=1), note(480, 55, channel=1)],
+        [(0, META, b"\x03Oboe"), note(0, 70, channel=3)],
+    ]
+)
+
+
+def test_check_file(tmp_path):
+    path = tmp_path / "song.mid"
+    path.write_bytes(SONG)
+    # plays C4 and C5, prefers C5
+    flute = ("Flute", 1 << (128 + 60) | 1 << (128 + 72), 1 << (128 + 72))
+    findings, unmapped = check_file(str(path), ([flute], {}, {}, True))
+    assert [(f[1], f[3], f[4], f[6]) for f in findings] == [
+        (2, 1.0, 60, True),
+        (2, 2.5, 50, False),
+    ]
+    assert unmapped == 3
+    # the drum note is only checked on an explicitly mapped channel or track
+    for tracks, channels in [({}, {9: 0}), ({1: 0}, {})]:
+        findings, _ = check_file(str(path), ([flute], tracks, channels, True))
+        assert (2, 2.5, 36, False) in [(f[1], f[3], f[4], f[6]) for f in findings]
+    assert format_time(62.5) == "1:02.500"
+
+
+def test_main(tmp_path, capsys):
+    for name in ["a.mid", "b.mid"]:
+        (tmp_path / name).write_bytes(SONG)
+    (tmp_path / "c.mid").write_bytes(b"MThd")
+    report = tmp_path / "report.csv"
+    code = main(
+        [
+            str(tmp_path),
+            "--catalog",
+            "insts/fl",
+            "--channel",
+            "2=insts/tp",
+            "--csv",
+            str(report),
+            "-j",
+            "2",
+        ]
+    )
+    assert code == 1
+    out = capsys.readouterr().out
+    assert "0:01.000 track 2 channel 1 Flute: C4 in ! range" in out
+    assert "track 3 channel 2 Trumpet: G3 in ! range" in out
+    assert "1 notes without instrument" in out
+    assert "c.mid: unexpected end of MIDI file" in out
+    with open(report, encoding="utf8", newline="") as file:
+        rows = list(csv.reader(file))
+    assert rows[0][0] == "file" and len(rows) == 1 + 2 * 3
@@ -1,5 +1,5 @@
 import pytest
-from lib.music import Pitch, Interval
+from lib.music import Pitch, Interval, RelativeRange
 
 
 def test_pitch():
@@ -92,5 +92,12 @@ def test_interval():
     trans("A+1", "a8", "C3")  # with renormalization
 
 
+def test_relative_range_order():
+    # ranges sharing a bound must sort in any input order
+    ranges = [RelativeRange.from_str("4 d8"), RelativeRange.from_str("a2 4")]
+    assert [str(r) for r in sorted(ranges)] == ["a2 4 ", "4 d8 "]
+    assert [str(r) for r in sorted(ranges[::-1])] == ["a2 4 ", "4 d8 "]
+
+
 def trans(start: str, interval: str, end: str):
     assert str(Pitch.from_str(start).transposed(Interval.from_str(interval))) == end
@@ -0,0 +1,24 @@
+import asyncio
+
+import pytest
+
+from lib.pipeline import run_pipeline
+
+
+def test_pipeline(tmp_path):
+    jobs = [
+        ("Trumpet", ["insts/tp"], str(tmp_path / "tp.svg")),
+        ("Winds", ["insts/fl", "insts/cl"], str(tmp_path / "winds.svg")),
+        ("Missing", ["insts/missing"], str(tmp_path / "missing.svg")),
+    ]
+    stats = asyncio.run(run_pipeline(jobs, workers=1))
+    assert [stage.name for stage in stats] == ["load", "layout", "convert", "write"]
+    assert stats[0].failed == 1
+    assert all(stage.done == 2 for stage in stats)
+    assert (tmp_path / "tp.svg").read_text().startswith("<?xml")
+    assert not (tmp_path / "missing.svg").exists()
+
+
+def test_pipeline_format():
+    with pytest.raises(ValueError):
+        asyncio.run(run_pipeline([("Trumpet", ["insts/tp"], "tp.jpg")]))
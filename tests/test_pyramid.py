@@ -0,0 +1,59 @@
+import os
+from math import ceil
+
+from lib.chart import column_extents, from_names, from_str, graph_format, make_graph
+from lib.deps import intersecting_columns
+from lib.pyramid import calc_levels, level_scale, make_pyramid, tile_drawings
+
+NAMES = ["insts/fl", "insts/cl", "insts/tp", "insts/tb"]
+
+
+def test_levels(tmp_path):
+    instruments = from_names(NAMES)
+    content_format = graph_format(instruments)
+    assert make_graph("Test", instruments)[1] == content_format
+    levels = calc_levels(content_format, 128, 1.0)
+    assert level_scale(levels - 1, levels, 1.0) == 1.0
+    expected = sum(
+        ceil(content_format[0] * level_scale(z, levels, 1.0) / 128)
+        * ceil(content_format[1] * level_scale(z, levels, 1.0) / 128)
+        for z in range(levels)
+    )
+    written = make_pyramid("Test", instruments, str(tmp_path), tile_size=128)
+    assert len(written) == expected
+    assert os.path.join(str(tmp_path), "0/0/0.png") in written
+    assert all(os.path.exists(path) for path in written)
+
+
+def test_rebuild(tmp_path):
+    instruments = from_names(NAMES)
+    out = str(tmp_path)
+    first = make_pyramid("Test", instruments, out, tile_size=128, workers=2)
+    assert make_pyramid("Test", instruments, out, tile_size=128, workers=2) == []
+
+    # same staff extents, only the trombone column changes
+    with open("insts/tb.txt", encoding="utf8") as file:
+        edited = from_str(file.read().replace("Trombone", "Bass Trombone", 1))
+    rebuilt = make_pyramid("Test", [*instruments[:3], edited], out, tile_size=128)
+    assert 0 < len(rebuilt) < len(first)
+    content_format = graph_format(instruments)
+    levels = calc_levels(content_format, 128, 1.0)
+    extents = column_extents(len(instruments))
+    for path in rebuilt:
+        z, x, _ = map(int, os.path.relpath(path, out)[: -len(".png")].split("/"))
+        scale = level_scale(z, levels, 1.0)
+        assert 3 in intersecting_columns(
+            extents, x * 128 / scale, (x + 1) * 128 / scale
+        )
+
+
+def test_tile_contents(tmp_path):
+    instruments = from_names(NAMES)
+    tiles = [("a.png", 1.0, 0, 0, [0]), ("b.png", 1.0, 1, 0, [1, 2])]
+    (first, a), (second, b) = tile_drawings("Test", instruments, tiles, 128)
+    assert (a, b) == ("a.png", "b.png")
+    first_svg, second_svg = first.as_svg(), second.as_svg()
+    assert "Test" in first_svg and "Test" in second_svg
+    assert "Flute" in first_svg and "Clarinet" not in first_svg
+    assert "Clarinet" in second_svg and "Trumpet" in second_svg
+    assert "Flute" not in second_svg and "Trombone" not in second_svg
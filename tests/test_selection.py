@@ -0,0 +1,66 @@
+import random
+from itertools import combinations
+
+import pytest
+
+from lib.chart import from_fields, from_names
+from lib.parser import parse_str
+from lib.selection import exact_cover, greedy_cover, select, span_masks, uncovered
+from lib.synth import synth_instrument
+
+SATB = ["voice/soprano", "voice/alto", "voice/tenor", "voice/bass"]
+
+
+def test_select():
+    instruments = from_names(SATB + ["insts/fl", "insts/tb"])
+    selection = select(instruments, 40, 81)
+    assert selection is not None
+    masks = span_masks(instruments, 40, 81)
+    assert not uncovered([masks[i] for i in selection], (1 << 42) - 1, 1)
+    assert select(instruments, 10, 81) is None
+
+    # the bass is the only one playing the lowest pitches
+    twice = select(instruments, 45, 70, players=2)
+    masks = span_masks(instruments, 45, 70)
+    assert not uncovered([masks[i] for i in twice], (1 << 26) - 1, 2)
+
+
+def test_costs():
+    wide = from_fields(*parse_str("Wide\n\nRanges:\nC3 C6\n"))
+    low = from_fields(*parse_str("Low\n\nRanges:\nC3 C4\n"))
+    high = from_fields(*parse_str("High\n\nRanges:\n!C4 C6\n"))
+    instruments = [low, high, wide]
+    assert select(instruments, 48, 84) == [2]
+    assert select(instruments, 48, 84, costs=[1, 1, 5]) == [0, 1]
+    assert select(instruments, 48, 84, preferred=True) == [2]
+    assert select(instruments, 48, 84, players=2) == [0, 1, 2]
+    for costs in [[1, 0, 1], [1, -1, 1]]:
+        with pytest.raises(ValueError):
+            select(instruments, 48, 84, costs=costs)
+    with pytest.raises(ValueError):
+        select(instruments, 84, 48)
+
+
+def test_exact():
+    rng = random.Random(3)
+    for _ in range(10):
+        instruments = [
+            from_fields(*parse_str(synth_instrument(rng, i, stringed=0.3)))
+            for i in range(8)
+        ]
+        masks = span_masks(instruments, 48, 72)
+        window = (1 << 25) - 1
+        costs = [float(rng.randint(1, 4)) for _ in masks]
+        for players in [1, 2]:
+            best = None
+            for n in range(len(masks) + 1):
+                for subset in combinations(range(len(masks)), n):
+                    if not uncovered([masks[i] for i in subset], window, players):
+                        cost = sum(costs[i] for i in subset)
+                        best = cost if best is None else min(best, cost)
+            found = exact_cover(masks, costs, window, players)
+            assert (found is None) == (best is None)
+            if found is not None:
+                assert sum(costs[i] for i in found) == best
+                greedy = greedy_cover(masks, costs, window, players)
+                assert sum(costs[i] for i in greedy) >= best
@@ -0,0 +1,38 @@
+import asyncio
+
+from lib.serve import MemoryCache, RenderServer
+
+
+def test_memory_cache():
+    cache = MemoryCache(max_bytes=6)
+    cache.put("a", b"aa")
+    cache.put("b", b"bb")
+    assert cache.get("a") == b"aa"
+    cache.put("c", b"cccc")
+    # a was used after b
+    assert cache.get("b") is None
+    assert cache.get("a") == b"aa"
+    assert cache.size == 6
+
+
+def test_coalescing():
+    calls = []
+
+    async def compute() -> bytes:
+        calls.append(None)
+        await asyncio.sleep(0.01)
+        return b"svg"
+
+    async def run() -> list[bytes]:
+        server = RenderServer(workers=1)
+        try:
+            results = await asyncio.gather(
+                *[server.cached("key", compute) for _ in range(4)]
+            )
+            results.append(await server.cached("key", compute))
+        finally:
+            server.close()
+        return results
+
+    assert asyncio.run(run()) == [b"svg"] * 5
+    assert len(calls) == 1
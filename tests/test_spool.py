@@ -0,0 +1,49 @@
+import os
+import shutil
+
+from lib.spool import MAX_ATTEMPTS, Spool, chart_job, work
+
+
+def test_lease_expiry(tmp_path):
+    spool = Spool(str(tmp_path))
+    assert spool.enqueue(chart_job("Trumpet", ["insts/tp"], "tp.pdf"))
+    assert not spool.enqueue(chart_job("Trumpet", ["insts/tp"], "tp.pdf"))
+
+    job = spool.claim()
+    assert job is not None
+    assert spool.claim() is None
+    assert spool.requeue_expired(lease=60) == []
+
+    # the worker stopped renewing its lease
+    path = spool.path("claimed", job["id"])
+    os.utime(path, (0, 0))
+    assert spool.requeue_expired(lease=60) == [job["id"]]
+    assert spool.read("pending", job["id"])["attempts"] == 1
+    assert spool.status()["claimed"] == 0
+
+
+def test_retries(tmp_path):
+    spool = Spool(str(tmp_path / "spool"))
+    spool.enqueue(chart_job("Missing", ["insts/missing"], str(tmp_path / "m.pdf")))
+    assert work(spool, exit_when_empty=True, poll_interval=0) == 0
+    counts = spool.status()
+    assert counts["failed"] == 1
+    assert counts["pending"] == counts["claimed"] == 0
+    job = spool.read("failed", spool.ids("failed")[0])
+    assert job["attempts"] == len(job["errors"]) == MAX_ATTEMPTS
+
+
+def test_edited_instruments(tmp_path):
+    spool = Spool(str(tmp_path / "spool"))
+    shutil.copy("insts/tp.txt", tmp_path)
+    name = str(tmp_path / "tp")
+    assert spool.enqueue(chart_job("Trumpet", [name], "tp.pdf"))
+    job = spool.claim()
+    spool.finish(job)
+    assert not spool.enqueue(chart_job("Trumpet", [name], "tp.pdf"))
+
+    # the finished job rendered the old contents
+    with open(f"{name}.txt", mode="a") as file:
+        file.write("\nNotes:\nedited\n")
+    assert spool.enqueue(chart_job("Trumpet", [name], "tp.pdf"))
+    assert spool.status()["pending"] == 1
@@ -0,0 +1,32 @@
+from lib.chart import from_names
+from lib.inst_graph import Instrument
+from lib.synth import differential, synth_catalog, write_catalog
+from lib.parser import parse_str
+
+
+def test_deterministic():
+    assert synth_catalog(20, seed=1) == synth_catalog(20, seed=1)
+    assert synth_catalog(20, seed=1) != synth_catalog(20, seed=2)
+
+
+def test_formats():
+    texts = synth_catalog(200, seed=0, stringed=0.5)
+    parsed = [parse_str(text) for text in texts]
+    assert any("open strings" in fields for _, fields in parsed)
+    assert any("transposition" in fields for _, fields in parsed)
+    assert any(r.startswith("!") for _, fields in parsed for r in fields["ranges"])
+
+
+def test_differential(tmp_path):
+    names = write_catalog(synth_catalog(24, seed=0), str(tmp_path))
+    assert differential(names, chart_size=6) == []
+
+
+def test_valid(tmp_path):
+    # seed 3 used to generate a range which the transposition turned around
+    for seed in [0, 3]:
+        names = write_catalog(synth_catalog(300, seed=seed), str(tmp_path / str(seed)))
+        for inst in from_names(names):
+            if isinstance(inst, Instrument):
+                for r in inst.get_sounding_pitch_ranges():
+                    assert r.start.num_lex_ord() <= r.end.num_lex_ord()
@@ -0,0 +1,52 @@
+from lib.chart import from_names, make_svg
+from lib.convert import to_svg_bytes
+from lib.music import Interval, Pitch
+from lib.trace import json_sink, read_records, span, summarize, tracing
+
+
+def test_spans():
+    records = []
+    with span("ignored"):
+        pass
+    with tracing(records.append) as tracer:
+        with span("outer", instrument="Flute") as outer:
+            outer.set(size=3)
+            with span("inner"):
+                pass
+    assert [r["span"] for r in records] == ["inner", "outer"]
+    assert records[0]["instrument"] == "Flute"
+    assert records[0]["depth"] == 1 and records[1]["size"] == 3
+    assert tracer.summary.spans["outer"][0] == 1
+
+
+def test_memory_peak():
+    records = []
+    with tracing(records.append, memory=True):
+        with span("outer"):
+            with span("inner"):
+                data = bytearray(1_000_000)
+            del data
+    inner, outer = records
+    assert inner["peak"] >= 1_000_000
+    assert outer["peak"] >= inner["peak"]
+
+
+def test_fallback_counter():
+    records = []
+    with tracing(records.append):
+        with span("column", instrument="Tuba"):
+            pitch = Pitch.from_str("C+4").transposed(Interval.from_str("a1"))
+    assert str(pitch) == "Eb4"
+    assert records[0]["counter"] == "double_accidental_fallback"
+    assert records[0]["instrument"] == "Tuba"
+
+
+def test_render_stages(tmp_path):
+    path = str(tmp_path / "trace.jsonl")
+    with tracing(json_sink(path)):
+        to_svg_bytes(make_svg("Trumpet", from_names(["insts/tp"])))
+    summary = summarize(read_records(path))
+    for stage in ["parse", "instrument", "staff", "column", "serialize"]:
+        assert stage in summary.spans
+    assert summary.spans["column"][3] > 0
+    assert ("column", "Trumpet") in summary.instruments
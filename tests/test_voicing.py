@@ -0,0 +1,68 @@
+import random
+from itertools import permutations
+
+from lib.chart import from_fields, from_names
+from lib.parser import parse_str
+from lib.synth import synth_instrument
+from lib.voicing import PENALTY, VoicingSolver, parse_chord
+
+
+def brute_force(solver, chord):
+    best = None
+    for players in permutations(range(len(solver.instruments)), len(chord)):
+        cost = 0
+        for pitch, i in zip(chord, players):
+            if not solver.players.get(pitch, 0) >> i & 1:
+                break
+            cost += 0 if solver.preferred.get(pitch, 0) >> i & 1 else PENALTY
+        else:
+            best = cost if best is None else min(best, cost)
+    return best
+
+
+def test_chord():
+    instruments = from_names(["insts/fl", "insts/cl", "insts/tp", "insts/fh"])
+    solver = VoicingSolver(instruments)
+    cost, voicing = solver.solve(parse_chord("C4 E4 G4 C5"))
+    assert cost == 0
+    assert [pitch for pitch, _ in voicing] == [60, 64, 67, 72]
+    assert len({i for _, i in voicing}) == 4
+    for pitch, i in voicing:
+        assert solver.players[pitch] >> i & 1
+    assert solver.solve(parse_chord("C1 C4")) is None
+    assert solver.unplayable(parse_chord("C1 C4")) == [24]
+    assert solver.solve(parse_chord("C4 D4 E4 F4 G4")) is None
+
+
+def test_penalty():
+    wide = from_fields(*parse_str("Wide\n\nRanges:\nC2 C7\n"))
+    low = from_fields(*parse_str("Low\n\nRanges:\n!C2 C4\n"))
+    solver = VoicingSolver([low, wide])
+    cost, voicing = solver.solve(parse_chord("C3"))
+    assert cost == 0 and voicing == ((48, 1),)
+    cost, voicing = solver.solve(parse_chord("C3 C5"))
+    assert cost == PENALTY and voicing == ((48, 0), (72, 1))
+
+    # twelve wide and eighteen low instruments, more high pitches than wide ones
+    solver = VoicingSolver([wide] * 12 + [low] * 18)
+    high = " ".join(f"{name}{octave}" for octave in [5, 6] for name in "CDEFGAB")
+    assert solver.solve(parse_chord(high)) is None
+    bass = " ".join(f"{name}{octave}" for octave in [2, 3] for name in "CDEFGAB")
+    cost, _ = solver.solve(parse_chord(f"{bass} C5 D5 E5 F5 G5 A5 B5"))
+    assert cost == 9 * PENALTY
+
+
+def test_brute_force():
+    rng = random.Random(5)
+    for _ in range(20):
+        instruments = [
+            from_fields(*parse_str(synth_instrument(rng, i, stringed=0.2)))
+            for i in range(5)
+        ]
+        solver = VoicingSolver(instruments)
+        pitches = sorted(solver.players)
+        for _ in range(5):
+            chord = tuple(rng.sample(pitches, rng.randint(1, 4)))
+            voicing = solver.solve(chord)
+            expected = brute_force(solver, chord)
+            assert (voicing and voicing[0]) == expected
@@ -0,0 +1,70 @@
+import os
+import shutil
+
+import pytest
+
+from lib import watch
+from lib.watch import Watcher
+
+MANIFEST = """
+[[chart]]
+name = "winds"
+instruments = ["insts/fl", "insts/cl"]
+outputs = ["svg"]
+"""
+
+
+def touch(path):
+    # a later modification time, even on coarse file system clocks
+    mtime = os.stat(path).st_mtime_ns + 1_000_000_000
+    os.utime(path, ns=(mtime, mtime))
+
+
+@pytest.fixture
+def watcher(tmp_path):
+    os.makedirs(tmp_path / "insts")
+    for name in ["fl", "cl"]:
+        shutil.copy(f"insts/{name}.txt", tmp_path / "insts")
+    (tmp_path / "charts.toml").write_text(MANIFEST)
+    return Watcher(str(tmp_path / "charts.toml"), str(tmp_path))
+
+
+def columns_of(watcher, name):
+    return {key: col for key, col in watcher.columns.items() if key[0] == name}
+
+
+def test_update(watcher, tmp_path):
+    assert watcher.update() == ["winds:svg"]
+    assert (tmp_path / "winds.svg").exists()
+    assert watcher.update() == []
+
+    flute, clarinet = str(tmp_path / "insts/fl"), str(tmp_path / "insts/cl")
+    old_flute = columns_of(watcher, flute)
+    old_clarinet = columns_of(watcher, clarinet)
+    with open(f"{flute}.txt", mode="a") as file:
+        file.write("\nNotes:\nedited\n")
+    touch(f"{flute}.txt")
+    assert watcher.update() == ["winds:svg"]
+    # the columns are keyed by file and content, only the flute is drawn again
+    assert columns_of(watcher, clarinet) == old_clarinet
+    new_flute = columns_of(watcher, flute)
+    assert len(new_flute) == 1 and new_flute.keys() != old_flute.keys()
+
+
+def test_retry(watcher, tmp_path, monkeypatch):
+    render_output = watch.render_output
+    calls = []
+
+    def failing(*args):
+        calls.append(args)
+        if len(calls) == 1:
+            raise OSError("disk full")
+        return render_output(*args)
+
+    monkeypatch.setattr(watch, "render_output", failing)
+    with pytest.raises(OSError):
+        watcher.update()
+    # nothing changed, but the failed output is rendered on the next poll
+    assert watcher.update() == ["winds:svg"]
+    assert watcher.update() == []
+    assert len(calls) == 2
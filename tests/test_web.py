@@ -0,0 +1,40 @@
+import json
+import os
+import re
+
+from lib.chart import from_names
+from lib.inst_graph import INST_WIDTH
+from lib.web import describe, make_html
+
+NAMES = ["insts/fl", "insts/cl", "insts/tp"]
+
+
+def vertical_lines(svg: str) -> list[float]:
+    return [
+        float(x)
+        for x, other in re.findall(r'd="M([\d.]+),[-\d.]+ L([\d.]+),', svg)
+        if x == other
+    ]
+
+
+def test_make_html(tmp_path):
+    instruments = from_names(NAMES)
+    path = make_html("<Winds>", instruments, str(tmp_path))
+    assert path == os.path.join(str(tmp_path), "index.html")
+    for name in ["staff_head.svg", "staff_slot.svg", "staff_tail.svg"]:
+        assert (tmp_path / name).exists()
+    assert sorted(os.listdir(tmp_path / "columns")) == ["0.svg", "1.svg", "2.svg"]
+
+    html = (tmp_path / "index.html").read_text(encoding="utf8")
+    assert "<title>&lt;Winds&gt;</title>" in html
+    meta = json.loads(html.split("const META = ", 1)[1].split(";\n", 1)[0])
+    assert [inst["name"] for inst in meta] == ["Flute", "Clarinet", "Trumpet"]
+    assert meta[1]["text"] == "\n".join(describe(instruments[1]))
+    assert meta[1]["src"] == "columns/1.svg"
+
+    # the bar lines between the columns are on the slots, the last column is on
+    # the tail which only has the double bar line at its end
+    slot = (tmp_path / "staff_slot.svg").read_text(encoding="utf8")
+    tail = (tmp_path / "staff_tail.svg").read_text(encoding="utf8")
+    assert len(vertical_lines(slot)) == 1
+    assert min(vertical_lines(tail)) >= INST_WIDTH